@@ -0,0 +1,105 @@
+"""Tests for the bash tool and the recovery of its session."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from trae_agent.tools import bash_tool
+from trae_agent.tools.bash_tool import BashTool, env_statements
+
+
+@pytest.fixture(autouse=True)
+def short_timeout(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(bash_tool._BashSession, "_timeout", 1.0)  # pyright: ignore[reportPrivateUsage]
+    monkeypatch.setattr(bash_tool._BashSession, "_output_delay", 0.05)  # pyright: ignore[reportPrivateUsage]
+
+
+def _alive(pid: int) -> bool:
+    # killed children of the shell may linger as zombies until reaped by init
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_timeout_kills_process_group_and_restores_state(tmp_path: Path):
+    pid_file = tmp_path / "pid"
+
+    async def run():
+        tool = BashTool()
+        try:
+            _ = await tool.execute({"command": f"cd {tmp_path} && export GREETING=hello"})
+            # a command that never returns: its export must not be replayed
+            timed_out = await tool.execute({"command": f"sleep 300 & echo $! > {pid_file}; export LATE=1; wait"})
+            after = await tool.execute({"command": 'echo "$PWD:$GREETING:${LATE:-unset}:$$"'})
+            return timed_out, after
+        finally:
+            await tool.close()
+
+    timed_out, after = asyncio.run(run())
+
+    assert timed_out.error_code != 0 and "timed out" in (timed_out.error or "")
+    assert "new session was started automatically" in (timed_out.error or "")
+    assert not _alive(int(pid_file.read_text()))
+    cwd, greeting, late, _ = (after.output or "").split(":")
+    assert (cwd, greeting, late) == (str(tmp_path), "hello", "unset")
+
+
+def test_exited_shell_recovers(tmp_path: Path):
+    async def run():
+        tool = BashTool()
+        try:
+            first = await tool.execute({"command": f"cd {tmp_path}; echo $$"})
+            exited = await tool.execute({"command": "exit 3"})
+            after = await tool.execute({"command": "echo $PWD $$"})
+            return first, exited, after
+        finally:
+            await tool.close()
+
+    first, exited, after = asyncio.run(run())
+
+    assert exited.error_code != 0 and "new session was started automatically" in (exited.error or "")
+    cwd, pid = (after.output or "").split()
+    assert cwd == str(tmp_path) and pid != first.output
+
+
+def test_close_stops_session_and_standby():
+    async def run() -> list[int]:
+        tool = BashTool()
+        _ = await tool.execute({"command": "true"})
+        assert tool._session and tool._standby  # pyright: ignore[reportPrivateUsage]
+        standby = await tool._standby  # pyright: ignore[reportPrivateUsage]
+        pids = [p.pid for p in (tool._session._process, standby._process) if p]  # pyright: ignore[reportPrivateUsage]
+        await tool.close()
+        assert tool._session is None and tool._standby is None  # pyright: ignore[reportPrivateUsage]
+        return pids
+
+    pids = asyncio.run(run())
+    assert len(pids) == 2 and not any(_alive(pid) for pid in pids)
+
+
+def test_env_statements_leave_out_quoted_strings_and_heredocs():
+    assert env_statements('cd /repo && export A="a b"; unset B') == ['export A="a b"', "unset B"]
+    assert env_statements('echo "export FOO=1"; echo \'unset BAR\'') == []
+    assert env_statements("cat > env.sh << 'EOF'\nexport X=1\nEOF\nexport Y=$HOME") == ["export Y=$HOME"]
+    assert env_statements("export P=$(cd x; pwd) # ; export Q=1") == ["export P=$(cd x; pwd)"]
+    assert env_statements("export 'unbalanced") == []
+
+
+def test_recovery_is_reported_with_the_output_of_the_command(monkeypatch: pytest.MonkeyPatch):
+    # the shell is killed after it has printed the output of the command
+    monkeypatch.setattr(bash_tool._BashSession, "_output_delay", 0.5)  # pyright: ignore[reportPrivateUsage]
+
+    async def run():
+        tool = BashTool()
+        try:
+            return await tool.execute({"command": "echo done; (sleep 0.05; kill -9 $$) & true"})
+        finally:
+            await tool.close()
+
+    result = asyncio.run(run())
+
+    assert result.output == "done"
+    assert "new session was started automatically" in (result.error or "")
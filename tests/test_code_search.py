@@ -0,0 +1,161 @@
+"""Tests for the trigram-indexed code search tool."""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from trae_agent.tools import trigram_index
+from trae_agent.tools.base import ToolCall, ToolExecutor
+from trae_agent.tools.code_search_tool import CodeSearchTool
+from trae_agent.tools.edit_tool import TextEditorTool
+from trae_agent.tools.trigram_index import TrigramIndex, required_literals
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("TRAE_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def _project(tmp_path: Path) -> Path:
+    project = tmp_path / "project"
+    (project / "pkg").mkdir(parents=True)
+    (project / "tests").mkdir()
+    _ = (project / ".gitignore").write_text("build/\n")
+    _ = (project / "pkg" / "models.py").write_text(
+        "from .base import Base\n\n\nclass UserModel(Base):\n    pass\n"
+    )
+    _ = (project / "tests" / "test_models.py").write_text("from pkg.models import UserModel\n\nUserModel()\n")
+    (project / "build").mkdir()
+    _ = (project / "build" / "models.py").write_text("class UserModel: pass\n")
+    _ = (project / "data.bin").write_bytes(b"UserModel\0\1\2")
+    return project
+
+
+def _search(tool: CodeSearchTool, **arguments):
+    return asyncio.run(tool.execute(arguments))
+
+
+def test_required_literals():
+    assert required_literals("UserModel", False) == ["UserModel"]
+    assert required_literals(r"def \w+_handler\(", True) == ["def ", "_handler("]
+    assert required_literals(r"a|b", True) == []
+    assert required_literals(r"[", True) == []
+
+
+def test_index_candidates_and_incremental_update(tmp_path: Path):
+    project = _project(tmp_path)
+    index = TrigramIndex(project, tmp_path / "index.sqlite3")
+
+    assert index.update() == 3
+    assert list(index.candidates(["usermodel"])) == ["pkg/models.py", "tests/test_models.py"]
+    assert list(index.candidates(["class UserModel"])) == ["pkg/models.py"]
+    assert index.update() == 0
+
+    path = project / "pkg" / "views.py"
+    _ = path.write_text("class UserView: pass\n")
+    (project / "tests" / "test_models.py").unlink()
+    assert index.update() == 1
+    assert list(index.candidates(["UserModel"])) == ["pkg/models.py"]
+    assert list(index.candidates([])) == ["pkg/models.py", "pkg/views.py"]
+
+
+def test_code_search_ranks_definitions_first(tmp_path: Path):
+    tool = CodeSearchTool()
+    tool.set_project_path(str(_project(tmp_path)))
+
+    result = _search(tool, query="usermodel")
+    assert result.error is None
+    assert result.output is not None
+    lines = result.output.split("\n")
+    assert lines[0] == "Found 3 matching lines in 2 files, showing 3:"
+    assert lines[1] == "pkg/models.py:4: class UserModel(Base):"
+    assert "build/" not in result.output
+
+    result = _search(tool, query="UserModel()", path_glob="tests/*")
+    assert result.output is not None
+    assert result.output.split("\n")[1:] == ["tests/test_models.py:3: UserModel()"]
+
+    result = _search(tool, query="usermodel", case_sensitive=True)
+    assert result.output is not None and result.output.startswith("No matches found")
+
+
+def test_code_search_regex_and_refresh(tmp_path: Path):
+    project = _project(tmp_path)
+    tool = CodeSearchTool()
+    tool.set_project_path(str(project))
+
+    result = _search(tool, query=r"class \w+Model\(", regex=True)
+    assert result.output is not None
+    assert result.output.split("\n")[1:] == ["pkg/models.py:4: class UserModel(Base):"]
+
+    path = project / "pkg" / "admin.py"
+    _ = path.write_text("class AdminModel(Base):\n    pass\n")
+    os.utime(path, ns=(1, 1))
+    assert tool._index is not None
+    _ = tool._index.update()
+    result = _search(tool, query=r"class \w+Model\(", regex=True, max_results=1)
+    assert result.output is not None
+    assert result.output.split("\n")[0] == "Found 2 matching lines in 2 files, showing 1:"
+
+    result = _search(tool, query="(", regex=True)
+    assert result.error is not None and result.error.startswith("Invalid search parameters")
+
+
+def test_queries_do_not_wait_for_updates(tmp_path: Path):
+    project = _project(tmp_path)
+    index = TrigramIndex(project, tmp_path / "index.sqlite3")
+
+    # before the first update has completed, every text file is a candidate
+    assert list(index.candidates(["class"])) == ["pkg/models.py", "tests/test_models.py"]
+    _ = index.update()
+
+    _ = (project / "pkg" / "views.py").write_text("class UserModel: pass\n")
+    # an update in progress holds the lock, queries see the last completed update meanwhile
+    with index._lock:  # pyright: ignore[reportPrivateUsage]
+        assert list(index.candidates(["UserModel"])) == ["pkg/models.py", "tests/test_models.py"]
+
+
+def _wait_for(condition, timeout: float = 5.0):  # pyright: ignore
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_watched_index_picks_up_changes_and_stops_when_idle(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(trigram_index, "IDLE_TIMEOUT", 0.2)
+    project = _project(tmp_path)
+    index = TrigramIndex(project, tmp_path / "index.sqlite3")
+    index.watch(interval=0.01)
+    try:
+        _ = (project / "pkg" / "views.py").write_text("class UserView: pass\n")
+        _wait_for(lambda: list(index.candidates(["UserView"])) == ["pkg/views.py"])
+        # without searches or changes the background updates end
+        _wait_for(lambda: index._watcher is None)  # pyright: ignore[reportPrivateUsage]
+
+        # a tool that wrote files restarts them
+        _ = (project / "pkg" / "admin.py").write_text("class UserAdmin: pass\n")
+        index.files_changed()
+        _wait_for(lambda: list(index.candidates(["UserAdmin"])) == ["pkg/admin.py"])
+    finally:
+        index.stop()
+    assert index._watcher is None  # pyright: ignore[reportPrivateUsage]
+
+
+def test_file_writing_tools_trigger_index_updates(tmp_path: Path):
+    project = _project(tmp_path)
+    search = CodeSearchTool()
+    search.set_project_path(str(project))
+    assert search._index is not None  # pyright: ignore[reportPrivateUsage]
+    search._index.stop()  # pyright: ignore[reportPrivateUsage]
+    executor = ToolExecutor([search, TextEditorTool()])
+
+    path = project / "pkg" / "views.py"
+    call = ToolCall(name="str_replace_based_edit_tool", call_id="1", arguments={"command": "create", "path": str(path), "file_text": "class UserView: pass\n"})
+    result = asyncio.run(executor.execute_tool_call(call))
+    assert result.success
+    _wait_for(lambda: list(search._index.candidates(["UserView"])) == ["pkg/views.py"])  # pyright: ignore
+    asyncio.run(executor.close_tools())
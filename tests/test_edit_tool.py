@@ -0,0 +1,366 @@
+"""Tests for the file editing tool."""
+
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from trae_agent.tools.base import ToolError
+from trae_agent.tools.edit_tool import TextEditorTool
+from trae_agent.tools.file_cache import FileCache
+
+
+def _run(tool: TextEditorTool, **arguments):
+    return asyncio.run(tool.execute(arguments))
+
+
+def test_file_cache_reuses_content_until_file_changes(tmp_path: Path):
+    path = tmp_path / "module.py"
+    _ = path.write_text("a = 1\n")
+    cache = FileCache()
+
+    assert cache.read(path) == "a = 1\n"
+    assert cache.read(path) == "a = 1\n"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    _ = path.write_text("a = 22\n")
+    assert cache.read(path) == "a = 22\n"
+    assert cache.misses == 2
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = FileCache(max_chars=400)
+    paths = [tmp_path / f"f{i}.txt" for i in range(5)]
+    for path in paths:
+        _ = path.write_text("x" * 100)
+    for path in paths[:4]:
+        _ = cache.read(path)
+    _ = cache.read(paths[0])
+    _ = cache.read(paths[4])
+
+    hits = cache.hits
+    _ = cache.read(paths[0])
+    assert cache.hits == hits + 1
+    _ = cache.read(paths[1])
+    assert cache.hits == hits + 1
+
+
+def test_edits_keep_cache_in_sync(tmp_path: Path):
+    path = tmp_path / "module.py"
+    _ = path.write_text("def foo():\n    return 1\n")
+    tool = TextEditorTool()
+
+    result = _run(tool, command="str_replace", path=str(path), old_str="return 1", new_str="return 2")
+    assert result.error_code == 0
+    result = _run(tool, command="view", path=str(path))
+    assert "return 2" in (result.output or "")
+    assert path.read_text() == "def foo():\n    return 2\n"
+
+    # changes made outside of the tool are picked up
+    _ = path.write_text("def foo():\n    return 3\n")
+    result = _run(tool, command="view", path=str(path))
+    assert "return 3" in (result.output or "")
+
+
+def test_line_index_matches_split(tmp_path: Path, monkeypatch):
+    from trae_agent.tools import line_index
+    from trae_agent.tools.line_index import LineIndexCache
+
+    monkeypatch.setattr(line_index, "LINE_INDEX_STRIDE", 7)
+    monkeypatch.setattr(line_index, "LINE_INDEX_CHUNK", 50)
+    path = tmp_path / "big.log"
+    text = "".join(f"line {i} {'x' * (i % 13)}\n" for i in range(500))
+    _ = path.write_text(text)
+    lines = text.split("\n")
+
+    cache = LineIndexCache()
+    with cache.open(path) as mapped_lines:
+        assert mapped_lines.n_lines == len(lines)
+        for init_line, final_line in [(1, 1), (1, 20), (7, 8), (250, 260), (499, 501), (300, -1)]:
+            expected = "\n".join(lines[init_line - 1:] if final_line == -1 else lines[init_line - 1:final_line])
+            assert mapped_lines.read_lines(init_line, final_line) == expected
+
+    # `\r\n` split across chunks is not a lone `\r`
+    _ = path.write_bytes(text.replace("\n", "\r\n").encode())
+    with cache.open(path) as mapped_lines:
+        assert mapped_lines.index.plain and mapped_lines.read_lines(250, 251) == "\n".join(lines[249:251])
+
+
+def test_large_file_range_view(tmp_path: Path, monkeypatch):
+    from trae_agent.tools import edit_tool
+
+    monkeypatch.setattr(edit_tool, "MMAP_VIEW_THRESHOLD", 0)
+    path = tmp_path / "generated.py"
+    _ = path.write_text("".join(f"value_{i} = {i}\n" for i in range(5000)))
+    tool = TextEditorTool()
+
+    result = _run(tool, command="view", path=str(path), view_range=[4000, 4001])
+    assert result.output == f"Here's the result of running `cat -n` on {path}:\n  4000\tvalue_3999 = 3999\n  4001\tvalue_4000 = 4000\n"
+    result = _run(tool, command="view", path=str(path), view_range=[4000, 6000])
+    assert result.error_code == -1
+    assert "5001" in (result.error or "")
+
+
+def test_large_file_view_decodes_like_small_files(tmp_path: Path, monkeypatch):
+    from trae_agent.tools import edit_tool
+
+    path = tmp_path / "mixed.txt"
+    for content in (b"a\r\nb\r\nc\r\nd\n", b"a\rb\nc\r\nd\n", b"a\nb\xff\nc\nd\n"):
+        _ = path.write_bytes(content)
+        results = []
+        for threshold in (0, edit_tool.MMAP_VIEW_THRESHOLD):
+            monkeypatch.setattr(edit_tool, "MMAP_VIEW_THRESHOLD", threshold)
+            result = _run(TextEditorTool(), command="view", path=str(path), view_range=[2, 3])
+            results.append((result.output, result.error_code))
+        assert results[0] == results[1], content
+
+
+def test_multi_edit_applies_all_edits(tmp_path: Path):
+    first = tmp_path / "a.py"
+    second = tmp_path / "b.py"
+    _ = first.write_text("import os\n\ndef foo():\n    return 1\n\ndef bar():\n    return foo()\n")
+    _ = second.write_text("from a import foo\n")
+    tool = TextEditorTool()
+
+    result = _run(tool, command="multi_edit", path=str(first), edits=[
+        {"old_str": "def foo():", "new_str": "def baz():"},
+        {"old_str": "return foo()", "new_str": "return baz()"},
+        {"path": str(second), "old_str": "import foo", "new_str": "import baz"},
+    ])
+    assert result.error_code == 0, result.error
+    assert first.read_text() == "import os\n\ndef baz():\n    return 1\n\ndef bar():\n    return baz()\n"
+    assert second.read_text() == "from a import baz\n"
+    assert "3 edits have been applied to 2 file(s)" in (result.output or "")
+
+
+def test_multi_edit_is_all_or_nothing(tmp_path: Path):
+    path = tmp_path / "a.py"
+    original = "x = 1\ny = 1\n"
+    _ = path.write_text(original)
+    tool = TextEditorTool()
+
+    result = _run(tool, command="multi_edit", path=str(path), edits=[
+        {"old_str": "x = 1", "new_str": "x = 2"},
+        {"old_str": " = "},
+        {"old_str": "z = 1"},
+    ])
+    assert result.error_code == -1
+    assert "2 of 3 edits failed validation" in (result.error or "")
+    assert "Edit 2: No replacement was performed. Multiple occurrences" in (result.error or "")
+    assert "Edit 3:" in (result.error or "")
+    assert path.read_text() == original
+    assert [p.name for p in tmp_path.iterdir()] == ["a.py"]
+    # the edit that matched is not counted, it was never written
+    assert tool.edit_stats == {"exact": 0, "fuzzy": 0, "failed": 2}
+
+
+def test_multi_edit_restores_files_if_a_rename_fails(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    from trae_agent.tools import edit_tool
+
+    first, second = tmp_path / "a.py", tmp_path / "b.py"
+    _ = first.write_text("x = 1\n")
+    _ = second.write_text("y = 1\n")
+    tool = TextEditorTool()
+    replace = os.replace
+
+    def fail_on_second(source: str, target: Path):
+        if target == second:
+            raise OSError("disk full")
+        replace(source, target)
+
+    monkeypatch.setattr(edit_tool.os, "replace", fail_on_second)
+    result = _run(tool, command="multi_edit", path=str(first), edits=[
+        {"old_str": "x = 1", "new_str": "x = 2"},
+        {"path": str(second), "old_str": "y = 1", "new_str": "y = 2"},
+    ])
+    assert result.error_code == -1 and "disk full" in (result.error or "")
+    assert first.read_text() == "x = 1\n" and second.read_text() == "y = 1\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.py", "b.py"]
+    assert tool.edit_stats == {"exact": 0, "fuzzy": 0, "failed": 0}
+
+
+def test_undo_edit_reverts_edits_in_order(tmp_path: Path):
+    path = tmp_path / "a.py"
+    original = "\tdef foo():\n" + "".join(f"x{i} = {i}\n" for i in range(100))
+    _ = path.write_text(original)
+    tool = TextEditorTool()
+
+    assert _run(tool, command="str_replace", path=str(path), old_str="x10 = 10", new_str="x10 = 'ten'").error_code == 0
+    assert _run(tool, command="insert", path=str(path), insert_line=50, new_str="# inserted\n# lines").error_code == 0
+    after_first_edit = original.expandtabs().replace("x10 = 10", "x10 = 'ten'")
+
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == 0, result.error
+    assert path.read_text() == after_first_edit
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == 0, result.error
+    assert path.read_text() == original
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == -1
+    assert "No edit history" in (result.error or "")
+
+
+def test_undo_edit_removes_created_file_and_detects_outside_changes(tmp_path: Path):
+    path = tmp_path / "new.py"
+    tool = TextEditorTool()
+    assert _run(tool, command="create", path=str(path), file_text="print(1)\n").error_code == 0
+    assert _run(tool, command="undo_edit", path=str(path)).error_code == 0
+    assert not path.exists()
+
+    _ = path.write_text("a = 1\n")
+    assert _run(tool, command="str_replace", path=str(path), old_str="a = 1", new_str="a = 2").error_code == 0
+    _ = path.write_text("a = 3\n")
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == -1
+    assert "has been modified since its last edit" in (result.error or "")
+
+
+def test_undo_edit_of_files_written_with_crlf_line_endings(tmp_path: Path):
+    path = tmp_path / "new.py"
+    tool = TextEditorTool()
+    assert _run(tool, command="create", path=str(path), file_text="a = 1\r\nb = 2\r\n").error_code == 0
+    assert _run(tool, command="str_replace", path=str(path), old_str="b = 2", new_str="b = 3\r\nc = 4").error_code == 0
+
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == 0, result.error
+    assert path.read_text() == "a = 1\nb = 2\n"
+    result = _run(tool, command="undo_edit", path=str(path))
+    assert result.error_code == 0, result.error
+    assert not path.exists()
+
+
+def test_edit_history_respects_depth_and_memory_budget():
+    from trae_agent.tools.edit_history import EditHistory
+
+    history = EditHistory(max_depth=2, max_chars=1000)
+    path = Path("/tmp/a.py")
+    contents = [f"line {i}\n" * 3 for i in range(4)]
+    for old, new in zip(contents, contents[1:]):
+        history.record(path, old, new)
+    assert history.undo(path, contents[3], lambda _: None) == contents[2]
+    assert history.undo(path, contents[2], lambda _: None) == contents[1]
+    with pytest.raises(ToolError):
+        _ = history.undo(path, contents[1], lambda _: None)
+
+    other = Path("/tmp/b.py")
+    history.record(path, "a\n", "b\n")
+    history.record(other, "x" * 800 + "\n", "y\n")
+    with pytest.raises(ToolError):
+        _ = history.undo(path, "b\n", lambda _: None)
+    assert history.undo(other, "y\n", lambda _: None) == "x" * 800 + "\n"
+
+
+def test_directory_view_honors_gitignore_and_collapses(tmp_path: Path):
+    from trae_agent.tools.dir_listing import DirectoryLister
+
+    (tmp_path / ".git").mkdir()
+    _ = (tmp_path / ".gitignore").write_text("build/\n*.log\n!keep.log\n/docs/_generated\n")
+    for name in ["src", "build", "docs/_generated", "docs/guide", "node_modules/pkg"]:
+        (tmp_path / name).mkdir(parents=True)
+    for name in ["README.md", "setup.py", "src/main.py", "src/debug.log", "keep.log", "build/out.o", "docs/_generated/api.md"]:
+        _ = (tmp_path / name).write_text("")
+    for i in range(60):
+        _ = (tmp_path / "src" / f"module_{i:02}.py").write_text("")
+
+    listing = DirectoryLister().render(tmp_path).split("\n")
+    root = str(tmp_path)
+    assert listing[:3] == [root, f"{root}/README.md", f"{root}/setup.py"]
+    assert f"{root}/keep.log" in listing
+    assert f"{root}/node_modules/ [not expanded: 0 files, 1 directories]" in listing
+    assert f"{root}/docs/guide/" in listing
+    assert f"{root}/src/... [11 more entries not shown: 11 files, 0 directories]" in listing
+    assert not any("build" in line or "_generated" in line or "debug.log" in line for line in listing)
+
+
+def test_directory_listing_is_cached_until_directory_changes(tmp_path: Path):
+    from trae_agent.tools.dir_listing import DirectoryLister
+
+    lister = DirectoryLister()
+    _ = (tmp_path / "a.py").write_text("")
+    entries = lister.scan(tmp_path)
+    assert lister.scan(tmp_path) is entries
+    _ = (tmp_path / "b.py").write_text("")
+    os.utime(tmp_path, ns=(0, 1))
+    assert [e.name for e in lister.scan(tmp_path)] == ["a.py", "b.py"]
+
+
+def test_directory_listing_cache_evicts_least_recently_used(tmp_path: Path):
+    from trae_agent.tools.dir_listing import DirectoryLister
+
+    directories = [tmp_path / name for name in ("a", "b", "c")]
+    for directory in directories:
+        directory.mkdir()
+    lister = DirectoryLister(max_cached_listings=2)
+    a_entries = lister.scan(directories[0])
+    _ = lister.scan(directories[1])
+    assert lister.scan(directories[0]) is a_entries
+    _ = lister.scan(directories[2])
+    # `b` was used least recently
+    assert list(lister._listings) == [directories[0], directories[2]]  # pyright: ignore[reportPrivateUsage]
+
+
+def test_str_replace_falls_back_to_whitespace_tolerant_match(tmp_path: Path):
+    path = tmp_path / "a.py"
+    _ = path.write_text("class A:\n    def f(self):   \n        return 1\n\n    def g(self):\n        return 2\n")
+    tool = TextEditorTool()
+
+    # trailing whitespace differs
+    result = _run(tool, command="str_replace", path=str(path), old_str="    def f(self):\n", new_str="    def f(self, x):\n")
+    assert result.error_code == 0, result.error
+    assert "differing only in trailing whitespace at line 2 " in (result.output or "")
+    # indentation differs, new_str is re-indented
+    result = _run(tool, command="str_replace", path=str(path), old_str="def g(self):\n    return 2", new_str="def g(self):\n    return 3")
+    assert result.error_code == 0, result.error
+    assert path.read_text() == "class A:\n    def f(self, x):\n        return 1\n\n    def g(self):\n        return 3\n"
+    assert tool.get_stats() == {"exact_edits": 0, "fuzzy_edits": 2, "failed_edits": 0}
+
+
+def test_str_replace_fuzzy_match_requires_a_unique_confident_match(tmp_path: Path):
+    from trae_agent.tools.fuzzy_match import find_fuzzy_match
+
+    lines = ["def f():", "    total = compute(a, b)", "    return total", "", "def g():", "    return f()"]
+    match = find_fuzzy_match(lines, "def f():\n    total = compute(a,b )\n    return  total\n", "def f():\n    return 0\n")
+    assert match is not None
+    assert (match.start_line, match.end_line, match.strategy) == (0, 3, "whitespace")
+    assert match.new_lines == ["def f():", "    return 0"]
+
+    match = find_fuzzy_match(lines, "def f():\n    total = compute(a, c)\n    return total", "pass")
+    assert match is not None and match.strategy == "fuzzy" and match.start_line == 0
+    assert find_fuzzy_match(lines, "def h():\n    x = 1", "pass") is None
+
+    path = tmp_path / "a.py"
+    _ = path.write_text("if a:\n    x = 1\nif b:\n        x = 1\n")
+    tool = TextEditorTool()
+    result = _run(tool, command="str_replace", path=str(path), old_str="x  = 1", new_str="x = 2")
+    assert result.error_code == -1
+    assert "Ignoring whitespace differences it matches lines [2, 4]" in (result.error or "")
+    assert tool.edit_stats["failed"] == 1
+
+
+def test_undo_edit_keeps_the_edit_if_the_file_cannot_be_written(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    tool = TextEditorTool()
+    path = tmp_path / "a.py"
+    _ = path.write_text("one\n")
+    assert _run(tool, command="str_replace", path=str(path), old_str="one", new_str="two").error_code == 0
+
+    def fail(self, path, file):  # pyright: ignore
+        raise ToolError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(TextEditorTool, "write_file", fail)
+        assert _run(tool, command="undo_edit", path=str(path)).error_code != 0
+    assert path.read_text() == "two\n"
+    assert _run(tool, command="undo_edit", path=str(path)).error_code == 0
+    assert path.read_text() == "one\n"
+
+
+def test_ignore_rules_negate_character_classes_only_at_the_start(tmp_path: Path):
+    from trae_agent.tools.dir_listing import IgnoreRules
+
+    rules = IgnoreRules(tmp_path, ["file[a!b].txt", "log[!0-9].txt"])
+    assert rules.match(tmp_path / "file!.txt", is_dir=False)
+    assert rules.match(tmp_path / "filea.txt", is_dir=False)
+    assert not rules.match(tmp_path / "filec.txt", is_dir=False)
+    assert rules.match(tmp_path / "logx.txt", is_dir=False)
+    assert not rules.match(tmp_path / "log1.txt", is_dir=False)
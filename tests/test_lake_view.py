@@ -0,0 +1,316 @@
+"""Tests for the Lakeview summaries of agent steps."""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from trae_agent.agent.agent_basics import AgentState, AgentStep
+from trae_agent.tools.base import ToolCall
+from trae_agent.utils import lake_view
+from trae_agent.utils.config import Config, LakeviewBudget
+from trae_agent.utils.llm_basics import LLMMessage, LLMResponse
+
+
+class FakeLakeviewClient:
+    """Answers Lakeview prompts after a delay, tracking how many calls are in flight."""
+
+    delay: float = 0.2
+    lock: threading.Lock = threading.Lock()
+    in_flight: int = 0
+    max_in_flight: int = 0
+    calls: list[list[LLMMessage]] = []
+    tags: str = "EXAMINE_CODE"
+    failures: int = 0
+
+    def __init__(self, provider, model_parameters):  # pyright: ignore
+        pass
+
+    def chat(self, messages, model_parameters, tools=None, reuse_history=True) -> LLMResponse:  # pyright: ignore
+        cls = FakeLakeviewClient
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.calls.append(messages)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.in_flight -= 1
+            if cls.failures:
+                cls.failures -= 1
+                raise RuntimeError("the model is overloaded")
+        content = cls._answer(messages)
+        # like the providers, the answer ends before the first stop sequence
+        for stop in model_parameters.stop_sequences or []:
+            content = content.partition(stop)[0]
+        return LLMResponse(content=content)
+
+    @classmethod
+    def _answer(cls, messages: list[LLMMessage]) -> str:
+        if "<batch>" in (messages[0].content or ""):
+            ids = re.findall(r'<step id="(\d+)">', (messages[0].content or "").partition("<batch>")[2])
+            return "".join(
+                f'<step id="{n}"><task>The agent is reading code.</task><details>It opens main.py.</details><tags>EXAMINE_CODE</tags></step>'
+                for n in ids[:-1]  # the last step is left out of the answer
+            )
+        if "<tags>" in (messages[-1].content or ""):
+            return f"{cls.tags}</tags>"
+        return " is reading code.</task><details>It opens main.py.</details>"
+
+
+@pytest.fixture
+def config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Config:
+    monkeypatch.setattr(lake_view, "LLMClient", FakeLakeviewClient)
+    monkeypatch.setenv("TRAE_CACHE_DIR", str(tmp_path / "cache"))
+    FakeLakeviewClient.max_in_flight = 0
+    FakeLakeviewClient.calls = []
+    config_file = tmp_path / "trae_config.json"
+    _ = config_file.write_text(json.dumps({
+        "default_provider": "openai",
+        "model_providers": {"openai": {"model": "gpt-4o", "api_key": "test"}},
+        "lakeview_config": {"model_provider": "openai", "model_name": "gpt-4o", "max_concurrent_calls": 2,
+                            "max_batch_size": 1}
+    }))
+    return Config(str(config_file))
+
+
+@pytest.fixture
+def lakeview(config: Config) -> lake_view.LakeView:
+    return lake_view.LakeView(config)
+
+
+def _step(number: int, name: str = "bash", **arguments: str) -> AgentStep:
+    # by default a step that the rules leave to the model to tag
+    tool_call = ToolCall(name=name, call_id=f"call_{number}", arguments=arguments or {"command": "./build.sh"})
+    return AgentStep(step_number=number, state=AgentState.COMPLETED,
+                     llm_response=LLMResponse(content=f"Looking at step {number}", tool_calls=[tool_call]))
+
+
+def test_lakeview_calls_run_concurrently_off_the_event_loop(lakeview: lake_view.LakeView):
+    async def run() -> tuple[list[lake_view.LakeViewStep | None], int]:
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(lakeview.create_lakeview_step(_step(n)) for n in range(1, 4)))
+        _ = ticking.cancel()
+        return list(results), ticks
+
+    start = time.perf_counter()
+    results, ticks = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert all(result and result.tags_emoji and "reading code" in result.desc_task for result in results)
+    # 6 calls of 0.2s, two at a time, while the event loop kept running
+    assert FakeLakeviewClient.max_in_flight == 2
+    assert elapsed < 6 * FakeLakeviewClient.delay
+    assert ticks > 10
+
+
+def test_tagger_context_is_bounded(lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+
+    async def run():
+        for n in range(1, 31):
+            _ = await lakeview.create_lakeview_step(_step(n))
+
+    asyncio.run(run())
+
+    tagger_prompts = [m[0].content or "" for m in FakeLakeviewClient.calls if "<tags>" in (m[-1].content or "")]
+    extractor_prompts = [m[0].content or "" for m in FakeLakeviewClient.calls if "<tags>" not in (m[-1].content or "")]
+    assert len(tagger_prompts) == 30
+    # the tagger sees a window of recent steps with their tags, and a synopsis of the others
+    last = tagger_prompts[-1]
+    assert last.count("<step id=") == lake_view.TAGGER_WINDOW_STEPS
+    assert '<step id="29">' in last and '<step id="21">' not in last
+    assert "<tags>EXAMINE_CODE</tags>" in last
+    assert f'<earlier_steps count="{29 - lake_view.TAGGER_WINDOW_STEPS}">Tags of the earlier steps: EXAMINE_CODE in {29 - lake_view.TAGGER_WINDOW_STEPS}<' in last
+    assert len(last) < 2 * len(tagger_prompts[lake_view.TAGGER_WINDOW_STEPS])
+    assert "<previous_step>Looking at step 29" in extractor_prompts[-1]
+    assert "<previous_step>(none)" in extractor_prompts[0]
+    assert sorted(lakeview.step_tags) == list(range(1, 31))
+    assert lakeview.synopsis_tags["EXAMINE_CODE"] == lakeview.synopsis_steps
+
+
+def test_annotations_are_cached_across_runs(config: Config, lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    from trae_agent.utils.lake_view_cache import LakeViewCache
+
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+
+    async def run(view: lake_view.LakeView) -> list[lake_view.LakeViewStep | None]:
+        return [await view.create_lakeview_step(_step(n)) for n in range(1, 4)]
+
+    first = asyncio.run(run(lakeview))
+    assert len(FakeLakeviewClient.calls) == 6
+
+    # the same steps of another run are annotated from the cache
+    again = lake_view.LakeView(config)
+    assert asyncio.run(run(again)) == first
+    assert len(FakeLakeviewClient.calls) == 6
+    assert again.cache and again.cache.hits == 3
+    assert sorted(again.step_tags) == [1, 2, 3]
+
+    # the least recently used annotations are evicted
+    cache = LakeViewCache(lakeview.cache.db_path, max_entries=2)  # pyright: ignore
+    cache.put("new", "task", "details", ["THINK"])
+    assert cache.get("new") == ("task", "details", ["THINK"])
+    assert cache._connection.execute("SELECT count(*) FROM annotations").fetchone() == (2,)  # pyright: ignore
+
+
+def test_rules_tag_unambiguous_steps(lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    from trae_agent.utils.lake_view_rules import rule_based_tags
+
+    edit = "str_replace_based_edit_tool"
+    assert rule_based_tags(_step(1, edit, command="view", path="/repo/src/foo.py")) == ["EXAMINE_CODE"]
+    assert rule_based_tags(_step(1, edit, command="create", path="/repo/reproduce_bug.py")) == ["WRITE_TEST"]
+    assert rule_based_tags(_step(1, edit, command="str_replace", path="/repo/src/foo.py")) == ["WRITE_FIX"]
+    assert rule_based_tags(_step(1, edit, command="create", path="/repo/src/helper.py")) is None
+    assert rule_based_tags(_step(1, "task_done")) == ["REPORT"]
+    assert rule_based_tags(_step(1, "sequentialthinking", thought="hmm")) == ["THINK"]
+    assert rule_based_tags(_step(1, command="cd /repo && python -m pytest reproduce_bug.py")) == ["VERIFY_TEST"]
+    assert rule_based_tags(_step(1, command="python reproduce_bug.py"), fix_written=True) == ["VERIFY_FIX"]
+    assert rule_based_tags(_step(1, command="grep -rn foo src | head -20")) == ["EXAMINE_CODE"]
+    assert rule_based_tags(_step(1, command="pip install -e .")) == ["OUTLIER"]
+    assert rule_based_tags(_step(1, command="sed -i 's/a/b/' src/foo.py")) is None
+    assert rule_based_tags(_step(1, command="cat src/foo.py > /tmp/foo.py")) is None
+    assert rule_based_tags(_step(1, command="sed -n 10,20p src/foo.py")) == ["EXAMINE_CODE"]
+    assert rule_based_tags(_step(1, command="sort -u names.txt | uniq -c")) == ["EXAMINE_CODE"]
+    # read-only commands that write files or run other commands after all
+    for command in ("find . -delete", "find . -name '*.py' -exec sed -i s/a/b/ {} +", "sort -o out in",
+                    "sort -uo out in", "awk 'BEGIN{system(\"rm x\")}'", "echo $(rm -rf build)", "echo `rm x`",
+                    "uniq in out", "sed -n 'w out' in", "git diff --output=patch", "rg --pre ./run foo"):
+        assert rule_based_tags(_step(1, command=command)) is None, command
+    # steps that write files before running them are left to the model
+    for command in ("cat > /repo/reproduce.py << EOF\nprint(1)\nEOF\npython /repo/reproduce.py",
+                    "sed -i s/a/b/ src/x.py && pytest", "echo 'assert False' > test_bug.py && python test_bug.py"):
+        assert rule_based_tags(_step(1, command=command)) is None, command
+    assert rule_based_tags(_step(1, command="cd /repo && pytest -x 2>&1 | tail -20")) == ["VERIFY_TEST"]
+
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+    steps = [
+        _step(1, edit, command="view", path="/repo/src/foo.py"),
+        _step(2, edit, command="str_replace", path="/repo/src/foo.py"),
+        _step(3, command="python -m pytest tests/test_foo.py"),
+        _step(4),
+    ]
+
+    async def run():
+        for step in steps:
+            _ = await lakeview.create_lakeview_step(step)
+
+    asyncio.run(run())
+    # only the step the rules could not tag asks the model for its tags
+    tagger_calls = [m for m in FakeLakeviewClient.calls if "<tags>" in (m[-1].content or "")]
+    assert len(tagger_calls) == 1 and "./build.sh" in (tagger_calls[0][0].content or "")
+    assert lakeview.step_tags[3] == ["VERIFY_FIX"]
+    assert lakeview.stats == {"rule_tagged_steps": 3, "model_tagged_steps": 1}
+
+
+def test_pending_steps_are_batched(lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+    lakeview.max_batch_size, lakeview.max_batch_wait = 3, 0.05
+
+    async def run() -> list[lake_view.LakeViewStep | None]:
+        return list(await asyncio.gather(*(lakeview.create_lakeview_step(_step(n)) for n in range(1, 6))))
+
+    results = asyncio.run(run())
+
+    assert all(result and result.tags_emoji and "reading code" in result.desc_task for result in results)
+    assert results[0] == lake_view.LakeViewStep(" is reading code.", "[italic]It opens main.py.[/italic]", "👁️EXAMINE_CODE")
+    # steps 1-3 at the maximum size and steps 4-5 after the wait; the last step of each is annotated alone
+    batch_calls = [m for m in FakeLakeviewClient.calls if "<batch>" in (m[0].content or "")]
+    assert len(batch_calls) == 2 and len(FakeLakeviewClient.calls) == 2 + 2 * 2
+    assert lakeview.stats == {"model_tagged_steps": 5, "batch_calls": 2, "batched_steps": 3}
+
+
+def test_budgets_bound_the_calls(config: Config, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+    # the tagger never gives a well-formed answer
+    monkeypatch.setattr(FakeLakeviewClient, "tags", "no idea")
+    assert config.lakeview_config
+    config.lakeview_config.step_budget = LakeviewBudget(max_calls=3)
+    config.lakeview_config.run_budget = LakeviewBudget(max_calls=5)
+    lakeview = lake_view.LakeView(config)
+
+    async def run() -> list[lake_view.LakeViewStep | None]:
+        return [await lakeview.create_lakeview_step(step) for step in (_step(1), _step(2), _step(3, "task_done"))]
+
+    # step 1 spends its 3 calls, step 2 the remaining 2 of the run, and step 3 makes none
+    assert asyncio.run(run()) == [None, None, None]
+    assert len(FakeLakeviewClient.calls) == 5
+    assert lakeview.step_tags[3] == ["REPORT"]
+    stats = lakeview.get_stats()
+    assert stats["over_budget_steps"] == 3 and stats["calls"] == 5 and stats["tokens"] == 0
+    # the extractor and the tagger stop at the end of their answers, leaving the shared parameters as they are
+    assert lakeview._tagger_parameters.stop_sequences == ["</tags>"]  # pyright: ignore
+    assert lakeview.model_parameters.temperature == config.model_providers["openai"].temperature
+    assert lakeview.model_parameters.stop_sequences is None
+
+
+def test_rule_tags_override_cached_tags(config: Config, lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+    steps = [_step(1, "str_replace_based_edit_tool", command="view", path="/repo/src/foo.py"),
+             _step(2, command="python -m pytest tests/test_foo.py")]
+
+    async def run(view: lake_view.LakeView):
+        for step in steps:
+            _ = await view.create_lakeview_step(step)
+
+    asyncio.run(run(lakeview))
+    assert lakeview.step_tags[2] == ["VERIFY_TEST"]
+
+    # the same steps, cached, in a run that already wrote a fix
+    again = lake_view.LakeView(config)
+    again.first_fix_step = 1
+    asyncio.run(run(again))
+    assert again.stats["cached_steps"] == 2
+    assert again.step_tags[2] == ["VERIFY_FIX"]
+
+
+def test_budget_bounds_the_time_of_calls(config: Config, monkeypatch: pytest.MonkeyPatch):
+    # a call that hangs far longer than the step may take
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 1.0)
+    assert config.lakeview_config
+    config.lakeview_config.step_budget = LakeviewBudget(max_seconds=0.2)
+    lakeview = lake_view.LakeView(config)
+
+    start = time.perf_counter()
+    assert asyncio.run(lakeview.create_lakeview_step(_step(1))) is None
+    assert time.perf_counter() - start < 0.8
+    assert lakeview.stats["over_budget_steps"] == 1
+
+
+def test_failed_requests_are_retried_within_the_budget(lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.0)
+    monkeypatch.setattr(FakeLakeviewClient, "failures", 1)
+    monkeypatch.setattr(lake_view, "REQUEST_RETRY_DELAY", 0.0)
+
+    result = asyncio.run(lakeview.create_lakeview_step(_step(1)))
+
+    assert result and "reading code" in result.desc_task
+    # the failed attempt is charged like the others
+    assert lakeview.get_stats()["calls"] == 3
+    assert lakeview.model_parameters.max_retries == 1
+
+
+def test_cancelled_steps_do_not_stall_their_batch(lakeview: lake_view.LakeView, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(FakeLakeviewClient, "delay", 0.1)
+    lakeview.max_batch_size, lakeview.max_batch_wait = 4, 0.05
+
+    async def run() -> list[lake_view.LakeViewStep | None]:
+        tasks = [asyncio.create_task(lakeview.create_lakeview_step(_step(n))) for n in range(1, 4)]
+        # cancelled while the request for its batch is in flight
+        await asyncio.sleep(0.1)
+        _ = tasks[0].cancel()
+        return list(await asyncio.wait_for(asyncio.gather(*tasks[1:]), 5))
+
+    results = asyncio.run(run())
+    assert all(result and "reading code" in result.desc_task for result in results)
@@ -0,0 +1,86 @@
+"""Tests for the tool output compaction pipeline."""
+
+import asyncio
+
+from trae_agent.tools.base import Tool, ToolCall, ToolExecResult, ToolExecutor, ToolParameter
+from trae_agent.tools.output_compaction import (
+    AnsiStripStrategy,
+    FailureReportStrategy,
+    HeadTailStrategy,
+    OutputCompactor,
+    RepeatedLineCollapseStrategy,
+)
+
+
+def test_ansi_and_progress_bars_are_stripped():
+    content = "\x1b[32mPASSED\x1b[0m\n 40%|████      | 4/10\r 80%|████████  | 8/10\r100%|██████████| 10/10\ndone"
+    result = AnsiStripStrategy().compact(content, 1000)
+    assert result == "PASSED\n100%|██████████| 10/10\ndone"
+
+
+def test_near_identical_lines_are_collapsed():
+    lines = [f"Downloading chunk {i} of 300" for i in range(1, 301)]
+    result = RepeatedLineCollapseStrategy().compact("\n".join(["start"] + lines + ["end"]), 1000)
+    assert result.split("\n") == [
+        "start",
+        "Downloading chunk 1 of 300",
+        "[... 298 similar lines omitted ...]",
+        "Downloading chunk 300 of 300",
+        "end",
+    ]
+
+
+def test_numbered_lines_within_budget_are_kept():
+    content = "\n".join(f"foo.py:{i}: value = compute({i})" for i in range(1, 6))
+    assert RepeatedLineCollapseStrategy().compact(content, 1000) == content
+    assert OutputCompactor(max_chars=1000).compact(content) == (content, [])
+
+
+def test_identical_lines_are_counted():
+    result = RepeatedLineCollapseStrategy().compact("a\nwarning\nwarning\nwarning\nb", 1000)
+    assert result == "a\nwarning\n[previous line repeated 2 more times]\nb"
+
+
+def test_pytest_failure_report_is_kept():
+    header = [f"header {i}" for i in range(10)]
+    progress = [f"tests/test_mod.py::test_case PASSED [{i}]" for i in range(2000)]
+    report = ["=" * 20 + " FAILURES " + "=" * 20, "E   assert 1 == 2", "=" * 20 + " 1 failed " + "=" * 20]
+    content = "\n".join(header + progress + report)
+    result = FailureReportStrategy().compact(content, 1000)
+    assert result.startswith("header 0")
+    assert "2000 lines of test progress omitted" in result
+    assert result.endswith("\n".join(report))
+
+
+def test_head_and_tail_are_preserved():
+    content = "\n".join(f"line {i}" for i in range(10000))
+    result = HeadTailStrategy().compact(content, 1000)
+    assert len(result) < 1200
+    assert result.startswith("line 0\n")
+    assert result.endswith("line 9999")
+    assert "omitted from the middle of the output" in result
+
+
+class _EchoTool(Tool):
+    def get_name(self) -> str:
+        return "bash"
+
+    def get_description(self) -> str:
+        return "echo"
+
+    def get_parameters(self) -> list[ToolParameter]:
+        return []
+
+    async def execute(self, arguments):
+        return ToolExecResult(output=str(arguments["text"]))
+
+
+def test_executor_records_compaction_sizes():
+    executor = ToolExecutor([_EchoTool()], OutputCompactor(max_chars=500))
+    text = "\n".join(["same line"] * 1000)
+    result = asyncio.run(executor.execute_tool_call(ToolCall(name="bash", call_id="1", arguments={"text": text})))
+    assert result.success
+    assert result.compaction is not None
+    assert result.compaction.raw_chars == len(text)
+    assert result.compaction.compacted_chars == len(result.result or "")
+    assert result.compaction.strategies == ["collapse_repeats"]
@@ -0,0 +1,170 @@
+"""Tests for resuming interrupted runs from their trajectories."""
+
+import asyncio
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from trae_agent.agent import TraeAgent
+from trae_agent.agent.agent_basics import AgentError
+from trae_agent.agent.resume import load_resume_point
+from trae_agent.tools.base import ToolCall
+from trae_agent.utils.config import Config
+from trae_agent.utils.llm_basics import LLMMessage, LLMResponse, LLMUsage
+from trae_agent.utils.trajectory_reader import load_trajectory
+
+EDIT_TOOL = "str_replace_based_edit_tool"
+
+
+class ScriptedClient:
+    """Stands in for an LLM client, answering with file creations until `interrupt_at` or `task_done`."""
+
+    def __init__(self, agent: TraeAgent, interrupt_at: int | None = None, first_step: int = 1):
+        self.agent: TraeAgent = agent
+        self.interrupt_at: int | None = interrupt_at
+        self.first_step: int = first_step
+        self.calls: list[list[LLMMessage]] = []
+        self.history: list[LLMMessage] | None = None
+
+    def set_chat_history(self, messages: list[LLMMessage]) -> None:
+        self.history = messages
+
+    def chat(self, messages, model_parameters, tools=None, reuse_history=True) -> LLMResponse:  # pyright: ignore
+        self.calls.append(messages)
+        number = self.first_step + len(self.calls) - 1
+        if number == self.interrupt_at:
+            raise KeyboardInterrupt
+        if self.interrupt_at is None:
+            tool_call = ToolCall(name="task_done", call_id=f"call_{number}", arguments={})
+        else:
+            path = f"{self.agent.project_path}/step_{number}.txt"
+            tool_call = ToolCall(name=EDIT_TOOL, call_id=f"call_{number}", arguments={"command": "create", "path": path, "file_text": "done"})
+        response = LLMResponse(content=f"step {number}", usage=LLMUsage(100, 10), model="gpt-4o", tool_calls=[tool_call])
+        recorder = self.agent.trajectory_recorder
+        if recorder:
+            recorder.record_llm_interaction(messages, response, provider="openai", model="gpt-4o")
+        return response
+
+
+def _agent(tmp_path: Path) -> TraeAgent:
+    config_file = tmp_path / "trae_config.json"
+    _ = config_file.write_text(json.dumps({
+        "default_provider": "openai",
+        "model_providers": {"openai": {"model": "gpt-4o", "api_key": "test"}}
+    }))
+    return TraeAgent(Config(str(config_file)))
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    project = tmp_path / "project"
+    project.mkdir()
+    for args in (["init", "-q"], ["config", "user.email", "a@b.c"], ["config", "user.name", "a"]):
+        _ = subprocess.run(["git", *args], cwd=project, check=True)
+    _ = (project / "main.py").write_text("print('hi')\n")
+    _ = subprocess.run(["git", "add", "."], cwd=project, check=True)
+    _ = subprocess.run(["git", "commit", "-q", "-m", "init"], cwd=project, check=True)
+    return project
+
+
+def _interrupted_run(tmp_path: Path, project: Path) -> Path:
+    trajectory = project / "trajectory.jsonl"
+    agent = _agent(tmp_path)
+    _ = agent.setup_trajectory_recording(str(trajectory))
+    agent.new_task("Fix it", {"project_path": str(project), "issue": "Fix it"}, tool_names=[EDIT_TOOL, "task_done"])
+    agent.llm_client.client = ScriptedClient(agent, interrupt_at=3)  # pyright: ignore
+    with pytest.raises(KeyboardInterrupt):
+        _ = asyncio.run(agent.execute_task())
+    assert agent.trajectory_recorder
+    agent.trajectory_recorder.close()
+    return trajectory
+
+
+def test_resume_continues_after_last_completed_step(tmp_path: Path, project: Path):
+    trajectory = _interrupted_run(tmp_path, project)
+    assert sorted(p.name for p in project.glob("step_*")) == ["step_1.txt", "step_2.txt"]
+
+    point = load_resume_point(trajectory)
+    assert point.task == "Fix it" and point.next_step_number == 3
+    assert point.total_tokens == LLMUsage(200, 20)
+
+    agent = _agent(tmp_path)
+    agent.new_task(point.task, {"project_path": str(project), "issue": point.task}, tool_names=[EDIT_TOOL, "task_done"])
+    agent.resume(point)
+    _ = agent.setup_trajectory_recording(str(trajectory))
+    client = ScriptedClient(agent, first_step=3)
+    agent.llm_client.client = client  # pyright: ignore
+    execution = asyncio.run(agent.execute_task())
+
+    # only the next step calls the LLM, with the recorded conversation as its history
+    assert len(client.calls) == 1
+    assert [m.tool_result.call_id for m in client.calls[0] if m.tool_result] == ["call_2"]
+    assert client.history is not None
+    assert [m.role for m in client.history] == ["system", "user", "assistant", "assistant", "user", "assistant", "assistant"]
+    assert client.history[3].tool_call and client.history[3].tool_call.call_id == "call_1"
+    assert execution.success and [step.step_number for step in execution.steps] == [1, 2, 3]
+
+    recorded = load_trajectory(trajectory)
+    assert [step["step_number"] for step in recorded["agent_steps"]] == [1, 2, 3]
+    # every step records the durations of its phases
+    timings = recorded["agent_steps"][0]["timings"]
+    assert timings["tools"] > 0 and list(timings["tool_calls"]) == ["call_1"]
+    assert timings["total"] >= timings["llm"] + timings["tools"]
+    assert recorded["agent_steps"][0]["duration"] == timings["total"]
+    # recording the step itself is part of its recording phase, in the trajectory and in the execution
+    assert recorded["agent_steps"][-1]["timings"]["recording"] == execution.steps[-1].timings.recording > 0
+    assert recorded["agent_steps"][-1]["timings"]["total"] == execution.steps[-1].timings.total
+    assert recorded["llm_interactions"][0]["response"]["timings"]["retries"] == 0
+    assert set(execution.phase_times()) >= {"llm_request", "tools", "recording", "console", "other"}
+    assert recorded["success"] is True
+    with pytest.raises(AgentError):
+        _ = load_resume_point(trajectory)
+
+
+def test_resume_checks_workspace_or_replays_tools(tmp_path: Path, project: Path):
+    trajectory = _interrupted_run(tmp_path, project)
+    point = load_resume_point(trajectory)
+    agent = _agent(tmp_path)
+    agent.new_task(point.task, {"project_path": str(project), "issue": point.task}, tool_names=[EDIT_TOOL, "task_done"])
+
+    # a fresh checkout does not have the changes of the recorded steps
+    for path in project.glob("step_*"):
+        path.unlink()
+    with pytest.raises(AgentError):
+        agent.resume(point)
+
+    agent.resume(point, replay_tools=True)
+    _ = agent.setup_trajectory_recording(str(trajectory))
+    agent.llm_client.client = ScriptedClient(agent, first_step=3)  # pyright: ignore
+    execution = asyncio.run(agent.execute_task())
+    assert execution.success
+    assert sorted(p.name for p in project.glob("step_*")) == ["step_1.txt", "step_2.txt"]
+    assert load_trajectory(trajectory)["stats"]["resume"] == {"replayed_tool_calls": 2, "mismatched_tool_calls": 0}
+
+
+def test_fingerprint_reads_only_changed_files(project: Path, monkeypatch: pytest.MonkeyPatch):
+    import os
+
+    from trae_agent.agent import resume
+
+    fingerprinter = resume.WorkspaceFingerprinter(str(project))
+    clean = fingerprinter.fingerprint()
+    _ = (project / "main.py").write_text("print('bye')\n")
+    _ = (project / "new.py").write_text("x = 1\n")
+    # as if written long enough ago that their mtime can be trusted
+    for name in ("main.py", "new.py"):
+        os.utime(project / name, (1_000_000_000, 1_000_000_000))
+    changed = fingerprinter.fingerprint()
+    assert clean and changed and clean["head"] == changed["head"] and clean["changes"] != changed["changes"]
+
+    read: list[str] = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda path, *args: read.append(os.path.basename(path)) or real_open(path, *args))  # pyright: ignore
+    assert fingerprinter.fingerprint() == changed
+    assert read == []
+    _ = (project / "new.py").write_text("x = 2\n")
+    assert fingerprinter.fingerprint() != changed
+    assert read == ["new.py"]
+    assert resume.workspace_fingerprint(str(project), exclude=[str(project / "new.py")]) != fingerprinter.fingerprint()
@@ -0,0 +1,118 @@
+"""Tests for the symbol index tool."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from trae_agent.tools.symbol_index import SymbolIndex, parse_symbols
+from trae_agent.tools.symbols_tool import SymbolsTool
+
+SOURCE = '''import os
+from .base import Base
+
+
+class Service(Base):
+    def run(self, retries: int = 3) -> bool:
+        return helper(os.getcwd())
+
+
+def helper(path):
+    return Service().run()
+'''
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("TRAE_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def _run(tool: SymbolsTool, **arguments):
+    return asyncio.run(tool.execute(arguments))
+
+
+def _project(tmp_path: Path) -> Path:
+    project = tmp_path / "project"
+    (project / "pkg").mkdir(parents=True)
+    _ = (project / "pkg" / "service.py").write_text(SOURCE)
+    _ = (project / "pkg" / "broken.py").write_text("def broken(:\n")
+    _ = (project / "main.py").write_text("from pkg.service import helper\n\nhelper('.')\n")
+    return project
+
+
+def test_parse_symbols():
+    symbols = parse_symbols(SOURCE.encode())
+    assert [(d.qualname, d.kind, d.line, d.end_line) for d in symbols.definitions] == [
+        ("Service", "class", 5, 7),
+        ("Service.run", "method", 6, 7),
+        ("helper", "function", 10, 11),
+    ]
+    assert symbols.definitions[1].signature == "def run(self, retries: int=3) -> bool"
+    calls = [(r.name, r.line, r.scope) for r in symbols.references if r.kind == "call"]
+    assert calls == [("helper", 7, "Service.run"), ("getcwd", 7, "Service.run"), ("run", 11, "helper"), ("Service", 11, "helper")]
+    assert parse_symbols(b"def broken(:\n").error is not None
+
+
+def test_index_parses_only_changed_files(tmp_path: Path):
+    project = _project(tmp_path)
+    db_path = tmp_path / "symbols.sqlite3"
+    index = SymbolIndex(project, db_path)
+    index.update()
+    assert index.parsed_files == 3
+    assert [p.name for p, _ in index.find_definitions("Service.run")] == ["service.py"]
+
+    # a fresh index reuses the cached parse results
+    index = SymbolIndex(project, db_path)
+    index.update()
+    assert index.parsed_files == 0
+
+    _ = (project / "main.py").write_text("def helper():\n    pass\n")
+    index.update()
+    assert index.parsed_files == 1
+    assert sorted(p.name for p, _ in index.find_definitions("helper")) == ["main.py", "service.py"]
+    assert [p.name for p, _ in index.find_references("helper", calls_only=True)] == ["service.py"]
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path: Path):
+    import sqlite3
+
+    project = _project(tmp_path)
+    db_path = tmp_path / "symbols.sqlite3"
+    index = SymbolIndex(project, db_path, max_cached_files=2)
+    index.update()
+    assert index.parsed_files == 3
+    connection = sqlite3.connect(db_path)
+    assert connection.execute("SELECT count(*) FROM parsed").fetchone() == (2,)
+    connection.close()
+
+
+def test_symbols_tool_commands(tmp_path: Path):
+    project = _project(tmp_path)
+    tool = SymbolsTool()
+    tool.set_project_path(str(project))
+
+    result = _run(tool, command="definition", name="helper")
+    assert result.output == "Found 1 definitions of `helper`:\npkg/service.py:10-11: function helper: def helper(path)"
+
+    result = _run(tool, command="callers", name="helper")
+    assert result.output == (
+        "Found 2 lines with calls of `helper`:\n"
+        "main.py:3: helper('.')\n"
+        "pkg/service.py:7 (in Service.run): return helper(os.getcwd())"
+    )
+
+    result = _run(tool, command="references", name="helper")
+    assert result.output is not None and "main.py:1: from pkg.service import helper" in result.output
+
+    result = _run(tool, command="outline", path=str(project / "pkg" / "service.py"))
+    assert result.output == (
+        f"Outline of {project / 'pkg' / 'service.py'}:\n"
+        "5-7: class Service(Base)\n"
+        "    6-7: def run(self, retries: int=3) -> bool\n"
+        "10-11: def helper(path)"
+    )
+
+    result = _run(tool, command="outline", path=str(project / "pkg" / "broken.py"))
+    assert result.error is not None and "cannot be parsed" in result.error
+    result = _run(tool, command="definition")
+    assert result.error == "Parameter `name` is required for command: definition"
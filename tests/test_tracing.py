@@ -0,0 +1,105 @@
+"""Tests for exporting spans of agent, LLM and tool operations."""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from trae_agent.tools.base import ToolCall, ToolExecutor
+from trae_agent.tools.task_done_tool import TaskDoneTool
+from trae_agent.utils import openai_client, tracing
+from trae_agent.utils.config import ModelParameters, TracingConfig
+from trae_agent.utils.llm_basics import LLMMessage, LLMResponse, LLMUsage
+from trae_agent.utils.llm_client import LLMClient
+from trae_agent.utils.openai_client import OpenAIClient
+
+
+class FakeClient:
+    def chat(self, messages, model_parameters, tools=None, reuse_history=True) -> LLMResponse:  # pyright: ignore
+        return LLMResponse(content="hi", usage=LLMUsage(12, 3), model="gpt-4o", finish_reason="stop")
+
+
+@pytest.fixture
+def trace_file(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    _ = tracing.configure_tracing(TracingConfig(enabled=True, file=str(path)))
+    yield path
+    _ = tracing.configure_tracing(None)
+
+
+def _spans(path: Path) -> dict[str, dict]:  # pyright: ignore
+    tracing.get_tracer().shutdown()
+    spans = {}
+    for line in path.read_text().splitlines():
+        for resource_spans in json.loads(line)["resourceSpans"]:
+            for scope_spans in resource_spans["scopeSpans"]:
+                for span in scope_spans["spans"]:
+                    span["attributes"] = {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+                    spans[span["name"]] = span
+    return spans
+
+
+def test_spans_are_nested_and_carry_attributes(trace_file: Path):
+    model_parameters = ModelParameters("gpt-4o", "test", 100, 0.5, 1, 0, False, 1)
+    client = LLMClient("openai", model_parameters)
+    client.client = FakeClient()  # pyright: ignore
+    executor = ToolExecutor([TaskDoneTool()])
+
+    with tracing.get_tracer().span("agent.execute_task"):
+        _ = client.chat([], model_parameters)
+        _ = asyncio.run(executor.execute_tool_call(ToolCall(name="task_done", call_id="call_1", arguments={})))
+        _ = asyncio.run(executor.execute_tool_call(ToolCall(name="missing", call_id="call_2", arguments={})))
+
+    spans = _spans(trace_file)
+    root, chat, tool = spans["agent.execute_task"], spans["llm.chat"], spans["tool.execute"]
+    assert "parentSpanId" not in root
+    assert chat["parentSpanId"] == tool["parentSpanId"] == root["spanId"]
+    assert chat["traceId"] == tool["traceId"] == root["traceId"]
+    assert chat["attributes"]["gen_ai.request.model"] == "gpt-4o"
+    assert chat["attributes"]["gen_ai.usage.input_tokens"] == "12"
+    # the last tool call failed, its span has the error status
+    assert tool["attributes"]["gen_ai.tool.name"] == "missing"
+    assert tool["status"]["code"] == tracing.STATUS_ERROR
+    assert int(tool["endTimeUnixNano"]) >= int(tool["startTimeUnixNano"])
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer()
+    with tracer.span("llm.chat", {"gen_ai.request.model": "gpt-4o"}) as span:
+        span.set_attribute("gen_ai.usage.input_tokens", 1)
+    assert span is tracing.NOOP_SPAN and not span.attributes
+    assert tracer.current_span() is tracing.NOOP_SPAN
+
+
+class FlakyResponses:
+    """Stands in for the Responses API, failing the first call and answering the next one after `delay` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay: float = delay
+        self.calls: int = 0
+
+    def create(self, **kwargs):  # pyright: ignore
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(self.delay)
+            raise ConnectionError("rate limited")
+        time.sleep(self.delay)
+        return SimpleNamespace(output=[], usage=None, model="gpt-4o", status="completed")
+
+
+def test_llm_timings_measure_retries_and_request(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(openai_client.random, "randint", lambda a, b: 0)  # pyright: ignore
+    model_parameters = ModelParameters("gpt-4o", "test", 100, 0.5, 1, 0, False, 3)
+    client = OpenAIClient(model_parameters)
+    client.client = SimpleNamespace(responses=FlakyResponses(delay=0.05))  # pyright: ignore
+
+    timings = client.chat([LLMMessage(role="user", content="hi")], model_parameters).timings
+
+    assert timings.retries == 1
+    # the failed attempt is queued time, the attempt that succeeded is the request
+    assert 0.05 <= timings.queued < 0.5
+    assert 0.05 <= timings.request < 0.5
+    assert 0 <= timings.parsing < timings.request
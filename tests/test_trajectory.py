@@ -0,0 +1,287 @@
+"""Tests for trajectory recording and reading."""
+
+import json
+from pathlib import Path
+
+from trae_agent.tools.base import ToolCall, ToolResult
+from trae_agent.utils.llm_basics import LLMMessage, LLMResponse, LLMUsage
+from trae_agent.utils.trajectory_reader import iter_events, load_trajectory
+from trae_agent.utils.trajectory_recorder import TrajectoryRecorder
+
+
+def _record(path: Path, steps: int = 2, finalize: bool = True) -> TrajectoryRecorder:
+    recorder = TrajectoryRecorder(str(path))
+    recorder.start_recording(task="Fix the bug", provider="openai", model="gpt-4o", max_steps=10)
+    messages = [LLMMessage(role="system", content="You are an agent."), LLMMessage(role="user", content="Fix the bug")]
+    for step_number in range(1, steps + 1):
+        tool_call = ToolCall(name="bash", call_id=f"call_{step_number}", arguments={"command": "ls"})
+        response = LLMResponse(content="", usage=LLMUsage(10, 5), model="gpt-4o", tool_calls=[tool_call])
+        recorder.record_llm_interaction(messages, response, provider="openai", model="gpt-4o")
+        _ = recorder.record_agent_step(
+            step_number=step_number,
+            state="completed",
+            llm_messages=messages,
+            llm_response=response,
+            tool_calls=[tool_call],
+            tool_results=[ToolResult(call_id=f"call_{step_number}", success=True, result="a.py\n")]
+        )
+    recorder.record_stats("str_replace_based_edit_tool", {"exact_edits": 1})
+    if finalize:
+        recorder.finalize_recording(success=True, final_result="done")
+    return recorder
+
+
+def test_recorder_appends_one_event_per_line(tmp_path: Path):
+    path = tmp_path / "trajectory.jsonl"
+    _ = _record(path, steps=3)
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [event["type"] for event in events] == (
+        ["header"] + ["llm_interaction", "agent_step"] * 3 + ["stats", "footer"]
+    )
+    assert events[0]["task"] == "Fix the bug"
+    assert events[-1]["success"] is True
+
+
+def test_load_trajectory_rebuilds_json_layout(tmp_path: Path):
+    path = tmp_path / "trajectory.jsonl"
+    _ = _record(path)
+
+    trajectory = load_trajectory(path)
+    assert trajectory["task"] == "Fix the bug"
+    assert trajectory["max_steps"] == 10
+    assert [step["step_number"] for step in trajectory["agent_steps"]] == [1, 2]
+    assert len(trajectory["llm_interactions"]) == 2
+    assert trajectory["agent_steps"][0]["tool_results"][0]["result"] == "a.py\n"
+    assert trajectory["stats"] == {"str_replace_based_edit_tool": {"exact_edits": 1}}
+    assert (trajectory["success"], trajectory["final_result"]) == (True, "done")
+
+    # the older single JSON document format is read as well
+    legacy = tmp_path / "legacy.json"
+    _ = legacy.write_text(json.dumps(trajectory, indent=2))
+    assert load_trajectory(legacy) == trajectory
+
+
+def test_interrupted_trajectory_can_be_read(tmp_path: Path):
+    path = tmp_path / "trajectory.jsonl"
+    recorder = _record(path, finalize=False)
+    recorder.close()
+    with open(path, "a") as f:
+        _ = f.write('{"type": "agent_step", "step_num')
+
+    events = list(iter_events(path))
+    assert events[-1]["type"] == "stats"
+    assert load_trajectory(path)["end_time"] == ""
+
+
+def test_writer_batches_events_until_flushed(tmp_path: Path):
+    from trae_agent.utils.trajectory_writer import TrajectoryWriter
+
+    path = tmp_path / "events.jsonl"
+    writer = TrajectoryWriter(path, fsync_policy="none", flush_interval=60, max_batch_bytes=10 * 1024 * 1024)
+    for i in range(100):
+        writer.write({"type": "agent_step", "step_number": i})
+    writer.write({"type": "bad", "value": object()})
+    assert path.read_text() == ""
+
+    writer.flush()
+    assert len(path.read_text().splitlines()) == 100
+    writer.write({"type": "footer"})
+    writer.close()
+    assert writer.events_written == 101
+    writer.close()
+
+
+def test_writer_per_event_fsync_and_exit_handler(tmp_path: Path):
+    from trae_agent.utils.trajectory_writer import TrajectoryWriter, _close_open_writers, _open_writers
+
+    path = tmp_path / "events.jsonl"
+    _ = path.write_text('{"type": "old"}\n')
+    writer = TrajectoryWriter(path, fsync_policy="event", truncate=True, flush_interval=60)
+    writer.write({"type": "header"})
+    writer.write({"type": "agent_step"})
+    assert writer in _open_writers
+
+    _close_open_writers()
+    assert writer not in _open_writers
+    assert [event["type"] for event in iter_events(path)] == ["header", "agent_step"]
+
+
+def test_long_message_bodies_are_stored_once(tmp_path: Path):
+    path = tmp_path / "trajectory.jsonl"
+    recorder = TrajectoryRecorder(str(path))
+    recorder.start_recording(task="Fix the bug", provider="openai", model="gpt-4o", max_steps=10)
+    system_prompt = "You are an expert software engineer. " * 50
+    tool_output = "".join(f"line {i}\n" for i in range(200))
+    messages = [LLMMessage(role="system", content=system_prompt)]
+    for step_number in range(1, 6):
+        messages.append(LLMMessage(role="user", content=tool_output))
+        response = LLMResponse(content="ok", usage=LLMUsage(10, 5), model="gpt-4o")
+        recorder.record_llm_interaction(list(messages), response, provider="openai", model="gpt-4o")
+        _ = recorder.record_agent_step(step_number=step_number, state="completed", llm_messages=list(messages))
+    recorder.finalize_recording(success=True)
+
+    raw_events = list(iter_events(path, expand=False))
+    blobs = [event for event in raw_events if event["type"] == "blob"]
+    assert sorted(len(event["data"]) for event in blobs) == sorted([len(system_prompt), len(tool_output)])
+    # every body is referenced by 5 interactions and 5 steps, the tool output up to 5 times in each
+    undeduplicated_size = 2 * (5 * len(system_prompt) + 15 * len(tool_output))
+    assert path.stat().st_size < undeduplicated_size / 5
+
+    trajectory = load_trajectory(path)
+    last_step = trajectory["agent_steps"][-1]
+    assert last_step["llm_messages"][0]["content"] == system_prompt
+    assert [m["content"] for m in last_step["llm_messages"][1:]] == [tool_output] * 5
+    assert trajectory["llm_interactions"][2]["input_messages"][0]["content"] == system_prompt
+
+
+def test_compressed_trajectory_random_access(tmp_path: Path):
+    from trae_agent.utils.trajectory_archive import CompressedTrajectory, compress_trajectory, decompress_trajectory, index_path
+
+    path = tmp_path / "trajectory.jsonl"
+    recorder = _record(path, steps=60)
+    compressed_path = tmp_path / "trajectory.jsonl.gz"
+    index = compress_trajectory(path, compressed_path)
+    assert len(index.agent_steps) == 60 and len(index.llm_interactions) == 60
+    assert compressed_path.stat().st_size < path.stat().st_size
+    # the whole file is a regular gzip stream that the reader decompresses transparently
+    assert load_trajectory(compressed_path) == load_trajectory(path)
+
+    trajectory = CompressedTrajectory(compressed_path)
+    step = trajectory.agent_step(57)
+    assert step["step_number"] == 57
+    assert step["llm_messages"][0]["content"] == "You are an agent."
+    assert trajectory.llm_interaction(2)["response"]["tool_calls"][0]["call_id"] == "call_2"
+    assert trajectory.stats() == {"str_replace_based_edit_tool": {"exact_edits": 1}}
+    assert (trajectory.footer() or {})["success"] is True
+
+    # a missing index is rebuilt from the file
+    index_path(compressed_path).unlink()
+    assert CompressedTrajectory(compressed_path).index.agent_steps == index.agent_steps
+
+    plain_path = tmp_path / "roundtrip.jsonl"
+    _ = decompress_trajectory(compressed_path, plain_path)
+    assert load_trajectory(plain_path) == load_trajectory(path)
+    recorder.close()
+
+
+def test_long_bodies_get_blobs_when_legacy_trajectory_is_compressed(tmp_path: Path):
+    from trae_agent.utils.trajectory_archive import CompressedTrajectory, compress_trajectory
+
+    body = "x" * 1000
+    legacy = tmp_path / "legacy.json"
+    _ = legacy.write_text(json.dumps({
+        "task": "t", "agent_steps": [
+            {"step_number": n, "llm_messages": [{"role": "user", "content": body}]} for n in (1, 2, 3)
+        ]
+    }, indent=2))
+    compressed_path = tmp_path / "legacy.jsonl.gz"
+    index = compress_trajectory(legacy, compressed_path)
+    assert len(index.blobs) == 1
+    assert CompressedTrajectory(compressed_path).agent_step(3)["llm_messages"][0]["content"] == body
+
+
+def test_stats_aggregate_trajectories_in_parallel(tmp_path: Path):
+    from trae_agent.utils.trajectory_stats import analyze_trajectories, distribution
+
+    for n in range(3):
+        recorder = TrajectoryRecorder(str(tmp_path / f"run_{n}.jsonl"))
+        recorder.start_recording(task="t", provider="anthropic", model="claude", max_steps=10)
+        for step_number in range(1, 5):
+            tool_call = ToolCall(name="bash", call_id=f"call_{step_number}", arguments={})
+            usage = LLMUsage(100, 10, cache_read_input_tokens=300)
+            response = LLMResponse(content="", usage=usage, model="claude", tool_calls=[tool_call])
+            recorder.record_llm_interaction([], response, provider="anthropic", model="claude")
+            _ = recorder.record_agent_step(
+                step_number=step_number,
+                state="completed",
+                tool_calls=[tool_call],
+                tool_results=[ToolResult(call_id=tool_call.call_id, success=step_number != 2, duration=0.5)],
+                duration=float(n * 10 + step_number)
+            )
+        recorder.finalize_recording(success=n != 0)
+    # an older trajectory without durations is timed from its timestamps
+    _ = (tmp_path / "legacy.json").write_text(json.dumps({
+        "start_time": "2025-01-01T00:00:00", "agent_steps": [
+            {"step_number": 1, "timestamp": "2025-01-01T00:01:40", "error": "failed"},
+        ]
+    }))
+    _ = (tmp_path / "notes.json").write_text("not json")
+
+    summary = analyze_trajectories([tmp_path], workers=2, top=3).summary()
+    assert summary["files"] == 5 and len(summary["unreadable_files"]) == 1
+    assert summary["runs"] == {"finished": 3, "successful": 2, "unfinished": 1}
+    assert summary["steps"] == 13
+    assert summary["failures"] == {"error_steps": 1, "failed_runs": 1, "failed_tool_calls": 3}
+    assert summary["step_latency"]["count"] == 13 and summary["step_latency"]["max"] == 100.0
+    assert summary["tools"]["bash"]["calls"] == 12 and summary["tools"]["bash"]["latency"]["p99"] == 0.5
+    assert summary["tokens"]["cache_read"] == 3600
+    # anthropic does not count cached tokens as input
+    assert summary["cache_hit_rate"] == 0.75
+    assert [step["duration"] for step in summary["slowest_steps"]] == [100.0, 24.0, 23.0]
+
+    assert distribution([float(i) for i in range(1, 101)])["p90"] == 90.0
+
+
+def test_index_trajectories_incrementally(tmp_path: Path):
+    import os
+
+    from trae_agent.utils.trajectory_index import connect_index, index_trajectories
+
+    runs = tmp_path / "runs"
+    runs.mkdir()
+    for n, model in enumerate(["claude", "gpt-4o"]):
+        recorder = TrajectoryRecorder(str(runs / f"run_{n}.jsonl"))
+        recorder.start_recording(task="t", provider="openai", model=model, max_steps=10)
+        for step_number in range(1, 3):
+            tool_call = ToolCall(name="bash", call_id=f"call_{step_number}", arguments={})
+            response = LLMResponse(content="", usage=LLMUsage(100, 10), model=model, tool_calls=[tool_call])
+            recorder.record_llm_interaction([], response, provider="openai", model=model)
+            result = ToolResult(call_id=tool_call.call_id, success=True, result="x" * 300, duration=n + step_number / 10)
+            _ = recorder.record_agent_step(step_number=step_number, state="completed", tool_calls=[tool_call],
+                                       tool_results=[result], duration=1.0)
+        recorder.finalize_recording(success=n == 1)
+    _ = (runs / "notes.json").write_text("not json")
+    db = tmp_path / "index.sqlite3"
+
+    result = index_trajectories(db, [runs], workers=2)
+    assert (result.indexed, result.unchanged, len(result.unreadable)) == (3, 0, 1)
+    result = index_trajectories(db, [runs])
+    assert (result.indexed, result.unchanged) == (0, 3)
+
+    conn = connect_index(db)
+    rows = conn.execute(
+        "SELECT r.model, count(*), percentile(t.duration, 95), max(t.output_chars) FROM tool_calls t "
+        + "JOIN runs r ON r.id = t.run_id WHERE t.name = 'bash' GROUP BY r.model ORDER BY r.model"
+    ).fetchall()
+    assert rows == [("claude", 2, 0.2, 300), ("gpt-4o", 2, 1.2, 300)]
+    assert conn.execute("SELECT sum(success), sum(input_tokens) FROM runs WHERE error IS NULL").fetchone() == (1, 400)
+    conn.close()
+
+    # calls of a step without call ids are kept apart
+    recorder = TrajectoryRecorder(str(runs / "run_2.jsonl"))
+    recorder.start_recording(task="t", provider="openai", model="gpt-4o", max_steps=10)
+    calls = [ToolCall(name=name, call_id="", arguments={}) for name in ("bash", "task_done")]
+    _ = recorder.record_agent_step(step_number=1, state="completed", tool_calls=calls,
+                               tool_results=[ToolResult(call_id="", success=True) for _ in calls])
+    recorder.finalize_recording(success=True)
+    assert index_trajectories(db, [runs]).indexed == 1
+    conn = connect_index(db)
+    assert conn.execute(
+        "SELECT t.ordinal, t.name FROM tool_calls t JOIN runs r ON r.id = t.run_id WHERE r.path LIKE '%run_2.jsonl'"
+    ).fetchall() == [(0, "bash"), (1, "task_done")]
+    conn.close()
+    os.remove(runs / "run_2.jsonl")
+    assert index_trajectories(db, [runs], prune=True).removed == 1
+
+    # a changed file replaces its rows, a removed one is pruned
+    recorder = TrajectoryRecorder(str(runs / "run_0.jsonl"))
+    recorder.start_recording(task="t", provider="openai", model="claude", max_steps=10)
+    recorder.finalize_recording(success=True)
+    os.remove(runs / "run_1.jsonl")
+    result = index_trajectories(db, [runs], prune=True)
+    assert (result.indexed, result.unchanged, result.removed) == (1, 1, 1)
+    conn = connect_index(db)
+    assert conn.execute("SELECT count(*) FROM steps").fetchone() == (0,)
+    assert conn.execute("SELECT count(*) FROM tool_calls").fetchone() == (0,)
+    conn.close()
@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: MIT
 
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from ..tools.base import ToolCall, ToolResult
 from ..utils.llm_basics import LLMResponse, LLMUsage
@@ -18,6 +18,35 @@ class AgentState(Enum):
     ERROR = "error"
 
 
+@dataclass
+class StepTimings:
+    """Monotonic durations in seconds of the phases of an agent step."""
+    llm: float = 0.0  # the whole LLM call, including the phases below
+    llm_queued: float = 0.0  # failed attempts and back-off before the request that succeeded
+    llm_request: float = 0.0
+    llm_parsing: float = 0.0
+    tools: float = 0.0  # executing all tool calls of the step, which may run in parallel
+    tool_calls: dict[str, float] = field(default_factory=dict)  # by call id
+    reflection: float = 0.0
+    recording: float = 0.0  # in the trajectory recorder since the previous step was recorded, up to recording this one
+    console: float = 0.0
+    total: float = 0.0
+
+    def phases(self) -> dict[str, float]:
+        """Durations of the disjoint phases of the step, with the time not attributed to any as `other`."""
+        phases = {
+            "llm_queued": self.llm_queued,
+            "llm_request": self.llm_request,
+            "llm_parsing": self.llm_parsing,
+            "tools": self.tools,
+            "reflection": self.reflection,
+            "recording": self.recording,
+            "console": self.console,
+        }
+        phases["other"] = max(0.0, self.total - sum(phases.values()))
+        return phases
+
+
 @dataclass
 class AgentStep:
     """Represents a single step in agent execution."""
@@ -31,6 +60,7 @@ class AgentStep:
     error: str | None = None
     extra: dict[str, object] | None = None
     llm_usage: LLMUsage | None = None
+    timings: StepTimings = field(default_factory=StepTimings)
 
 
 @dataclass
@@ -43,6 +73,14 @@ class AgentExecution:
     total_tokens: LLMUsage | None = None
     execution_time: float = 0.0
 
+    def phase_times(self) -> dict[str, float]:
+        """Total durations of the phases of all steps."""
+        totals: dict[str, float] = {}
+        for step in self.steps:
+            for phase, duration in step.timings.phases().items():
+                totals[phase] = totals.get(phase, 0.0) + duration
+        return totals
+
 
 class AgentError(Exception):
     """Base class for agent errors."""
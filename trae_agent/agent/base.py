@@ -3,15 +3,21 @@
 
 """Base Agent class for LLM-based agents."""
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
+from dataclasses import asdict
 
 from ..utils.cli_console import CLIConsole
 from ..utils.config import Config, ModelParameters
 from ..utils.trajectory_recorder import TrajectoryRecorder
-from .agent_basics import AgentStep, AgentExecution, AgentState
+from ..utils.tracing import get_tracer
+from .agent_basics import AgentError, AgentStep, AgentExecution, AgentState
+from .resume import ResumePoint
 from ..utils.llm_client import LLMClient
 from ..utils.llm_basics import LLMResponse, LLMMessage
 from ..tools.base import Tool, ToolExecutor, ToolResult
+from ..tools.output_compaction import OutputCompactor
 
 
 class Agent(ABC):
@@ -26,11 +32,25 @@ class Agent(ABC):
         self.tools: list[Tool] = []
         self.tool_caller: ToolExecutor = ToolExecutor([])
 
+        # Compaction of tool outputs before they are added to the conversation
+        self.output_compactor: OutputCompactor | None = None
+        if config.output_compaction and config.output_compaction.enabled:
+            self.output_compactor = OutputCompactor(
+                max_chars=config.output_compaction.max_chars,
+                tool_names=config.output_compaction.tool_names
+            )
+
         self.cli_console: CLIConsole | None = None
 
         # Trajectory recorder
         self.trajectory_recorder: TrajectoryRecorder | None = None
 
+        # Recorded run to continue instead of starting the task over
+        self.resume_point: ResumePoint | None = None
+        self.replay_tools: bool = False
+        # fingerprint of the workspace after the last recorded step
+        self._last_workspace: dict[str, str] | None = None
+
     def set_trajectory_recorder(self, recorder: TrajectoryRecorder | None) -> None:
         """Set the trajectory recorder for this agent."""
         self.trajectory_recorder = recorder
@@ -41,6 +61,62 @@ class Agent(ABC):
         """Set the CLI console for this agent."""
         self.cli_console = cli_console
 
+    def resume(self, point: ResumePoint, replay_tools: bool = False) -> None:
+        """Continue a recorded run after its last completed step instead of starting the task over.
+
+        The conversation of the completed steps is restored in the LLM client when the task
+        is executed, so their LLM calls are not made again. With `replay_tools`, the recorded
+        tool calls are executed again first, which requires the workspace to be in the state
+        it had when the run started. Otherwise it must be in the state it had after the last
+        completed step.
+        """
+        self.resume_point = point
+        self.replay_tools = replay_tools
+        self.check_workspace(point.start_workspace if replay_tools else point.workspace)
+
+    def workspace_fingerprint(self) -> dict[str, str] | None:
+        """Return a fingerprint of the state of the workspace, recorded with the steps. Override to enable.
+
+        It is called in a worker thread while the task is executed.
+        """
+        return None
+
+    def check_workspace(self, expected: dict[str, str] | None) -> None:
+        """Raise an AgentError if the workspace does not match a recorded fingerprint."""
+        if expected is None:
+            return
+        current = self.workspace_fingerprint()
+        if current is not None and current != expected:
+            raise AgentError(
+                f"The workspace does not match the recorded run (HEAD {expected.get('head')}, "
+                + f"changes {expected.get('changes')}; found HEAD {current.get('head')}, changes {current.get('changes')})"
+            )
+
+    async def _continue_resumed_run(self, point: ResumePoint, execution: AgentExecution) -> tuple[list[LLMMessage], int]:
+        """Restore the state of a resumed run and return the messages and number of its next step."""
+        execution.steps.extend(point.steps)
+        execution.total_tokens = point.total_tokens
+        history, messages = point.conversation(self.initial_messages)
+        self.llm_client.set_chat_history(history)
+
+        if self.replay_tools:
+            replayed = mismatched = 0
+            for step in point.steps:
+                if not step.tool_calls:
+                    continue
+                recorded = {result.call_id: result.success for result in step.tool_results or []}
+                for result in await self.tool_caller.sequential_tool_call(step.tool_calls):
+                    replayed += 1
+                    if recorded.get(result.call_id, result.success) != result.success:
+                        mismatched += 1
+            if self.trajectory_recorder:
+                self.trajectory_recorder.record_stats(
+                    "resume", {"replayed_tool_calls": replayed, "mismatched_tool_calls": mismatched}
+                )
+            self.check_workspace(point.workspace)
+
+        return messages, point.next_step_number
+
     @abstractmethod
     def new_task(self, task: str, extra_args: dict[str, str] | None = None, tool_names: list[str] | None = None):
         """Create a new task."""
@@ -48,162 +124,149 @@ class Agent(ABC):
 
     async def execute_task(self) -> AgentExecution:
         """Execute a task using the agent."""
-        import time
         start_time = time.time()
 
-        execution = AgentExecution(task=self.task, steps=[])
+        tracer = get_tracer()
+        with tracer.span("agent.execute_task", {"gen_ai.request.model": self.model_parameters.model}) as span:
+            execution = AgentExecution(task=self.task, steps=[])
+            self._last_workspace = None
 
-        try:
-            messages = self.initial_messages
-            step_number = 1
+            try:
+                messages = self.initial_messages
+                step_number = 1
+                if self.resume_point:
+                    point, self.resume_point = self.resume_point, None
+                    messages, step_number = await self._continue_resumed_run(point, execution)
 
-            while step_number <= self.max_steps:
-                step = AgentStep(step_number=step_number, state=AgentState.THINKING)
+                while step_number <= self.max_steps:
+                    with tracer.span("agent.step", {"trae.step.number": step_number}):
+                        step = AgentStep(step_number=step_number, state=AgentState.THINKING)
+                        step_start_time = time.perf_counter()
+                        recording_start = self.trajectory_recorder.time_spent if self.trajectory_recorder else 0.0
 
-                try:
+                        try:
 
-                    # Get LLM response
-                    step.state = AgentState.THINKING
+                            # Get LLM response
+                            step.state = AgentState.THINKING
 
-                    # Display thinking state
-                    if self.cli_console:
-                        self.cli_console.update_status(step)
+                            # Display thinking state
+                            self._update_console(step)
+
+                            llm_start_time = time.perf_counter()
+                            llm_response = self.llm_client.chat(messages, self.model_parameters, self.tools)
+                            step.timings.llm = time.perf_counter() - llm_start_time
+                            step.timings.llm_queued = llm_response.timings.queued
+                            step.timings.llm_request = llm_response.timings.request
+                            step.timings.llm_parsing = llm_response.timings.parsing
+                            step.llm_response = llm_response
+
+                            # Display step with LLM response
+                            self._update_console(step)
+
+                            # Update token usage
+                            if llm_response.usage:
+                                if execution.total_tokens:
+                                    execution.total_tokens += llm_response.usage
+                                else:
+                                    execution.total_tokens = llm_response.usage
+
+                            if self.llm_indicates_task_completed(llm_response):
+                                if self.is_task_completed(llm_response):
+                                    step.state = AgentState.COMPLETED
+                                    execution.final_result = llm_response.content
+                                    execution.success = True
+
+                                    # Record agent step
+                                    await self._record_step(step, messages, step_start_time, recording_start)
+                                    self._update_console(step)
+                                    execution.steps.append(step)
+                                    break
+                                else:
+                                    step.state = AgentState.THINKING
+                                    messages = [LLMMessage(role="user", content=self.task_incomplete_message())]
+                            else:
+                                # Check if the response contains a tool call
+                                tool_calls = llm_response.tool_calls
+
+                                if tool_calls and len(tool_calls) > 0:
+                                    # Execute tool call
+                                    step.state = AgentState.CALLING_TOOL
+                                    step.tool_calls = tool_calls
+
+                                    # Display tool calling state with tool calls
+                                    self._update_console(step)
+
+                                    tools_start_time = time.perf_counter()
+                                    if self.model_parameters.parallel_tool_calls:
+                                        tool_results = await self.tool_caller.parallel_tool_call(tool_calls)
+                                    else:
+                                        tool_results = await self.tool_caller.sequential_tool_call(tool_calls)
+                                    step.timings.tools = time.perf_counter() - tools_start_time
+                                    step.timings.tool_calls = {
+                                        result.call_id: result.duration for result in tool_results if result.duration is not None
+                                    }
+                                    step.tool_results = tool_results
+
+                                    # Display tool results
+                                    self._update_console(step)
+
+                                    messages: list[LLMMessage] = []
+                                    for tool_result in tool_results:
+                                        # Add tool result to conversation
+                                        message = LLMMessage(
+                                            role="user",
+                                            tool_result=tool_result
+                                        )
+                                        messages.append(message)
+
+                                    reflection_start_time = time.perf_counter()
+                                    reflection = self.reflect_on_result(tool_results)
+                                    step.timings.reflection = time.perf_counter() - reflection_start_time
+                                    if reflection:
+                                        step.state = AgentState.REFLECTING
+                                        step.reflection = reflection
+
+                                        # Display reflection
+                                        self._update_console(step)
+
+
+                                        messages.append(LLMMessage(role="assistant", content=reflection))
+                                else:
+                                    messages=[LLMMessage(role="user", content="It seems that you have not completed the task.")]
 
-                    llm_response = self.llm_client.chat(messages, self.model_parameters, self.tools)
-                    step.llm_response = llm_response
 
-                    # Display step with LLM response
-                    if self.cli_console:
-                        self.cli_console.update_status(step)
+                            # Record agent step
+                            await self._record_step(step, messages, step_start_time, recording_start)
+                            self._update_console(step)
+                            execution.steps.append(step)
+                            step_number += 1
 
-                    # Update token usage
-                    if llm_response.usage:
-                        if execution.total_tokens:
-                            execution.total_tokens += llm_response.usage
-                        else:
-                            execution.total_tokens = llm_response.usage
+                        except Exception as e:
+                            step.state = AgentState.ERROR
+                            step.error = str(e)
 
-                    if self.llm_indicates_task_completed(llm_response):
-                        if self.is_task_completed(llm_response):
-                            step.state = AgentState.COMPLETED
-                            execution.final_result = llm_response.content
-                            execution.success = True
+                            # Display error
+                            self._update_console(step)
 
                             # Record agent step
-                            if self.trajectory_recorder:
-                                self.trajectory_recorder.record_agent_step(
-                                    step_number=step.step_number,
-                                    state=step.state.value,
-                                    llm_messages=messages,
-                                    llm_response=step.llm_response,
-                                    tool_calls=step.tool_calls,
-                                    tool_results=step.tool_results,
-                                    reflection=step.reflection,
-                                    error=step.error
-                                )
-                            if self.cli_console:
-                                self.cli_console.update_status(step)
+                            await self._record_step(step, messages, step_start_time, recording_start)
+                            self._update_console(step)
                             execution.steps.append(step)
                             break
-                        else:
-                            step.state = AgentState.THINKING
-                            messages = [LLMMessage(role="user", content=self.task_incomplete_message())]
-                    else:
-                        # Check if the response contains a tool call
-                        tool_calls = llm_response.tool_calls
-
-                        if tool_calls and len(tool_calls) > 0:
-                            # Execute tool call
-                            step.state = AgentState.CALLING_TOOL
-                            step.tool_calls = tool_calls
-
-                            # Display tool calling state with tool calls
-                            if self.cli_console:
-                                self.cli_console.update_status(step)
-
-                            if self.model_parameters.parallel_tool_calls:
-                                tool_results = await self.tool_caller.parallel_tool_call(tool_calls)
-                            else:
-                                tool_results = await self.tool_caller.sequential_tool_call(tool_calls)
-                            step.tool_results = tool_results
-
-                            # Display tool results
-                            if self.cli_console:
-                                self.cli_console.update_status(step)
-
-                            messages: list[LLMMessage] = []
-                            for tool_result in tool_results:
-                                # Add tool result to conversation
-                                message = LLMMessage(
-                                    role="user",
-                                    tool_result=tool_result
-                                )
-                                messages.append(message)
-
-                            reflection = self.reflect_on_result(tool_results)
-                            if reflection:
-                                step.state = AgentState.REFLECTING
-                                step.reflection = reflection
-
-                                # Display reflection
-                                if self.cli_console:
-                                    self.cli_console.update_status(step)
-
-
-                                messages.append(LLMMessage(role="assistant", content=reflection))
-                        else:
-                            messages=[LLMMessage(role="user", content="It seems that you have not completed the task.")]
-
-
-                    # Record agent step
-                    if self.trajectory_recorder:
-                        self.trajectory_recorder.record_agent_step(
-                            step_number=step.step_number,
-                            state=step.state.value,
-                            llm_messages=messages,
-                            llm_response=step.llm_response,
-                            tool_calls=step.tool_calls,
-                            tool_results=step.tool_results,
-                            reflection=step.reflection,
-                            error=step.error
-                        )
-                    if self.cli_console:
-                        self.cli_console.update_status(step)
-                    execution.steps.append(step)
-                    step_number += 1
-
-                except Exception as e:
-                    step.state = AgentState.ERROR
-                    step.error = str(e)
-
-                    # Display error
-                    if self.cli_console:
-                        self.cli_console.update_status(step)
-
-                    # Record agent step
-                    if self.trajectory_recorder:
-                        self.trajectory_recorder.record_agent_step(
-                            step_number=step.step_number,
-                            state=step.state.value,
-                            llm_messages=messages,
-                            llm_response=step.llm_response,
-                            tool_calls=step.tool_calls,
-                            tool_results=step.tool_results,
-                            reflection=step.reflection,
-                            error=step.error
-                        )
-                    if self.cli_console:
-                        self.cli_console.update_status(step)
-                    execution.steps.append(step)
-                    break
-
-            if step_number > self.max_steps and not execution.success:
-                execution.final_result = "Task execution exceeded maximum steps without completion."
-
-        except Exception as e:
-            execution.final_result = f"Agent execution failed: {str(e)}"
-
-        execution.execution_time = time.time() - start_time
+
+                if step_number > self.max_steps and not execution.success:
+                    execution.final_result = "Task execution exceeded maximum steps without completion."
+
+            except Exception as e:
+                execution.final_result = f"Agent execution failed: {str(e)}"
+                span.set_error(execution.final_result)
+
+            execution.execution_time = time.time() - start_time
+            span.set_attribute("trae.agent.steps", len(execution.steps))
+            span.set_attribute("trae.agent.success", execution.success)
+            if execution.total_tokens:
+                span.set_attribute("gen_ai.usage.input_tokens", execution.total_tokens.input_tokens)
+                span.set_attribute("gen_ai.usage.output_tokens", execution.total_tokens.output_tokens)
 
         # Display final summary
         if self.cli_console:
@@ -211,6 +274,53 @@ class Agent(ABC):
 
         return execution
 
+    def _update_console(self, step: AgentStep) -> None:
+        """Display the state of a step, timing the console as part of the step."""
+        if self.cli_console:
+            start_time = time.perf_counter()
+            self.cli_console.update_status(step)
+            step.timings.console += time.perf_counter() - start_time
+
+    async def _record_step(self, step: AgentStep, messages: list[LLMMessage], step_start_time: float, recording_start: float) -> None:
+        """Complete the timings and the span of a step and record it in the trajectory."""
+        workspace = None
+        if self.trajectory_recorder:
+            fingerprint_start_time = time.perf_counter()
+            # only tools change the workspace; the fingerprint runs git and reads the changed files,
+            # off the event loop shared with the console and Lakeview
+            if step.tool_calls or self._last_workspace is None:
+                self._last_workspace = await asyncio.to_thread(self.workspace_fingerprint)
+            workspace = self._last_workspace
+            step.timings.recording = (
+                self.trajectory_recorder.time_spent - recording_start + time.perf_counter() - fingerprint_start_time
+            )
+        step.timings.total = time.perf_counter() - step_start_time
+        span = get_tracer().current_span()
+        span.set_attribute("trae.step.state", step.state.value)
+        if step.llm_response and step.llm_response.usage:
+            span.set_attribute("gen_ai.usage.input_tokens", step.llm_response.usage.input_tokens)
+            span.set_attribute("gen_ai.usage.output_tokens", step.llm_response.usage.output_tokens)
+        if step.tool_calls:
+            span.set_attribute("trae.step.tools", [tool_call.name for tool_call in step.tool_calls])
+        if step.error:
+            span.set_error(step.error)
+        if self.trajectory_recorder:
+            recording = self.trajectory_recorder.record_agent_step(
+                step_number=step.step_number,
+                state=step.state.value,
+                llm_messages=messages,
+                llm_response=step.llm_response,
+                tool_calls=step.tool_calls,
+                tool_results=step.tool_results,
+                reflection=step.reflection,
+                error=step.error,
+                duration=step.timings.total,
+                workspace=workspace,
+                timings=asdict(step.timings)
+            )
+            step.timings.recording += recording
+            step.timings.total += recording
+
     def reflect_on_result(self, tool_results: list[ToolResult]) -> str | None:
         """Reflect on tool execution result. Override for custom reflection logic."""
         if len(tool_results) == 0:
@@ -0,0 +1,227 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Resuming interrupted runs from their trajectories."""
+
+import hashlib
+import os
+import subprocess
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ..tools.base import ToolCall, ToolResult
+from ..utils.llm_basics import LLMMessage, LLMResponse, LLMUsage
+from ..utils.trajectory_reader import iter_events
+from .agent_basics import AgentError, AgentState, AgentStep
+
+
+def tool_call_from_dict(data: dict[str, Any]) -> ToolCall:
+    return ToolCall(name=data["name"], call_id=data["call_id"], arguments=data.get("arguments") or {}, id=data.get("id"))
+
+
+def tool_result_from_dict(data: dict[str, Any]) -> ToolResult:
+    return ToolResult(
+        call_id=data["call_id"],
+        success=data["success"],
+        result=data.get("result"),
+        error=data.get("error"),
+        id=data.get("id"),
+        duration=data.get("duration")
+    )
+
+
+def message_from_dict(data: dict[str, Any]) -> LLMMessage:
+    return LLMMessage(
+        role=data["role"],
+        content=data.get("content"),
+        tool_call=tool_call_from_dict(data["tool_call"]) if data.get("tool_call") else None,
+        tool_result=tool_result_from_dict(data["tool_result"]) if data.get("tool_result") else None
+    )
+
+
+def response_from_dict(data: dict[str, Any]) -> LLMResponse:
+    usage = data.get("usage")
+    return LLMResponse(
+        content=data.get("content") or "",
+        usage=LLMUsage(usage.get("input_tokens") or 0, usage.get("output_tokens") or 0) if usage else None,
+        model=data.get("model"),
+        finish_reason=data.get("finish_reason"),
+        tool_calls=[tool_call_from_dict(tc) for tc in data["tool_calls"]] if data.get("tool_calls") else None
+    )
+
+
+def assistant_messages(response: LLMResponse) -> list[LLMMessage]:
+    """Messages that add an LLM response to the conversation, as the LLM clients do."""
+    messages: list[LLMMessage] = []
+    if response.content:
+        messages.append(LLMMessage(role="assistant", content=response.content))
+    for tool_call in response.tool_calls or []:
+        messages.append(LLMMessage(role="assistant", tool_call=tool_call))
+    return messages
+
+
+# files modified this recently are hashed again next time, however their size and mtime compare,
+# since a change within the resolution of mtime leaves both unchanged (as git does for its index)
+_RACY_MTIME_NS = 2_000_000_000
+
+
+class WorkspaceFingerprinter:
+    """Fingerprints of the git state of a project: its HEAD and a hash of its uncommitted changes.
+
+    The files git reports as changed or untracked are hashed by their content. The hashes are
+    kept by size and mtime, so a fingerprint only reads the files changed since the previous one.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path: str = project_path
+        self._hashes: dict[bytes, tuple[int, int, bytes]] = {}
+
+    def _git(self, *args: str) -> bytes:
+        return subprocess.check_output(["git", *args], cwd=self.project_path, stderr=subprocess.DEVNULL)
+
+    def _content_hash(self, name: bytes, path: str, now_ns: int) -> bytes:
+        try:
+            stat = os.stat(path)
+            cached = self._hashes.get(name)
+            if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                return cached[2]
+            with open(path, "rb") as f:
+                content_hash = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).digest()
+        except OSError:
+            # deleted, or not a regular file
+            return b"\0"
+        if now_ns - stat.st_mtime_ns > _RACY_MTIME_NS:
+            self._hashes[name] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def fingerprint(self, exclude: Iterable[str] = ()) -> dict[str, str] | None:
+        """Return the fingerprint of the project, or None if it is not a git repository.
+
+        Files in `exclude`, such as the trajectory being written, are left out of the hash.
+        """
+        now_ns = time.time_ns()
+        try:
+            head = self._git("rev-parse", "HEAD").decode().strip()
+            status = self._git("status", "--porcelain=v1", "-z", "--untracked-files=all", "--no-renames")
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        excluded = {os.path.realpath(path) for path in exclude}
+        digest = hashlib.blake2b(digest_size=16)
+        # entries are "XY path"; the state of the index is not part of the fingerprint, only the files
+        names = sorted({entry[3:] for entry in status.split(b"\0") if len(entry) > 3})
+        for name in names:
+            path = os.path.join(self.project_path, os.fsdecode(name))
+            if os.path.realpath(path) in excluded:
+                continue
+            digest.update(name + b"\0")
+            digest.update(self._content_hash(name, path, now_ns))
+        # files no longer changed are forgotten
+        self._hashes = {name: self._hashes[name] for name in names if name in self._hashes}
+        return {"head": head, "changes": digest.hexdigest()}
+
+
+def workspace_fingerprint(project_path: str, exclude: Iterable[str] = ()) -> dict[str, str] | None:
+    """Git HEAD of a project and a hash of its uncommitted changes, including untracked files.
+
+    Returns None if the project is not a git repository. Files in `exclude`, such as the
+    trajectory being written, are left out of the hash.
+    """
+    return WorkspaceFingerprinter(project_path).fingerprint(exclude)
+
+
+@dataclass
+class ResumePoint:
+    """The state of a recorded run after its last completed step."""
+    task: str
+    source: Path | None = None
+    steps: list[AgentStep] = field(default_factory=list)
+    # the messages of the first LLM call and those each completed step leaves for the next one
+    initial_messages: list[LLMMessage] = field(default_factory=list)
+    next_messages: list[list[LLMMessage]] = field(default_factory=list)
+    total_tokens: LLMUsage | None = None
+    # workspace fingerprints when the run started and after the last completed step
+    start_workspace: dict[str, str] | None = None
+    workspace: dict[str, str] | None = None
+
+    @property
+    def next_step_number(self) -> int:
+        return self.steps[-1].step_number + 1 if self.steps else 1
+
+    def conversation(self, initial_messages: list[LLMMessage]) -> tuple[list[LLMMessage], list[LLMMessage]]:
+        """Return the chat history of the completed steps and the messages of the next LLM call.
+
+        `initial_messages` are used if the trajectory has no LLM interaction to take them from.
+        """
+        history: list[LLMMessage] = []
+        inputs = self.initial_messages or initial_messages
+        for step, next_messages in zip(self.steps, self.next_messages):
+            history.extend(inputs)
+            if step.llm_response:
+                history.extend(assistant_messages(step.llm_response))
+            inputs = next_messages
+        return history, inputs
+
+
+def load_resume_point(path: str | Path) -> ResumePoint:
+    """Read the state of the run recorded in a trajectory after its last completed step.
+
+    Steps that failed, and steps recorded again by a resumed run, are replaced by the
+    latest recording of the same step number.
+
+    Raises:
+        AgentError: If the recorded run already completed its task.
+    """
+    header: dict[str, Any] = {}
+    initial_messages: list[dict[str, Any]] | None = None
+    steps: list[dict[str, Any]] = []
+    succeeded = False
+    for event in iter_events(path):
+        event_type = event.get("type")
+        if event_type == "header":
+            header = event
+        elif event_type == "llm_interaction" and initial_messages is None:
+            initial_messages = event.get("input_messages") or []
+        elif event_type == "agent_step":
+            steps = [step for step in steps if step["step_number"] < event["step_number"]]
+            steps.append(event)
+        elif event_type == "resume":
+            succeeded = False
+        elif event_type == "footer":
+            succeeded = bool(event.get("success"))
+
+    if succeeded or any(step.get("state") == AgentState.COMPLETED.value for step in steps):
+        raise AgentError(f"The run recorded in {path} already completed its task")
+
+    point = ResumePoint(
+        task=header.get("task") or "",
+        source=Path(path),
+        initial_messages=[message_from_dict(m) for m in initial_messages or []],
+        start_workspace=header.get("workspace")
+    )
+    for step in steps:
+        if step.get("state") == AgentState.ERROR.value or not step.get("llm_response"):
+            break
+        agent_step = AgentStep(
+            step_number=step["step_number"],
+            state=AgentState(step["state"]),
+            tool_calls=[tool_call_from_dict(tc) for tc in step["tool_calls"]] if step.get("tool_calls") else None,
+            tool_results=[tool_result_from_dict(tr) for tr in step["tool_results"]] if step.get("tool_results") else None,
+            llm_response=response_from_dict(step["llm_response"]),
+            reflection=step.get("reflection")
+        )
+        point.steps.append(agent_step)
+        point.next_messages.append([message_from_dict(m) for m in step.get("llm_messages") or []])
+        if agent_step.llm_response and agent_step.llm_response.usage:
+            usage = agent_step.llm_response.usage
+            point.total_tokens = point.total_tokens + usage if point.total_tokens else usage
+        point.workspace = step.get("workspace")
+    if not point.steps:
+        point.workspace = point.start_workspace
+    return point
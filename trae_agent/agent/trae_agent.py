@@ -10,8 +10,10 @@ from typing import override
 
 from .base import Agent
 from .agent_basics import AgentError, AgentExecution
+from .resume import WorkspaceFingerprinter
 from ..utils.config import Config
 from ..utils.llm_basics import LLMMessage, LLMResponse
+from ..utils.trajectory_writer import FsyncPolicy
 from ..tools.base import Tool, ToolExecutor, ToolResult
 from ..tools import tools_registry
 
@@ -19,7 +21,9 @@ TraeAgentToolNames = [
     "str_replace_based_edit_tool",
     "sequentialthinking",
     "task_done",
-    "bash"
+    "bash",
+    "code_search",
+    "symbols"
 ]
 
 
@@ -31,29 +35,41 @@ class TraeAgent(Agent):
         self.base_commit: str | None = None
         self.must_patch: str = "false"
         self.patch_path: str | None = None
+        self._fingerprinter: WorkspaceFingerprinter | None = None
         super().__init__(config)
 
-    def setup_trajectory_recording(self, trajectory_path: str | None = None) -> str:
+    def setup_trajectory_recording(self, trajectory_path: str | None = None, fsync_policy: FsyncPolicy = "batch") -> str:
         """Set up trajectory recording for this agent.
 
         Args:
             trajectory_path: Path to save trajectory file. If None, generates default path.
+            fsync_policy: When recorded events are forced to disk: "none", after every "batch" or every "event".
 
         Returns:
             The path where trajectory will be saved.
         """
         from ..utils.trajectory_recorder import TrajectoryRecorder
 
-        recorder = TrajectoryRecorder(trajectory_path)
+        # make sure the events of a previous recording are written before it is replaced
+        if self.trajectory_recorder:
+            self.trajectory_recorder.close()
+        recorder = TrajectoryRecorder(trajectory_path, fsync_policy)
         self.set_trajectory_recorder(recorder)
 
-        # Start recording with task info
-        if hasattr(self, 'task') and self.task:
+        # Continue the trajectory of a resumed run, or start recording with task info
+        if self.resume_point:
+            recorder.resume_recording(
+                from_step=self.resume_point.next_step_number,
+                source=self.resume_point.source,
+                replay_tools=self.replay_tools
+            )
+        elif hasattr(self, 'task') and self.task:
             recorder.start_recording(
                 task=self.task,
                 provider=self.llm_client.provider.value,
                 model=self.model_parameters.model,
-                max_steps=self.max_steps
+                max_steps=self.max_steps,
+                workspace=self.workspace_fingerprint()
             )
 
         return recorder.get_trajectory_path()
@@ -66,7 +82,7 @@ class TraeAgent(Agent):
         if tool_names is None:
             tool_names = TraeAgentToolNames
         self.tools: list[Tool] = [tools_registry[tool_name]() for tool_name in tool_names]
-        self.tool_caller: ToolExecutor = ToolExecutor(self.tools)
+        self.tool_caller: ToolExecutor = ToolExecutor(self.tools, self.output_compactor)
 
         self.initial_messages: list[LLMMessage] = []
         self.initial_messages.append(LLMMessage(role="system", content=self.get_system_prompt()))
@@ -76,6 +92,8 @@ class TraeAgent(Agent):
             if "project_path" in extra_args:
                 user_message += f"[Project root path]:\n{extra_args['project_path']}\n\n"
                 self.project_path = extra_args['project_path']
+                for tool in self.tools:
+                    tool.set_project_path(self.project_path)
             else:
                 raise AgentError("Project path is required")
             if "issue" in extra_args:
@@ -102,7 +120,8 @@ class TraeAgent(Agent):
                 task=task,
                 provider=self.llm_client.provider.value,
                 model=self.model_parameters.model,
-                max_steps=self.max_steps
+                max_steps=self.max_steps,
+                workspace=self.workspace_fingerprint()
             )
 
     @override
@@ -112,12 +131,24 @@ class TraeAgent(Agent):
             console_task = asyncio.create_task(self.cli_console.start())
         else:
             console_task = None
-        execution = await super().execute_task()
+        try:
+            execution = await super().execute_task()
+        finally:
+            # stop the processes the tools keep, such as the bash shell, before the event loop closes
+            await self.tool_caller.close_tools()
         if self.cli_console and console_task and not console_task.done():
             await console_task
 
         # Finalize trajectory recording if recorder is available
         if self.trajectory_recorder:
+            for tool in self.tools:
+                tool_stats = tool.get_stats()
+                if tool_stats:
+                    self.trajectory_recorder.record_stats(tool.name, tool_stats)
+            if self.cli_console and self.cli_console.lake_view:
+                lakeview_stats = self.cli_console.lake_view.get_stats()
+                if lakeview_stats:
+                    self.trajectory_recorder.record_stats("lakeview", lakeview_stats)
             self.trajectory_recorder.finalize_recording(
                 success=execution.success,
                 final_result=execution.final_result
@@ -180,6 +211,20 @@ If you are sure the issue has been solved, you should call the `task_done` to fi
     def reflect_on_result(self, tool_results: list[ToolResult]) -> str | None:
         return None
 
+    @override
+    def workspace_fingerprint(self) -> dict[str, str] | None:
+        """Fingerprint of the git state of the project, leaving out the files written by the agent itself."""
+        if not self.project_path:
+            return None
+        exclude = [self.patch_path] if self.patch_path else []
+        if self.trajectory_recorder:
+            exclude.append(self.trajectory_recorder.get_trajectory_path())
+        if self.resume_point and self.resume_point.source:
+            exclude.append(str(self.resume_point.source))
+        if self._fingerprinter is None or self._fingerprinter.project_path != self.project_path:
+            self._fingerprinter = WorkspaceFingerprinter(self.project_path)
+        return self._fingerprinter.fingerprint(exclude)
+
     def get_git_diff(self) -> str:
         """Get the git diff of the project."""
         pwd = os.getcwd()
@@ -4,6 +4,7 @@
 """Command Line Interface for Trae Agent."""
 
 import asyncio
+import json
 from pathlib import Path
 
 import os
@@ -21,6 +22,7 @@ from trae_agent.utils.cli_console import CLIConsole
 
 from .agent import TraeAgent
 from .utils.config import Config, resolve_config_value
+from .utils.trajectory_writer import FSYNC_POLICIES, FsyncPolicy
 
 # Load environment variables
 _ = load_dotenv()
@@ -59,7 +61,12 @@ def load_config(provider: str | None = None, model: str | None = None, api_key:
 
 def create_agent(config: Config) -> TraeAgent:
     """Create a Trae Agent with the specified configuration."""
+    from .utils.tracing import configure_tracing
+
     try:
+        # Export spans of the run if tracing is configured
+        _ = configure_tracing(config.tracing)
+
         # Create agent
         agent = TraeAgent(config)
         return agent
@@ -81,7 +88,7 @@ def cli():
 
 
 @cli.command()
-@click.argument('task')
+@click.argument('task', required=False)
 @click.option('--provider', '-p', help='LLM provider to use')
 @click.option('--model', '-m', help='Specific model to use')
 @click.option('--api-key', '-k', help='API key (or set via environment variable)')
@@ -90,14 +97,23 @@ def cli():
 @click.option('--must-patch', '-mp', is_flag=True, help='Whether to patch the code')
 @click.option('--config-file', help='Path to configuration file', default='trae_config.json')
 @click.option('--trajectory-file', '-t', help='Path to save trajectory file')
+@click.option('--trajectory-fsync', type=click.Choice(FSYNC_POLICIES), default='batch', show_default=True,
+              help='When trajectory events are forced to disk: never, after every written batch or after every event')
 @click.option('--patch-path', '-pp', help='Path to patch file')
-def run(task: str, provider: str | None = None, model: str | None = None, api_key: str | None = None,
+@click.option('--resume', 'resume_path', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='Continue the interrupted run recorded in this trajectory after its last completed step')
+@click.option('--replay-tools', is_flag=True,
+              help='With --resume, execute the recorded tool calls again, starting from the workspace the run started from')
+def run(task: str | None = None, provider: str | None = None, model: str | None = None, api_key: str | None = None,
         max_steps: int | None = None,         working_dir: str | None = None, must_patch: bool = False,
-        config_file: str = "trae_config.json", trajectory_file: str | None = None, patch_path: str | None = None):
+        config_file: str = "trae_config.json", trajectory_file: str | None = None, trajectory_fsync: FsyncPolicy = "batch",
+        patch_path: str | None = None, resume_path: Path | None = None, replay_tools: bool = False):
     """Run a task using Trae Agent.
 
-    TASK: Description of the task to execute
+    TASK: Description of the task to execute, optional with --resume
     """
+    from .agent.agent_basics import AgentError
+    from .agent.resume import ResumePoint, load_resume_point
 
     # Change working directory if specified
     if not working_dir:
@@ -109,6 +125,23 @@ def run(task: str, provider: str | None = None, model: str | None = None, api_ke
             console.print(f"[red]Error changing directory: {e}[/red]")
             sys.exit(1)
 
+    resume_point: ResumePoint | None = None
+    if resume_path:
+        try:
+            resume_point = load_resume_point(resume_path)
+        except (AgentError, OSError, ValueError) as e:
+            console.print(f"[red]Cannot resume from {resume_path}: {e}[/red]")
+            sys.exit(1)
+        task = task or resume_point.task
+        # the resumed run is appended to its trajectory unless another file is given
+        trajectory_file = trajectory_file or str(resume_path)
+    elif replay_tools:
+        console.print("[red]Error: --replay-tools requires --resume[/red]")
+        sys.exit(1)
+    if not task:
+        console.print("[red]Error: TASK is required unless a run is resumed[/red]")
+        sys.exit(1)
+
     task_path = Path(task)
     if task_path.exists() and task_path.is_file:
         task = task_path.read_text()
@@ -118,16 +151,17 @@ def run(task: str, provider: str | None = None, model: str | None = None, api_ke
     # Create agent
     agent: TraeAgent = create_agent(config)
 
-    # Set up trajectory recording
+    # Set up trajectory recording, which for a resumed run happens once the task is known
     trajectory_path = None
-    if trajectory_file:
-        trajectory_path = agent.setup_trajectory_recording(trajectory_file)
-    else:
-        trajectory_path = agent.setup_trajectory_recording()
+    if not resume_point:
+        if trajectory_file:
+            trajectory_path = agent.setup_trajectory_recording(trajectory_file, trajectory_fsync)
+        else:
+            trajectory_path = agent.setup_trajectory_recording(fsync_policy=trajectory_fsync)
 
     # Create CLI Console
     cli_console = CLIConsole(config)
-    cli_console.print_task_details(task, working_dir, config.default_provider, config.model_providers[config.default_provider].model, config.max_steps, config_file, trajectory_path)
+    cli_console.print_task_details(task, working_dir, config.default_provider, config.model_providers[config.default_provider].model, config.max_steps, config_file, trajectory_path or trajectory_file)
 
     agent.set_cli_console(cli_console)
 
@@ -139,18 +173,33 @@ def run(task: str, provider: str | None = None, model: str | None = None, api_ke
             "patch_path": patch_path
         }
         agent.new_task(task, task_args)
+        if resume_point:
+            try:
+                agent.resume(resume_point, replay_tools)
+            except AgentError as e:
+                console.print(f"[red]Cannot resume from {resume_path}: {e.message}[/red]")
+                if not replay_tools:
+                    console.print("[yellow]Restore the workspace, or start from the original checkout with --replay-tools[/yellow]")
+                sys.exit(1)
+            trajectory_path = agent.setup_trajectory_recording(trajectory_file, trajectory_fsync)
+            console.print(f"[blue]Resuming from step {resume_point.next_step_number}, recording to: {trajectory_path}[/blue]")
         _ = asyncio.run(agent.execute_task())
 
         console.print(f"\n[green]Trajectory saved to: {trajectory_path}[/green]")
 
     except KeyboardInterrupt:
         console.print("\n[yellow]Task execution interrupted by user[/yellow]")
+        if agent.trajectory_recorder:
+            agent.trajectory_recorder.close()
         if trajectory_path:
             console.print(f"[blue]Partial trajectory saved to: {trajectory_path}[/blue]")
+            console.print(f"[blue]Continue the run with: trae-cli run --resume {trajectory_path}[/blue]")
         sys.exit(1)
     except Exception as e:
         console.print(f"\n[red]Unexpected error: {e}[/red]")
         console.print(traceback.format_exc())
+        if agent.trajectory_recorder:
+            agent.trajectory_recorder.close()
         if trajectory_path:
             console.print(f"[blue]Trajectory saved to: {trajectory_path}[/blue]")
         sys.exit(1)
@@ -163,9 +212,11 @@ def run(task: str, provider: str | None = None, model: str | None = None, api_ke
 @click.option('--config-file', help='Path to configuration file', default='trae_config.json')
 @click.option('--max-steps', help='Maximum number of execution steps', type=int, default=20)
 @click.option('--trajectory-file', '-t', help='Path to save trajectory file')
+@click.option('--trajectory-fsync', type=click.Choice(FSYNC_POLICIES), default='batch', show_default=True,
+              help='When trajectory events are forced to disk: never, after every written batch or after every event')
 def interactive(provider: str | None = None, model: str | None = None, api_key: str | None = None,
                 config_file: str = "trae_config.json", max_steps: int | None = None,
-                trajectory_file: str | None = None):
+                trajectory_file: str | None = None, trajectory_fsync: FsyncPolicy = "batch"):
     """Start an interactive session with Trae Agent."""
     config = load_config(provider, model, api_key, config_file=config_file, max_steps=max_steps)
 
@@ -224,7 +275,7 @@ def interactive(provider: str | None = None, model: str | None = None, api_key:
                 continue
 
             # Set up trajectory recording for this task
-            trajectory_path = agent.setup_trajectory_recording(trajectory_file)
+            trajectory_path = agent.setup_trajectory_recording(trajectory_file, trajectory_fsync)
 
             console.print(f"[blue]Trajectory will be saved to: {trajectory_path}[/blue]")
 
@@ -244,6 +295,8 @@ def interactive(provider: str | None = None, model: str | None = None, api_key:
             console.print(f"\n[green]Trajectory saved to: {trajectory_path}[/green]")
 
         except KeyboardInterrupt:
+            if agent.trajectory_recorder:
+                agent.trajectory_recorder.close()
             console.print("\n[yellow]Use 'exit' or 'quit' to end the session[/yellow]")
         except EOFError:
             console.print("\n[green]Goodbye![/green]")
@@ -316,6 +369,249 @@ def tools():
     console.print(tools_table)
 
 
+@cli.group()
+def trajectory():
+    """Convert and inspect trajectory files."""
+    pass
+
+
+def _default_destination(source: Path, decompress: bool) -> Path:
+    if decompress:
+        return source.with_name(source.name.removesuffix(".gz"))
+    name = source.name.removesuffix(".json") + ".jsonl" if source.name.endswith(".json") else source.name
+    return source.with_name(name + ".gz")
+
+
+@trajectory.command()
+@click.argument('sources', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--decompress', '-d', is_flag=True, help='Convert compressed trajectories back to plain JSON Lines')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False, path_type=Path),
+              help='Directory for the converted files, defaults to the directory of each source')
+def convert(sources: tuple[Path, ...], decompress: bool = False, output_dir: Path | None = None):
+    """Compress trajectories, in any format, into indexed gzip files, or decompress them.
+
+    SOURCES: Trajectory files to convert
+    """
+    from .utils.trajectory_archive import compress_trajectory, decompress_trajectory
+
+    results_table = Table(title="Converted Trajectories")
+    results_table.add_column("Source", style="cyan")
+    results_table.add_column("Destination", style="green")
+    results_table.add_column("Size", justify="right")
+
+    failed = False
+    for source in sources:
+        destination = _default_destination(source, decompress)
+        if output_dir:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            destination = output_dir / destination.name
+        if destination.resolve() == source.resolve():
+            console.print(f"[red]Error converting {source}: the destination is the source itself[/red]")
+            failed = True
+            continue
+        try:
+            if decompress:
+                _ = decompress_trajectory(source, destination)
+            else:
+                _ = compress_trajectory(source, destination)
+        except Exception as e:
+            console.print(f"[red]Error converting {source}: {e}[/red]")
+            failed = True
+            continue
+        source_size, destination_size = source.stat().st_size, destination.stat().st_size
+        results_table.add_row(
+            str(source), str(destination),
+            f"{source_size:,} → {destination_size:,} bytes ({destination_size / max(source_size, 1):.1%})"
+        )
+
+    console.print(results_table)
+    if failed:
+        sys.exit(1)
+
+
+@trajectory.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--step', '-s', type=int, help='Print the agent step with this step number')
+@click.option('--interaction', '-i', type=int, help='Print the n-th LLM interaction, counting from 1')
+def inspect(path: Path, step: int | None = None, interaction: int | None = None):
+    """Summarize a trajectory file or print a single step of it.
+
+    PATH: Trajectory file, plain or compressed
+    """
+    from .utils.trajectory_archive import CompressedTrajectory
+    from .utils.trajectory_reader import is_compressed, iter_events, load_trajectory
+
+    compressed = CompressedTrajectory(path) if is_compressed(path) else None
+    try:
+        if step is not None:
+            if compressed:
+                event = compressed.agent_step(step)
+            else:
+                event = next(
+                    e for e in iter_events(path) if e.get("type") == "agent_step" and e.get("step_number") == step
+                )
+            console.print_json(data=event)
+            return
+        if interaction is not None:
+            if compressed:
+                event = compressed.llm_interaction(interaction)
+            else:
+                interactions = (e for e in iter_events(path) if e.get("type") == "llm_interaction")
+                event = next(e for i, e in enumerate(interactions, start=1) if i == interaction)
+            console.print_json(data=event)
+            return
+    except (KeyError, StopIteration):
+        console.print(f"[red]The requested event is not in {path}[/red]")
+        sys.exit(1)
+
+    if compressed:
+        header = compressed.header() or {}
+        footer = compressed.footer() or {}
+        n_steps, n_interactions = len(compressed.index.agent_steps), len(compressed.index.llm_interactions)
+        stats = compressed.stats()
+    else:
+        data = load_trajectory(path)
+        header = footer = data
+        n_steps, n_interactions = len(data["agent_steps"]), len(data["llm_interactions"])
+        stats = data["stats"]
+
+    summary_table = Table(title=f"Trajectory {path}")
+    summary_table.add_column("Field", style="cyan")
+    summary_table.add_column("Value", style="green")
+    summary_table.add_row("Task", str(header.get("task", ""))[:200])
+    summary_table.add_row("Provider / Model", f"{header.get('provider')} / {header.get('model')}")
+    summary_table.add_row("Start Time", str(header.get("start_time")))
+    summary_table.add_row("Agent Steps", str(n_steps))
+    summary_table.add_row("LLM Interactions", str(n_interactions))
+    summary_table.add_row("Finished", "Yes" if footer.get("end_time") else "No (still running or interrupted)")
+    summary_table.add_row("Success", str(footer.get("success")))
+    summary_table.add_row("Execution Time", f"{footer.get('execution_time') or 0.0:.2f}s")
+    summary_table.add_row("File Size", f"{path.stat().st_size:,} bytes" + (" (compressed, indexed)" if compressed else ""))
+    for category, values in stats.items():
+        summary_table.add_row(f"Stats: {category}", json.dumps(values))
+    console.print(summary_table)
+
+
+def _seconds(value: float | None) -> str:
+    return f"{value:.2f}s" if value is not None else "-"
+
+
+def _latency_row(latency: dict[str, float | int | None]) -> list[str]:
+    return [str(latency["count"])] + [_seconds(latency[key]) for key in ("mean", "p50", "p90", "p99", "max")]
+
+
+@cli.command()
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option('--json', 'as_json', is_flag=True, help='Print the statistics as JSON')
+@click.option('--workers', '-j', type=int, help='Number of worker processes, defaults to the number of CPUs')
+@click.option('--top', type=int, default=10, show_default=True, help='Number of slowest steps to list')
+def stats(paths: tuple[Path, ...], as_json: bool = False, workers: int | None = None, top: int = 10):
+    """Aggregate latency, token and failure statistics over trajectory files.
+
+    PATHS: Trajectory files, plain or compressed, or directories to search for them
+    """
+    from .utils.trajectory_stats import analyze_trajectories
+
+    summary = analyze_trajectories(paths, workers=workers, top=top).summary()
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+        return
+
+    overview_table = Table(title="Trajectory Statistics")
+    overview_table.add_column("Metric", style="cyan")
+    overview_table.add_column("Value", style="green", justify="right")
+    runs, failures, tokens = summary["runs"], summary["failures"], summary["tokens"]
+    overview_table.add_row("Files", f"{summary['files']} ({len(summary['unreadable_files'])} unreadable)")
+    overview_table.add_row("Runs (finished / successful / unfinished)",
+                           f"{runs['finished']} / {runs['successful']} / {runs['unfinished']}")
+    overview_table.add_row("Agent Steps", str(summary["steps"]))
+    overview_table.add_row("LLM Interactions", str(summary["llm_interactions"]))
+    overview_table.add_row("Failed Runs", str(failures["failed_runs"]))
+    overview_table.add_row("Steps With Errors", str(failures["error_steps"]))
+    overview_table.add_row("Failed Tool Calls", str(failures["failed_tool_calls"]))
+    for kind, count in tokens.items():
+        overview_table.add_row(f"Tokens: {kind.replace('_', ' ')}", f"{count:,}")
+    hit_rate = summary["cache_hit_rate"]
+    overview_table.add_row("Cache Hit Rate", f"{hit_rate:.1%}" if hit_rate is not None else "-")
+    console.print(overview_table)
+
+    latency_table = Table(title="Latency")
+    for column in ("", "Count", "Mean", "p50", "p90", "p99", "Max"):
+        latency_table.add_column(column, style="cyan" if not column else None, justify="left" if not column else "right")
+    latency_table.add_row("Agent steps", *_latency_row(summary["step_latency"]))
+    for name, tool in summary["tools"].items():
+        latency_table.add_row(f"{name} ({tool['failed']}/{tool['calls']} failed)", *_latency_row(tool["latency"]))
+    console.print(latency_table)
+
+    if summary["slowest_steps"]:
+        slowest_table = Table(title="Slowest Steps")
+        slowest_table.add_column("Duration", justify="right", style="red")
+        slowest_table.add_column("Step", justify="right")
+        slowest_table.add_column("Trajectory", style="cyan")
+        slowest_table.add_column("Tools")
+        for step in summary["slowest_steps"]:
+            slowest_table.add_row(_seconds(step["duration"]), str(step["step_number"]), step["path"], ", ".join(step["tools"]))
+        console.print(slowest_table)
+
+    for error in summary["unreadable_files"]:
+        console.print(f"[yellow]Skipped unreadable file {error}[/yellow]")
+
+
+@cli.command()
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, path_type=Path))
+@click.option('--db', 'db_path', type=click.Path(dir_okay=False, path_type=Path),
+              help='SQLite database of the index, defaults to one in the cache directory')
+@click.option('--workers', '-j', type=int, help='Number of worker processes, defaults to the number of CPUs')
+@click.option('--prune', is_flag=True, help='Remove runs whose trajectory file no longer exists')
+@click.option('--sql', help='Query to run against the index after indexing, e.g. to compute latencies by model')
+@click.option('--json', 'as_json', is_flag=True, help='Print the result of --sql as JSON')
+def index(paths: tuple[Path, ...], db_path: Path | None = None, workers: int | None = None, prune: bool = False,
+          sql: str | None = None, as_json: bool = False):
+    """Incrementally index trajectory files into a SQLite database for querying across runs.
+
+    PATHS: Trajectory files, plain or compressed, or directories to search for them.
+    Files that did not change since they were indexed are skipped.
+    """
+    import sqlite3
+
+    from .utils.cache import get_cache_dir
+    from .utils.trajectory_index import connect_index, index_trajectories
+
+    db_path = db_path or get_cache_dir("trajectory_index") / "trajectories.sqlite3"
+    if paths or prune:
+        result = index_trajectories(db_path, paths, workers=workers, prune=prune)
+        console.print(
+            f"[green]Indexed {result.indexed} trajectories into {db_path}[/green] "
+            + f"({result.unchanged} unchanged, {result.removed} removed)"
+        )
+        for error in result.unreadable:
+            console.print(f"[yellow]Unreadable file {error}[/yellow]")
+    elif not sql:
+        console.print("[red]Error: give trajectory files or directories to index, or a query with --sql[/red]")
+        sys.exit(1)
+
+    if sql:
+        conn = connect_index(db_path)
+        try:
+            cursor = conn.execute(sql)
+            columns = [description[0] for description in cursor.description or []]
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            console.print(f"[red]Query failed: {e}[/red]")
+            sys.exit(1)
+        finally:
+            conn.close()
+        if as_json:
+            click.echo(json.dumps([dict(zip(columns, row)) for row in rows], indent=2))
+            return
+        result_table = Table()
+        for column in columns:
+            result_table.add_column(column)
+        for row in rows:
+            result_table.add_row(*("" if value is None else str(value) for value in row))
+        console.print(result_table)
+
+
 def main():
     """Main entry point for the CLI."""
     cli()
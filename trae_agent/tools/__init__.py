@@ -5,8 +5,10 @@
 
 from .base import Tool, ToolResult, ToolCall, ToolExecutor
 from .bash_tool import BashTool
+from .code_search_tool import CodeSearchTool
 from .edit_tool import TextEditorTool
 from .sequential_thinking_tool import SequentialThinkingTool
+from .symbols_tool import SymbolsTool
 from .task_done_tool import TaskDoneTool
 
 __all__ = [
@@ -15,8 +17,10 @@ __all__ = [
     "ToolCall",
     "ToolExecutor",
     "BashTool",
+    "CodeSearchTool",
     "TextEditorTool",
     "SequentialThinkingTool",
+    "SymbolsTool",
     "TaskDoneTool"
 ]
 
@@ -24,5 +28,7 @@ tools_registry = {
     "bash": BashTool,
     "str_replace_based_edit_tool": TextEditorTool,
     "sequentialthinking": SequentialThinkingTool,
-    "task_done": TaskDoneTool
+    "task_done": TaskDoneTool,
+    "code_search": CodeSearchTool,
+    "symbols": SymbolsTool
 }
\ No newline at end of file
@@ -4,10 +4,14 @@
 """Base classes for tools and tool calling."""
 
 import asyncio
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import override
 
+from ..utils.tracing import get_tracer
+from .output_compaction import CompactionStats, OutputCompactor
+
 
 class ToolError(Exception):
     """Base class for tool errors."""
@@ -31,6 +35,8 @@ class ToolResult:
     result: str | None = None
     error: str | None = None
     id: str | None = None # OpenAI-specific field
+    compaction: CompactionStats | None = None
+    duration: float | None = None  # seconds
 
 
 ToolCallArguments = dict[str, str | int | float | dict[str, object] | list[object] | None]
@@ -87,6 +93,26 @@ class Tool(ABC):
         """Execute the tool with given parameters."""
         pass
 
+    def set_project_path(self, project_path: str):
+        """Called with the project root when a new task starts. Tools that work on the project override this."""
+        pass
+
+    def get_stats(self) -> dict[str, int]:
+        """Get counters that are recorded in the trajectory at the end of a run, if the tool keeps any."""
+        return {}
+
+    async def close(self):
+        """Called when the agent is done with the tool. Tools that keep processes running override this."""
+        pass
+
+    def changes_files(self, arguments: ToolCallArguments) -> bool:
+        """Whether a call with these arguments may change files of the project. Tools that write files override this."""
+        return False
+
+    def files_changed(self):
+        """Called after a call of another tool may have changed files. Tools that index the project override this."""
+        pass
+
     def json_definition(self) -> dict[str, object]:
         return {
             "name": self.get_name(),
@@ -127,11 +153,26 @@ class Tool(ABC):
 class ToolExecutor:
     """Tool executor that manages tool execution."""
 
-    def __init__(self, tools: list[Tool]):
+    def __init__(self, tools: list[Tool], compactor: OutputCompactor | None = None):
         self.tools: dict[str, Tool] = {tool.name: tool for tool in tools}
+        self.compactor: OutputCompactor | None = compactor
 
     async def execute_tool_call(self, tool_call: ToolCall) -> ToolResult:
         """Execute a tool call."""
+        with get_tracer().span("tool.execute", {
+            "gen_ai.tool.name": tool_call.name,
+            "gen_ai.tool.call.id": tool_call.call_id
+        }) as span:
+            tool_result = await self._execute_tool_call(tool_call)
+            span.set_attribute("trae.tool.success", tool_result.success)
+            span.set_attribute("trae.tool.output_chars", len(tool_result.result or "") + len(tool_result.error or ""))
+            if tool_result.compaction:
+                span.set_attribute("trae.tool.raw_output_chars", tool_result.compaction.raw_chars)
+            if not tool_result.success:
+                span.set_error(tool_result.error or "The tool call failed")
+            return tool_result
+
+    async def _execute_tool_call(self, tool_call: ToolCall) -> ToolResult:
         if tool_call.name not in self.tools:
             return ToolResult(
                 success=False,
@@ -142,23 +183,57 @@ class ToolExecutor:
 
         tool = self.tools[tool_call.name]
 
+        start_time = time.perf_counter()
         try:
-            tool_exec_result = await tool.execute(tool_call.arguments)
-            return ToolResult(
+            try:
+                tool_exec_result = await tool.execute(tool_call.arguments)
+            finally:
+                if tool.changes_files(tool_call.arguments):
+                    for other in self.tools.values():
+                        if other is not tool:
+                            other.files_changed()
+            tool_result = ToolResult(
                 success=tool_exec_result.error_code == 0,
                 result=tool_exec_result.output,
                 error=tool_exec_result.error,
                 call_id=tool_call.call_id,
-                id=tool_call.id
+                id=tool_call.id,
+                duration=time.perf_counter() - start_time
             )
+            if self.compactor and self.compactor.applies_to(tool_call.name):
+                self.compact_result(tool_result)
+            return tool_result
         except Exception as e:
             return ToolResult(
                 success=False,
                 error=f"Error executing tool '{tool_call.name}': {str(e)}",
                 call_id=tool_call.call_id,
-                id=tool_call.id
+                id=tool_call.id,
+                duration=time.perf_counter() - start_time
             )
 
+    def compact_result(self, tool_result: ToolResult) -> None:
+        """Compact the output and error of a tool result in place and record the sizes."""
+        assert self.compactor is not None
+        raw_chars = 0
+        compacted_chars = 0
+        strategies: list[str] = []
+        if tool_result.result:
+            raw_chars += len(tool_result.result)
+            tool_result.result, applied = self.compactor.compact(tool_result.result)
+            compacted_chars += len(tool_result.result)
+            strategies.extend(applied)
+        if tool_result.error:
+            raw_chars += len(tool_result.error)
+            tool_result.error, applied = self.compactor.compact(tool_result.error)
+            compacted_chars += len(tool_result.error)
+            strategies.extend(s for s in applied if s not in strategies)
+        tool_result.compaction = CompactionStats(
+            raw_chars=raw_chars,
+            compacted_chars=compacted_chars,
+            strategies=strategies
+        )
+
     async def parallel_tool_call(self, tool_calls: list[ToolCall]) -> list[ToolResult]:
         """Execute tool calls in parallel"""
         return await asyncio.gather(*[self.execute_tool_call(call) for call in tool_calls])
@@ -166,3 +241,7 @@ class ToolExecutor:
     async def sequential_tool_call(self, tool_calls: list[ToolCall]) -> list[ToolResult]:
         """Execute tool calls in sequential"""
         return [await self.execute_tool_call(call) for call in tool_calls]
+
+    async def close_tools(self):
+        """Close all tools, e.g. stopping the shells of the bash tool."""
+        _ = await asyncio.gather(*(tool.close() for tool in self.tools.values()))
@@ -11,10 +11,95 @@
 
 import asyncio
 import os
+import re
+import shlex
+import signal
+from dataclasses import dataclass, field
 from typing import override
 
 from .base import Tool, ToolCallArguments, ToolExecResult, ToolError, ToolParameter
 
+MAX_ENV_STATEMENTS: int = 64
+# the body of a heredoc is data, only the rest of the line that starts it is part of the command
+HEREDOC_RE = re.compile(r"""<<-?[ \t]*(['"]?)(\w+)\1([^\n]*)\n.*?^[ \t]*\2[ \t]*$""", re.MULTILINE | re.DOTALL)
+COMMAND_SEPARATOR_CHARS: str = ";&|()\n"
+
+
+def _split_commands(command: str) -> list[str]:
+    """Split a command line at the separators of its commands, leaving quoted strings, substitutions and comments alone."""
+    commands: list[str] = []
+    start = 0
+    quote: str | None = None  # the open quote or backtick
+    depth = 0  # of nested `$(` substitutions
+    i = 0
+    while i < len(command):
+        char = command[i]
+        if char == "\\" and quote != "'":
+            i += 2
+            continue
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char == "(" and command[i - 1:i] == "$":
+            depth += 1
+        elif char == ")" and depth > 0:
+            depth -= 1
+        elif depth == 0 and char == "#" and command[i - 1:i] in ("", " ", "\t", "\n", ";"):
+            # a comment runs up to the end of the line
+            commands.append(command[start:i])
+            end = command.find("\n", i)
+            i = start = len(command) if end == -1 else end
+            continue
+        elif depth == 0 and char in COMMAND_SEPARATOR_CHARS:
+            commands.append(command[start:i])
+            start = i + 1
+        i += 1
+    commands.append(command[start:])
+    return commands
+
+
+def env_statements(command: str) -> list[str]:
+    """Return the `export`/`unset` statements a command runs, as they are written in it.
+
+    Only statements in the position of a command count, not words in quoted strings, heredocs
+    or comments, and only statements that `shlex` can parse.
+    """
+    statements: list[str] = []
+    for part in _split_commands(HEREDOC_RE.sub(r"\3", command)):
+        part = part.strip()
+        try:
+            words = shlex.split(part)
+        except ValueError:
+            continue
+        if len(words) > 1 and words[0] in ("export", "unset"):
+            statements.append(part)
+    return statements
+
+
+@dataclass
+class _ShellState:
+    """Shell state that survives a session restart."""
+    cwd: str | None = None
+    env_statements: list[str] = field(default_factory=list)
+
+    def record_command(self, command: str):
+        """Remember the `export`/`unset` statements of a command."""
+        for statement in env_statements(command):
+            if statement in self.env_statements:
+                self.env_statements.remove(statement)
+            self.env_statements.append(statement)
+        del self.env_statements[:-MAX_ENV_STATEMENTS]
+
+    def replay_script(self) -> str | None:
+        """Build a script that restores the recorded state in a fresh shell."""
+        statements: list[str] = []
+        if self.cwd:
+            statements.append(f"cd {shlex.quote(self.cwd)}")
+        statements.extend(self.env_statements)
+        return "\n".join(statements) if statements else None
+
 
 class _BashSession:
     """A session of a bash shell."""
@@ -31,6 +116,7 @@ class _BashSession:
         self._started = False
         self._timed_out = False
         self._process: asyncio.subprocess.Process | None = None
+        self.cwd: str | None = None
 
     async def start(self):
         if self._started:
@@ -48,15 +134,33 @@ class _BashSession:
 
         self._started = True
 
+    @property
+    def timed_out(self) -> bool:
+        return self._timed_out
+
+    @property
+    def exited(self) -> bool:
+        return self._process is not None and self._process.returncode is not None
+
     def stop(self):
-        """Terminate the bash shell."""
+        """Kill the bash shell together with every process it started."""
         if not self._started:
             raise ToolError("Session has not started.")
         if self._process is None:
             return
-        if self._process.returncode is not None:
+        try:
+            # the shell is the leader of its own process group (see `os.setsid` above)
+            os.killpg(os.getpgid(self._process.pid), signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            if self._process.returncode is None:
+                self._process.kill()
+
+    async def close(self):
+        """Kill the bash shell and wait for it, so that nothing of it is left when the event loop closes."""
+        if not self._started or self._process is None:
             return
-        self._process.terminate()
+        self.stop()
+        _ = await self._process.wait()
 
     async def run(self, command: str) -> ToolExecResult:
         """Execute a command in the bash shell."""
@@ -64,12 +168,12 @@ class _BashSession:
             raise ToolError("Session has not started.")
         if self._process.returncode is not None:
             return ToolExecResult(
-                error=f"bash has exited with returncode {self._process.returncode}. tool must be restarted.",
+                error=f"bash has exited with returncode {self._process.returncode}, a new session is started on the next call.",
                 error_code=-1
             )
         if self._timed_out:
             raise ToolError(
-                f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
+                f"timed out: bash has not returned in {self._timeout} seconds, a new session is started on the next call",
             )
 
         # we know these are not None because we created the process with PIPEs
@@ -78,8 +182,9 @@ class _BashSession:
         assert self._process.stderr
 
         # send command to the process
+        # the working directory is reported after the sentinel so it can be restored later
         self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
+            command.encode() + f"; echo '{self._sentinel}'\"$PWD\"\n".encode()
         )
         await self._process.stdin.drain()
 
@@ -91,14 +196,19 @@ class _BashSession:
                     # if we read directly from stdout/stderr, it will wait forever for
                     # EOF. use the StreamReader buffer directly instead.
                     output: str = self._process.stdout._buffer.decode()  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownVariableType]
+                    if self._sentinel not in output and self._process.returncode is not None:
+                        raise ToolError(f"bash has exited with returncode {self._process.returncode}")
                     if self._sentinel in output:
-                        # strip the sentinel and break
-                        output = output[: output.index(self._sentinel)] # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+                        output, _, cwd = output.partition(self._sentinel) # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+                        if "\n" not in cwd:
+                            continue
+                        # strip the sentinel and the working directory and break
+                        self.cwd = cwd.split("\n", 1)[0] # pyright: ignore[reportUnknownMemberType]
                         break
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
-                f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
+                f"timed out: bash has not returned in {self._timeout} seconds",
             ) from None
 
         if output.endswith("\n"): # pyright: ignore[reportUnknownMemberType]
@@ -124,9 +234,15 @@ class BashTool(Tool):
     """
 
     _session: _BashSession | None
+    _standby: asyncio.Task[_BashSession] | None
 
     def __init__(self):
         self._session = None
+        # a pre-warmed shell that replaces the session after a timeout without spawn latency
+        self._standby = None
+        self._state: _ShellState = _ShellState()
+        # what happened to a recovered session, reported with the result of the call that recovered it
+        self._recovery_notice: str | None = None
         super().__init__()
 
     @override
@@ -165,16 +281,15 @@ class BashTool(Tool):
     async def execute(self, arguments: ToolCallArguments) -> ToolExecResult:
         if arguments.get("restart"):
             if self._session:
-                self._session.stop()
-            self._session = _BashSession()
-            await self._session.start()
+                await self._session.close()
+            self._session = await self._take_standby()
+            self._state = _ShellState()
 
             return ToolExecResult(output="tool has been restarted.")
 
         if self._session is None:
             try:
-                self._session = _BashSession()
-                await self._session.start()
+                self._session = await self._take_standby()
             except Exception as e:
                 return ToolExecResult(
                     error=f"Error starting bash session: {e}",
@@ -188,9 +303,72 @@ class BashTool(Tool):
                 error_code=-1
             )
         try:
-            return await self._session.run(command)
+            result = await self._session.run(command)
+            # only commands that returned change the state replayed in a recovered session
+            self._state.record_command(command)
+            self._state.cwd = self._session.cwd or self._state.cwd
+            if self._session.exited:
+                self._recovery_notice = await self._recover()
         except Exception as e:
-            return ToolExecResult(
-                error=f"Error running bash command: {e}",
-                error_code=-1
-            )
+            result = ToolExecResult(error=f"Error running bash command: {e}", error_code=-1)
+            if self._session.timed_out or self._session.exited:
+                self._recovery_notice = await self._recover()
+        return self._with_recovery_notice(result)
+
+    def _with_recovery_notice(self, result: ToolExecResult) -> ToolExecResult:
+        """Add the notice of a recovery to the result, so that the agent always learns about it."""
+        notice, self._recovery_notice = self._recovery_notice, None
+        if notice is None:
+            return result
+        if result.error_code != 0 or result.error:
+            result.error = f"{result.error}\n{notice}" if result.error else notice
+        else:
+            result.output = f"{result.output}\n{notice}" if result.output else notice
+        return result
+
+    @override
+    def changes_files(self, arguments: ToolCallArguments) -> bool:
+        return True
+
+    async def _start_session(self) -> _BashSession:
+        session = _BashSession()
+        await session.start()
+        return session
+
+    @override
+    async def close(self):
+        """Stop the session and the standby shell; a new session is started if the tool is called again."""
+        session, self._session = self._session, None
+        standby, self._standby = self._standby, None
+        if session is not None:
+            await session.close()
+        if standby is not None:
+            try:
+                standby_session = await standby
+            except Exception:
+                return
+            await standby_session.close()
+
+    async def _take_standby(self) -> _BashSession:
+        """Return the pre-warmed standby session and start warming up the next one."""
+        standby = self._standby or asyncio.create_task(self._start_session())
+        self._standby = asyncio.create_task(self._start_session())
+        return await standby
+
+    async def _recover(self) -> str:
+        """Replace a timed out or exited session with the standby shell and restore its state."""
+        assert self._session is not None
+        await self._session.close()
+        try:
+            self._session = await self._take_standby()
+            script = self._state.replay_script()
+            if script:
+                _ = await self._session.run(script)
+        except Exception as e:
+            self._session = None
+            return f"The bash session could not be restarted automatically ({e}), it will be started again on the next call."
+
+        restored = f"working directory `{self._state.cwd}`" if self._state.cwd else "a fresh working directory"
+        if self._state.env_statements:
+            restored += f" and {len(self._state.env_statements)} recorded export/unset statements"
+        return f"The bash session and all of its processes were killed and a new session was started automatically with {restored}. You can continue running commands, there is no need to restart the tool."
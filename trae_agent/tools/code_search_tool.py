@@ -0,0 +1,206 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import fnmatch
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import override
+
+from ..utils.cache import get_cache_dir
+from .base import Tool, ToolCallArguments, ToolError, ToolExecResult, ToolParameter
+from .trigram_index import TrigramIndex, required_literals
+
+DEFAULT_MAX_RESULTS: int = 50
+MAX_RESULTS_PER_FILE: int = 10
+MAX_LINE_LENGTH: int = 200
+DEFINITION_RE = re.compile(r"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|fn|func|interface|struct|enum|type|trait)\b")
+
+
+@dataclass
+class _SearchMatch:
+    path: str
+    line_number: int
+    line: str
+    is_definition: bool
+
+
+def _rank(match: _SearchMatch) -> tuple[bool, bool, int, str, int]:
+    # definitions first, then non-test files, then shallow paths
+    is_test = "test" in match.path.lower()
+    return (not match.is_definition, is_test, match.path.count("/"), match.path, match.line_number)
+
+
+class CodeSearchTool(Tool):
+    """Tool to search the project with a trigram index instead of `grep -rn`."""
+
+    def __init__(self):
+        self._index: TrigramIndex | None = None
+        super().__init__()
+
+    @override
+    def get_name(self) -> str:
+        return "code_search"
+
+    @override
+    def get_description(self) -> str:
+        return """Search the contents of all files in the project, like `grep -rn` but backed by an index so it is fast even on very large repositories
+* Searches are case-insensitive literal string searches by default. Set `regex` to true to search for a Python regular expression
+* Files ignored by `.gitignore`, hidden files and binary files are not searched
+* Use `path_glob` to restrict the search to some files, e.g. `*.py` or `src/*/models/*`
+* Results are shown as `path:line: content`, definitions first, and are capped by `max_results`
+"""
+
+    @override
+    def get_parameters(self) -> list[ToolParameter]:
+        return [
+            ToolParameter(
+                name="query",
+                type="string",
+                description="The string or regular expression to search for.",
+                required=True
+            ),
+            ToolParameter(
+                name="regex",
+                type="boolean",
+                description="Whether `query` is a Python regular expression. Defaults to false.",
+                required=False
+            ),
+            ToolParameter(
+                name="case_sensitive",
+                type="boolean",
+                description="Whether the search is case sensitive. Defaults to false.",
+                required=False
+            ),
+            ToolParameter(
+                name="path_glob",
+                type="string",
+                description="Optional glob that the path of a file relative to the project root has to match, e.g. `*.py`.",
+                required=False
+            ),
+            ToolParameter(
+                name="max_results",
+                type="integer",
+                description=f"Maximum number of matching lines to show. Defaults to {DEFAULT_MAX_RESULTS}.",
+                required=False
+            ),
+        ]
+
+    @override
+    def set_project_path(self, project_path: str):
+        """Start building the index of the project and keeping it up to date in the background."""
+        if self._index is not None:
+            self._index.stop()
+        project_root = Path(project_path).resolve()
+        digest = hashlib.sha1(str(project_root).encode()).hexdigest()[:16]
+        self._index = TrigramIndex(project_root, get_cache_dir("code_search") / f"{digest}.sqlite3")
+        self._index.watch()
+
+    @override
+    def files_changed(self):
+        """Update the index right away instead of at the next background update."""
+        if self._index is not None:
+            self._index.files_changed()
+
+    @override
+    async def close(self):
+        """Stop the background updates of the index; they start again if the tool is called again."""
+        if self._index is not None:
+            await asyncio.to_thread(self._index.stop)
+
+    @override
+    async def execute(self, arguments: ToolCallArguments) -> ToolExecResult:
+        query = str(arguments["query"]) if arguments.get("query") else None
+        if query is None:
+            return ToolExecResult(
+                error=f"No query provided for the {self.get_name()} tool",
+                error_code=-1
+            )
+        if self._index is None:
+            return ToolExecResult(
+                error="The project root is unknown, use `grep -rn` through the bash tool instead.",
+                error_code=-1
+            )
+        is_regex = bool(arguments.get("regex", False))
+        case_sensitive = bool(arguments.get("case_sensitive", False))
+        path_glob = str(arguments["path_glob"]) if arguments.get("path_glob") else None
+        max_results = arguments.get("max_results") or DEFAULT_MAX_RESULTS
+        try:
+            max_results = max(1, int(max_results)) # pyright: ignore[reportArgumentType]
+            pattern = re.compile(
+                query if is_regex else re.escape(query),
+                0 if case_sensitive else re.IGNORECASE
+            )
+        except (ValueError, re.error) as e:
+            return ToolExecResult(error=f"Invalid search parameters: {e}", error_code=-1)
+
+        self._index.watch()
+        try:
+            return await asyncio.to_thread(self.search, pattern, required_literals(query, is_regex), path_glob, max_results)
+        except ToolError as e:
+            return ToolExecResult(error=e.message, error_code=-1)
+
+    def search(self, pattern: re.Pattern[str], literals: list[str], path_glob: str | None, max_results: int) -> ToolExecResult:
+        """Search the candidate files of the index and return the ranked, capped matches."""
+        assert self._index is not None
+        # the index is kept up to date in the background, files changed in the last few seconds may not be picked up yet
+        matches: list[_SearchMatch] = []
+        n_files = 0
+        stale = False
+        for relative, indexed in self._index.candidates(literals).items():
+            if path_glob and not fnmatch.fnmatch(relative, path_glob) and not fnmatch.fnmatch(Path(relative).name, path_glob):
+                continue
+            path = self._index.project_path / relative
+            try:
+                stat = path.stat()
+                text = path.read_text(errors="replace")
+            except OSError:
+                stale = True
+                continue
+            # the file is searched as it is now, but the index has to catch up with it
+            stale = stale or (stat.st_mtime_ns, stat.st_size) != indexed
+            file_matches: list[_SearchMatch] = []
+            line_number = 1
+            line_start = 0
+            for match in pattern.finditer(text):
+                if match.start() < line_start:
+                    # only the first match of each line is reported
+                    continue
+                line_number += text.count("\n", line_start, match.start())
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                line_end = len(text) if line_end == -1 else line_end
+                line = text[line_start:line_end]
+                file_matches.append(_SearchMatch(relative, line_number, line, bool(DEFINITION_RE.match(line))))
+                line_start = line_end + 1
+                line_number += 1
+            if file_matches:
+                n_files += 1
+                file_matches.sort(key=lambda m: not m.is_definition)
+                matches.extend(file_matches)
+
+        if stale:
+            self._index.files_changed()
+        if not matches:
+            return ToolExecResult(output=f"No matches found for `{pattern.pattern}`.")
+
+        matches.sort(key=_rank)
+        shown: list[_SearchMatch] = []
+        per_file: dict[str, int] = {}
+        for match in matches:
+            if per_file.get(match.path, 0) >= MAX_RESULTS_PER_FILE:
+                continue
+            per_file[match.path] = per_file.get(match.path, 0) + 1
+            shown.append(match)
+            if len(shown) >= max_results:
+                break
+
+        lines = [f"Found {len(matches)} matching lines in {n_files} files, showing {len(shown)}:"]
+        for match in shown:
+            line = match.line.strip()
+            if len(line) > MAX_LINE_LENGTH:
+                line = line[:MAX_LINE_LENGTH] + "..."
+            lines.append(f"{match.path}:{match.line_number}: {line}")
+        return ToolExecResult(output="\n".join(lines))
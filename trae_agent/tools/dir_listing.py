@@ -0,0 +1,277 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""In-process directory listing that honors `.gitignore` files."""
+
+import os
+import re
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+# directories that are listed with their size but never expanded
+COLLAPSED_DIR_NAMES = {"node_modules", "__pycache__", "site-packages"}
+# files that describe a project and are listed first
+PROJECT_FILE_NAMES = {
+    "readme", "readme.md", "readme.rst", "readme.txt", "pyproject.toml", "setup.py", "setup.cfg",
+    "requirements.txt", "package.json", "cargo.toml", "go.mod", "pom.xml", "build.gradle",
+    "makefile", "cmakelists.txt", "tox.ini", "dockerfile",
+}
+SOURCE_FILE_SUFFIXES = {
+    ".py", ".pyi", ".js", ".jsx", ".ts", ".tsx", ".java", ".kt", ".go", ".rs", ".c", ".cc",
+    ".cpp", ".h", ".hpp", ".cs", ".rb", ".php", ".swift", ".scala", ".sh",
+}
+MAX_LISTED_ENTRIES: int = 50
+# directories whose listing is kept, the least recently used ones are dropped first
+MAX_CACHED_LISTINGS: int = 10_000
+
+
+@dataclass
+class _IgnoreRule:
+    pattern: re.Pattern[str]
+    negated: bool
+    dir_only: bool
+
+
+class IgnoreRules:
+    """The rules of a single `.gitignore` file, matched relative to the directory containing it."""
+
+    def __init__(self, base_dir: Path, lines: list[str]):
+        self.base_dir: Path = base_dir
+        self.rules: list[_IgnoreRule] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # patterns without an inner slash match at any depth below the base directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            regex = self._translate(line)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append(_IgnoreRule(re.compile(f"^{regex}$"), negated, dir_only))
+
+    @classmethod
+    def from_file(cls, gitignore: Path) -> "IgnoreRules":
+        try:
+            lines = gitignore.read_text(errors="replace").split("\n")
+        except OSError:
+            lines = []
+        return cls(gitignore.parent, lines)
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        """Translate a gitignore glob into a regular expression."""
+        regex = ""
+        i = 0
+        while i < len(pattern):
+            c = pattern[i]
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+                continue
+            if pattern.startswith("/**", i) and i + 3 == len(pattern):
+                regex += "/.*"
+                i += 3
+                continue
+            if c == "*":
+                regex += ".*" if pattern.startswith("**", i) else "[^/]*"
+                i += 2 if pattern.startswith("**", i) else 1
+                continue
+            if c == "?":
+                regex += "[^/]"
+            elif c == "[":
+                end = pattern.find("]", i + 1)
+                if end == -1:
+                    regex += re.escape(c)
+                else:
+                    body = pattern[i + 1:end].replace("\\", "\\\\")
+                    # `!` negates the class only right after `[`, elsewhere it is a literal character
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    regex += "[" + body + "]"
+                    i = end
+            elif c == "\\" and i + 1 < len(pattern):
+                i += 1
+                regex += re.escape(pattern[i])
+            else:
+                regex += re.escape(c)
+            i += 1
+        return regex
+
+    def match(self, path: Path, is_dir: bool) -> bool | None:
+        """Return True if ignored, False if explicitly re-included, or None if no rule matches."""
+        try:
+            relative = path.relative_to(self.base_dir).as_posix()
+        except ValueError:
+            return None
+        result = None
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.pattern.match(relative):
+                result = not rule.negated
+        return result
+
+
+def is_ignored(path: Path, is_dir: bool, rules: list[IgnoreRules]) -> bool:
+    """Check a path against a stack of ignore rules, inner `.gitignore` files taking precedence."""
+    for ignore_rules in reversed(rules):
+        result = ignore_rules.match(path, is_dir)
+        if result is not None:
+            return result
+    return False
+
+
+@dataclass
+class _DirEntry:
+    name: str
+    is_dir: bool
+
+
+@dataclass
+class _CachedListing:
+    mtime_ns: int
+    entries: list[_DirEntry]
+
+
+def _relevance(entry: _DirEntry) -> tuple[int, str]:
+    name = entry.name.lower()
+    if not entry.is_dir and name in PROJECT_FILE_NAMES:
+        rank = 0
+    elif entry.is_dir:
+        rank = 1
+    elif os.path.splitext(name)[1] in SOURCE_FILE_SUFFIXES:
+        rank = 2
+    else:
+        rank = 3
+    return rank, name
+
+
+class DirectoryLister:
+    """Lists directories in-process, skipping hidden and ignored entries.
+
+    The entries of each directory are cached and reused as long as the mtime of the
+    directory is unchanged, which is the case until an entry is added, removed or renamed.
+    At most `max_cached_listings` directories are cached, least recently used first out.
+    """
+
+    def __init__(self, max_listed_entries: int = MAX_LISTED_ENTRIES, max_cached_listings: int = MAX_CACHED_LISTINGS):
+        self.max_listed_entries: int = max_listed_entries
+        self.max_cached_listings: int = max_cached_listings
+        self._listings: OrderedDict[Path, _CachedListing] = OrderedDict()
+        self._ignore_files: dict[Path, tuple[int, IgnoreRules]] = {}
+
+    def scan(self, directory: Path) -> list[_DirEntry]:
+        """Return the non-hidden entries of `directory` sorted by relevance."""
+        mtime_ns = os.stat(directory).st_mtime_ns
+        cached = self._listings.get(directory)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            self._listings.move_to_end(directory)
+            return cached.entries
+
+        with os.scandir(directory) as it:
+            entries = [
+                _DirEntry(entry.name, entry.is_dir(follow_symlinks=False))
+                for entry in it
+                if not entry.name.startswith(".")
+            ]
+        entries.sort(key=_relevance)
+        self._listings[directory] = _CachedListing(mtime_ns, entries)
+        self._listings.move_to_end(directory)
+        while len(self._listings) > self.max_cached_listings:
+            _ = self._listings.popitem(last=False)
+        return entries
+
+    def ignore_rules(self, directory: Path) -> IgnoreRules | None:
+        """Return the rules of the `.gitignore` file in `directory`, if there is one."""
+        gitignore = directory / ".gitignore"
+        try:
+            mtime_ns = os.stat(gitignore).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._ignore_files.get(gitignore)
+        if cached is None or cached[0] != mtime_ns:
+            cached = (mtime_ns, IgnoreRules.from_file(gitignore))
+            self._ignore_files[gitignore] = cached
+        return cached[1]
+
+    def ancestor_ignore_rules(self, directory: Path) -> list[IgnoreRules]:
+        """Collect the `.gitignore` rules of `directory` and its parents up to the repository root."""
+        rules: list[IgnoreRules] = []
+        for current in [directory, *directory.parents]:
+            current_rules = self.ignore_rules(current)
+            if current_rules is not None:
+                rules.append(current_rules)
+            if (current / ".git").exists():
+                return rules[::-1]
+        # not inside a git repository, only the `.gitignore` of the directory itself applies
+        own_rules = self.ignore_rules(directory)
+        return [own_rules] if own_rules is not None else []
+
+    def iter_files(self, root: Path) -> Iterator[Path]:
+        """Yield all non-hidden, non-ignored files below `root`."""
+        stack = [(root, self.ancestor_ignore_rules(root))]
+        while stack:
+            directory, rules = stack.pop()
+            try:
+                entries = self.scan(directory)
+            except OSError:
+                continue
+            for entry in entries:
+                path = directory / entry.name
+                if entry.name in COLLAPSED_DIR_NAMES or is_ignored(path, entry.is_dir, rules):
+                    continue
+                if entry.is_dir:
+                    child_rules = self.ignore_rules(path)
+                    stack.append((path, rules + [child_rules] if child_rules else rules))
+                else:
+                    yield path
+
+    def render(self, root: Path, max_depth: int = 2) -> str:
+        """Render the tree below `root` up to `max_depth` levels, one path per line."""
+        lines = [str(root)]
+        self._list_dir(root, self.ancestor_ignore_rules(root), 1, max_depth, lines)
+        return "\n".join(lines)
+
+    def _list_dir(self, directory: Path, rules: list[IgnoreRules], depth: int, max_depth: int, lines: list[str]):
+        try:
+            entries = self.scan(directory)
+        except OSError as e:
+            lines.append(f"{directory}/ [cannot be listed: {e.strerror}]")
+            return
+        entries = [e for e in entries if not is_ignored(directory / e.name, e.is_dir, rules)]
+
+        for entry in entries[:self.max_listed_entries]:
+            path = directory / entry.name
+            if not entry.is_dir:
+                lines.append(str(path))
+            elif entry.name in COLLAPSED_DIR_NAMES or depth >= max_depth:
+                lines.append(f"{path}/{self._summary(path)}" if entry.name in COLLAPSED_DIR_NAMES else f"{path}/")
+            else:
+                lines.append(f"{path}/")
+                child_rules = self.ignore_rules(path)
+                self._list_dir(path, rules + [child_rules] if child_rules else rules, depth + 1, max_depth, lines)
+
+        if len(entries) > self.max_listed_entries:
+            remaining = entries[self.max_listed_entries:]
+            n_dirs = sum(1 for e in remaining if e.is_dir)
+            lines.append(
+                f"{directory}/... [{len(remaining)} more entries not shown: {len(remaining) - n_dirs} files, {n_dirs} directories]"
+            )
+
+    def _summary(self, directory: Path) -> str:
+        try:
+            entries = self.scan(directory)
+        except OSError:
+            return ""
+        n_dirs = sum(1 for e in entries if e.is_dir)
+        return f" [not expanded: {len(entries) - n_dirs} files, {n_dirs} directories]"
@@ -0,0 +1,138 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Undo history of the file editing tool, stored as compact reverse patches."""
+
+import hashlib
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .base import ToolError
+from .file_cache import as_read_back
+
+MAX_UNDO_DEPTH: int = 10
+MAX_HISTORY_CHARS: int = 16 * 1024 * 1024
+# above this many differing lines the changed region is stored as a single hunk
+MAX_DIFF_LINES: int = 5000
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.blake2b(content.encode(errors="surrogatepass"), digest_size=16).hexdigest()
+
+
+@dataclass
+class ReversePatch:
+    """Hunks that turn the content after an edit back into the content before it.
+
+    Each hunk replaces the lines `[start, end)` of the edited content with the original
+    lines. A patch of an edit that created the file has `created` set and no hunks.
+    """
+    hunks: list[tuple[int, int, list[str]]]
+    after_hash: str
+    created: bool = False
+
+    @property
+    def size(self) -> int:
+        return sum(len(line) for _, _, lines in self.hunks for line in lines) + 64 * len(self.hunks) + 64
+
+    @classmethod
+    def from_edit(cls, old_content: str | None, new_content: str) -> "ReversePatch":
+        after_hash = _content_hash(new_content)
+        if old_content is None:
+            return cls(hunks=[], after_hash=after_hash, created=True)
+
+        old_lines = old_content.splitlines(keepends=True)
+        new_lines = new_content.splitlines(keepends=True)
+        # strip the common prefix and suffix first, edits are usually local
+        prefix = 0
+        max_prefix = min(len(old_lines), len(new_lines))
+        while prefix < max_prefix and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        max_suffix = max_prefix - prefix
+        while suffix < max_suffix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+        old_middle = old_lines[prefix:len(old_lines) - suffix]
+        new_middle = new_lines[prefix:len(new_lines) - suffix]
+
+        if len(old_middle) + len(new_middle) > MAX_DIFF_LINES:
+            hunks = [(prefix, prefix + len(new_middle), old_middle)]
+        else:
+            matcher = SequenceMatcher(None, new_middle, old_middle, autojunk=False)
+            hunks = [
+                (prefix + i1, prefix + i2, old_middle[j1:j2])
+                for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+                if tag != "equal"
+            ]
+        return cls(hunks=hunks, after_hash=after_hash)
+
+    def apply(self, content: str) -> str:
+        """Apply the patch to the edited content and return the original content."""
+        lines = content.splitlines(keepends=True)
+        for start, end, original_lines in reversed(self.hunks):
+            lines[start:end] = original_lines
+        return "".join(lines)
+
+
+class EditHistory:
+    """Per-file undo history with a depth cap per file and a global memory budget."""
+
+    def __init__(self, max_depth: int = MAX_UNDO_DEPTH, max_chars: int = MAX_HISTORY_CHARS):
+        self.max_depth: int = max_depth
+        self.max_chars: int = max_chars
+        self._patches: dict[Path, deque[ReversePatch]] = {}
+        # all patches in the order they were recorded, used to evict the oldest ones first
+        self._order: deque[tuple[Path, ReversePatch]] = deque()
+        self._total_chars: int = 0
+
+    def record(self, path: Path, old_content: str | None, new_content: str):
+        """Record an edit of `path` from `old_content` (None if the file was created) to `new_content`.
+
+        The contents are kept as they read back from the file, with `\r\n` and `\r` translated,
+        since that is what the file is compared with when the edit is undone.
+        """
+        old_content = as_read_back(old_content) if old_content is not None else None
+        patch = ReversePatch.from_edit(old_content, as_read_back(new_content))
+        patches = self._patches.setdefault(path, deque())
+        patches.append(patch)
+        self._order.append((path, patch))
+        self._total_chars += patch.size
+        if len(patches) > self.max_depth:
+            self._total_chars -= patches.popleft().size
+        while self._total_chars > self.max_chars and self._order:
+            self._evict_oldest()
+        if len(self._order) > 2 * sum(len(p) for p in self._patches.values()) + 64:
+            # drop entries of patches that were undone or dropped by the depth cap
+            live = {id(p) for patches in self._patches.values() for p in patches}
+            self._order = deque(entry for entry in self._order if id(entry[1]) in live)
+
+    def undo(self, path: Path, current_content: str, restore: Callable[[str | None], None]) -> str | None:
+        """Revert the last edit of `path` and return the content before it, or None if that edit created the file.
+
+        `restore` writes the content before the edit, or removes the file if it is None. The edit
+        stays in the history if it raises, so that it can be undone again.
+        """
+        patches = self._patches.get(path)
+        if not patches:
+            raise ToolError(f"No edit history found for {path}.")
+        patch = patches[-1]
+        if patch.after_hash != _content_hash(current_content):
+            raise ToolError(
+                f"The file {path} has been modified since its last edit with this tool, so the edit cannot be undone."
+            )
+        previous_content = None if patch.created else patch.apply(current_content)
+        restore(previous_content)
+        _ = patches.pop()
+        self._total_chars -= patch.size
+        return previous_content
+
+    def _evict_oldest(self):
+        path, patch = self._order.popleft()
+        patches = self._patches.get(path)
+        # the patch may already be gone because it was undone or dropped by the depth cap
+        if patches and patches[0] is patch:
+            _ = patches.popleft()
+            self._total_chars -= patch.size
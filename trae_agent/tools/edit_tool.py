@@ -9,39 +9,76 @@
 #
 # This modified file is released under the same license.
 
+import os
+import shutil
+import stat
+import tempfile
 from pathlib import Path
 from typing import override
 
 from .base import Tool, ToolError, ToolExecResult, ToolParameter, ToolCallArguments
-from .run import maybe_truncate, run
+from .dir_listing import DirectoryLister
+from .edit_history import EditHistory
+from .file_cache import FileCache
+from .fuzzy_match import AmbiguousMatchError, apply_fuzzy_match, find_fuzzy_match
+from .line_index import LineIndexCache
+from .run import maybe_truncate
 
 EditToolSubCommands = [
     "view",
     "create",
     "str_replace",
     "insert",
+    "multi_edit",
+    "undo_edit",
 ]
 SNIPPET_LINES: int = 4
+# files at least this large are served from a memory map when only a line range is viewed
+MMAP_VIEW_THRESHOLD: int = 4 * 1024 * 1024  # bytes
 
 class TextEditorTool(Tool):
     """Tool to replace a string in a file."""
 
+    def __init__(self):
+        self._file_cache: FileCache = FileCache()
+        self._line_indexes: LineIndexCache = LineIndexCache()
+        self._edit_history: EditHistory = EditHistory()
+        self._dir_lister: DirectoryLister = DirectoryLister()
+        # how `old_str` values were matched, to measure the edits saved by the fuzzy fallback
+        self.edit_stats: dict[str, int] = {"exact": 0, "fuzzy": 0, "failed": 0}
+        super().__init__()
+
     @override
     def get_name(self) -> str:
         return "str_replace_based_edit_tool"
 
+    @override
+    def get_stats(self) -> dict[str, int]:
+        return {f"{kind}_edits": count for kind, count in self.edit_stats.items()}
+
+    @override
+    def changes_files(self, arguments: ToolCallArguments) -> bool:
+        return arguments.get("command") != "view"
+
     @override
     def get_description(self) -> str:
         return """Custom editing tool for viewing, creating and editing files
 * State is persistent across command calls and discussions with the user
-* If `path` is a file, `view` displays the result of applying `cat -n`. If `path` is a directory, `view` lists non-hidden files and directories up to 2 levels deep
+* If `path` is a file, `view` displays the result of applying `cat -n`. If `path` is a directory, `view` lists non-hidden files and directories up to 2 levels deep, skipping entries ignored by `.gitignore` and summarizing very large directories
 * The `create` command cannot be used if the specified `path` already exists as a file !!! If you know that the `path` already exists, please remove it first and then perform the `create` operation!
 * If a `command` generates a long output, it will be truncated and marked with `<response clipped>`
+* The `undo_edit` command will revert the last edit made to the file at `path`
 
 Notes for using the `str_replace` command:
 * The `old_str` parameter should match EXACTLY one or more consecutive lines from the original file. Be mindful of whitespaces!
 * If the `old_str` parameter is not unique in the file, the replacement will not be performed. Make sure to include enough context in `old_str` to make it unique
+* If `old_str` does not appear verbatim but matches exactly one region of whole lines when whitespace is ignored, that region is replaced, `new_str` is re-indented to match, and the matched lines are reported
 * The `new_str` parameter should contain the edited lines that should replace the `old_str`
+
+Notes for using the `multi_edit` command:
+* The `edits` parameter is an ordered list of replacements, each with an `old_str`, an optional `new_str` and an optional `path` (defaults to the `path` parameter)
+* Edits are applied in order, so an `old_str` must be unique in the file as it looks after the previous edits
+* Either all edits are applied or, if any of them cannot be applied, none of them
 """
 
     @override
@@ -55,6 +92,20 @@ Notes for using the `str_replace` command:
                 required=True,
                 enum=EditToolSubCommands
             ),
+            ToolParameter(
+                name="edits",
+                type="array",
+                description="Required parameter of `multi_edit` command. An ordered list of replacements, each an object with `old_str`, optional `new_str` and optional absolute `path` (defaults to the `path` parameter).",
+                items={
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "old_str": {"type": "string"},
+                        "new_str": {"type": "string"}
+                    },
+                    "required": ["old_str"]
+                }
+            ),
             ToolParameter(
                 name="file_text",
                 type="string",
@@ -119,6 +170,7 @@ Notes for using the `str_replace` command:
                         error_code=-1
                     )
                 self.write_file(_path, file_text) # pyright: ignore[reportArgumentType]
+                self._edit_history.record(_path, None, file_text) # pyright: ignore[reportArgumentType]
                 return ToolExecResult(
                     output=f"File created successfully at: {_path}"
                 )
@@ -145,6 +197,16 @@ Notes for using the `str_replace` command:
                         error_code=-1
                     )
                 return self.insert(_path, insert_line, new_str_to_insert) # pyright: ignore[reportArgumentType]
+            elif command == "multi_edit":
+                edits = arguments.get("edits") if "edits" in arguments else None
+                if not isinstance(edits, list) or len(edits) == 0:
+                    return ToolExecResult(
+                        error=f"Parameter `edits` is required for command: multi_edit and should be a non-empty list",
+                        error_code=-1
+                    )
+                return self.multi_edit(_path, edits)
+            elif command == "undo_edit":
+                return self.undo_edit(_path)
             else:
                 return ToolExecResult(
                     error=f"Unrecognized command {command}. The allowed commands for the {self.name} tool are: {', '.join(EditToolSubCommands)}",
@@ -169,7 +231,8 @@ Notes for using the `str_replace` command:
             raise ToolError(f"File already exists at: {path}. Cannot overwrite files using command `create`.")
         # Check if the path points to a directory
         if path.is_dir():
-            if command != "view":
+            # `multi_edit` may use a directory as `path` when every edit names its own file
+            if command not in ("view", "multi_edit"):
                 raise ToolError(f"The path {path} is a directory and only the `view` command can be used on directories")
 
     async def view(self, path: Path, view_range: list[int] | None = None) -> ToolExecResult:
@@ -180,63 +243,165 @@ Notes for using the `str_replace` command:
                     "The `view_range` parameter is not allowed when `path` points to a directory."
                 )
 
-            return_code, stdout, stderr = await run(
-                rf"find {path} -maxdepth 2 -not -path '*/\.*'"
-            )
-            if not stderr:
-                stdout = f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n{stdout}\n"
+            try:
+                listing = self._dir_lister.render(path)
+            except OSError as e:
+                raise ToolError(f"Ran into {e} while trying to list {path}") from None
             return ToolExecResult(
-                error_code=return_code,
-                output=stdout,
-                error=stderr
-                )
+                output=f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden and ignored items:\n{maybe_truncate(listing)}\n"
+            )
 
-        file_content = self.read_file(path)
         init_line = 1
         if view_range:
             if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range): # pyright: ignore[reportUnnecessaryIsInstance]
                 raise ToolError(
                     "Invalid `view_range`. It should be a list of two integers."
                 )
-            file_lines = file_content.split("\n")
-            n_lines_file = len(file_lines)
             init_line, final_line = view_range
-            if init_line < 1 or init_line > n_lines_file:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. Its first element `{init_line}` should be within the range of lines of the file: {[1, n_lines_file]}"
-                )
-            if final_line > n_lines_file:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. Its second element `{final_line}` should be smaller than the number of lines in the file: `{n_lines_file}`"
-                )
-            if final_line != -1 and final_line < init_line:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. Its second element `{final_line}` should be larger or equal than its first `{init_line}`"
-                )
-
-            if final_line == -1:
-                file_content = "\n".join(file_lines[init_line - 1 :])
-            else:
-                file_content = "\n".join(file_lines[init_line - 1 : final_line])
+            file_content = None
+            if path.stat().st_size >= MMAP_VIEW_THRESHOLD:
+                # only decode the requested lines instead of the whole file
+                try:
+                    with self._line_indexes.open(path) as mapped_lines:
+                        # other files are read whole below, so that the output does not depend on the size
+                        if mapped_lines.index.plain:
+                            self._validate_view_range(view_range, mapped_lines.n_lines)
+                            file_content = mapped_lines.read_lines(init_line, final_line)
+                except OSError as e:
+                    raise ToolError(f"Ran into {e} while trying to read {path}") from None
+            if file_content is None:
+                file_lines = self.read_file(path).split("\n")
+                self._validate_view_range(view_range, len(file_lines))
+                if final_line == -1:
+                    file_content = "\n".join(file_lines[init_line - 1 :])
+                else:
+                    file_content = "\n".join(file_lines[init_line - 1 : final_line])
+        else:
+            file_content = self.read_file(path)
 
         return ToolExecResult(
             output=self._make_output(file_content, str(path), init_line=init_line)
         )
 
+    def _validate_view_range(self, view_range: list[int], n_lines_file: int):
+        """Check that `view_range` lies within a file of `n_lines_file` lines."""
+        init_line, final_line = view_range
+        if init_line < 1 or init_line > n_lines_file:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. Its first element `{init_line}` should be within the range of lines of the file: {[1, n_lines_file]}"
+            )
+        if final_line > n_lines_file:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. Its second element `{final_line}` should be smaller than the number of lines in the file: `{n_lines_file}`"
+            )
+        if final_line != -1 and final_line < init_line:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. Its second element `{final_line}` should be larger or equal than its first `{init_line}`"
+            )
+
     def str_replace(self, path: Path, old_str: str, new_str: str | None) -> ToolExecResult:
         """Implement the str_replace command, which replaces old_str with new_str in the file content"""
         # Read the file content
-        file_content = self.read_file(path).expandtabs()
+        original_content = self.read_file(path)
+        file_content = original_content.expandtabs()
         old_str = old_str.expandtabs()
         new_str = new_str.expandtabs() if new_str is not None else ""
 
+        # Replace old_str with new_str
+        new_file_content, replacement_line, new_str, match_note = self._replace_unique(path, file_content, old_str, new_str)
+
+        # Write the new content to the file
+        self.write_file(path, new_file_content)
+        self._edit_history.record(path, original_content, new_file_content)
+        self._count_edit(match_note)
+
+        # Prepare the success message
+        success_msg = f"The file {path} has been edited. {match_note}"
+        success_msg += self._make_snippet_output(path, new_file_content, replacement_line, new_str)
+        success_msg += "Review the changes and make sure they are as expected. Edit the file again if necessary."
+
+        return ToolExecResult(
+            output=success_msg,
+        )
+
+    def multi_edit(self, default_path: Path, edits: list[object]) -> ToolExecResult:
+        """Implement the multi_edit command, which applies an ordered list of replacements all or nothing."""
+        file_contents: dict[Path, str] = {}
+        original_contents: dict[Path, str] = {}
+        # (path, line of the replacement, new_str, match note) of every edit, kept up to date as lines shift
+        replacements: list[tuple[Path, int, str, str]] = []
+        errors: list[str] = []
+
+        # validate and apply all edits in memory first
+        for i, edit in enumerate(edits, start=1):
+            if not isinstance(edit, dict) or not isinstance(edit.get("old_str"), str):
+                errors.append(f"Edit {i}: each edit must be an object with a string `old_str`.")
+                continue
+            path = Path(str(edit["path"])) if edit.get("path") else default_path
+            new_str = edit.get("new_str")
+            try:
+                if not path.is_absolute():
+                    raise ToolError(f"The path {path} is not an absolute path, it should start with `/`.")
+                if not path.is_file():
+                    raise ToolError(f"The path {path} does not exist or is not a file.")
+                if path not in file_contents:
+                    original_contents[path] = self.read_file(path)
+                    file_contents[path] = original_contents[path].expandtabs()
+                old_str = str(edit["old_str"]).expandtabs()
+                new_str = str(new_str).expandtabs() if new_str is not None else ""
+                previous_content = file_contents[path]
+                file_contents[path], replacement_line, new_str, match_note = self._replace_unique(
+                    path, previous_content, old_str, new_str
+                )
+            except ToolError as e:
+                errors.append(f"Edit {i}: {e.message}")
+                continue
+
+            line_shift = file_contents[path].count("\n") - previous_content.count("\n")
+            replacements = [
+                (p, line + line_shift if p == path and line > replacement_line else line, s, note)
+                for p, line, s, note in replacements
+            ]
+            replacements.append((path, replacement_line, new_str, match_note))
+
+        if errors:
+            raise ToolError(
+                f"No edits were applied because {len(errors)} of {len(edits)} edits failed validation:\n" + "\n".join(errors)
+            )
+
+        self.write_files_atomic(file_contents)
+        for path, new_file_content in file_contents.items():
+            self._edit_history.record(path, original_contents[path], new_file_content)
+        for _, _, _, match_note in replacements:
+            self._count_edit(match_note)
+
+        success_msg = f"{len(edits)} edits have been applied to {len(file_contents)} file(s).\n"
+        for path, replacement_line, new_str, match_note in replacements:
+            success_msg += f"The file {path} has been edited. {match_note}"
+            success_msg += self._make_snippet_output(path, file_contents[path], replacement_line, new_str)
+        success_msg += "Review the changes and make sure they are as expected. Edit the files again if necessary."
+
+        return ToolExecResult(
+            output=success_msg,
+        )
+
+    def _count_edit(self, match_note: str):
+        """Count an edit once it has been written, by how its old_str was matched."""
+        self.edit_stats["fuzzy" if match_note else "exact"] += 1
+
+    def _replace_unique(self, path: Path, file_content: str, old_str: str, new_str: str) -> tuple[str, int, str, str]:
+        """Replace the single occurrence of old_str.
+
+        Returns the new content, the 0-based line of the replacement, the inserted string and
+        a note on how old_str was matched, which is empty for exact matches. Failed matches are
+        counted here, the edits that succeed only once they are written.
+        """
         # Check if old_str is unique in the file
         occurrences = file_content.count(old_str)
         if occurrences == 0:
-            raise ToolError(
-                f"No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}."
-            )
+            return self._replace_fuzzy(path, file_content, old_str, new_str)
         elif occurrences > 1:
+            self.edit_stats["failed"] += 1
             file_content_lines = file_content.split("\n")
             lines = [
                 idx + 1
@@ -247,32 +412,50 @@ Notes for using the `str_replace` command:
                 f"No replacement was performed. Multiple occurrences of old_str `{old_str}` in lines {lines}. Please ensure it is unique"
             )
 
-        # Replace old_str with new_str
-        new_file_content = file_content.replace(old_str, new_str)
+        index = file_content.index(old_str)
+        replacement_line = file_content.count("\n", 0, index)
+        return file_content[:index] + new_str + file_content[index + len(old_str):], replacement_line, new_str, ""
 
-        # Write the new content to the file
-        self.write_file(path, new_file_content)
+    def _replace_fuzzy(self, path: Path, file_content: str, old_str: str, new_str: str) -> tuple[str, int, str, str]:
+        """Fall back to a whitespace-tolerant match of old_str against whole lines of the file."""
+        try:
+            match = find_fuzzy_match(file_content.split("\n"), old_str, new_str)
+        except AmbiguousMatchError as e:
+            self.edit_stats["failed"] += 1
+            raise ToolError(
+                f"No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}. Ignoring {e.strategy} differences it matches lines {e.lines}, please include more context to make it unique."
+            )
+        if match is None:
+            self.edit_stats["failed"] += 1
+            raise ToolError(
+                f"No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}."
+            )
 
-        # Create a snippet of the edited section
-        replacement_line = file_content.split(old_str)[0].count("\n")
+        if match.strategy == "fuzzy":
+            how = f"a {match.similarity:.0%} similar region"
+        else:
+            how = f"a region differing only in {match.strategy}"
+        if match.end_line - match.start_line == 1:
+            where = f"line {match.start_line + 1}"
+        else:
+            where = f"lines {match.start_line + 1}-{match.end_line}"
+        match_note = f"The old_str did not appear verbatim, it was matched against {how} at {where} and replaced there. "
+        inserted = "\n".join(match.new_lines)
+        return apply_fuzzy_match(file_content, match), match.start_line, inserted, match_note
+
+    def _make_snippet_output(self, path: Path, new_file_content: str, replacement_line: int, new_str: str) -> str:
+        """Create the `cat -n` output of a snippet around an edited section."""
         start_line = max(0, replacement_line - SNIPPET_LINES)
         end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
         snippet = "\n".join(new_file_content.split("\n")[start_line : end_line + 1])
-
-        # Prepare the success message
-        success_msg = f"The file {path} has been edited. "
-        success_msg += self._make_output(
+        return self._make_output(
             snippet, f"a snippet of {path}", start_line + 1
         )
-        success_msg += "Review the changes and make sure they are as expected. Edit the file again if necessary."
-
-        return ToolExecResult(
-            output=success_msg,
-        )
 
     def insert(self, path: Path, insert_line: int, new_str: str) -> ToolExecResult:
         """Implement the insert command, which inserts new_str at the specified line in the file content."""
-        file_text = self.read_file(path).expandtabs()
+        original_text = self.read_file(path)
+        file_text = original_text.expandtabs()
         new_str = new_str.expandtabs()
         file_text_lines = file_text.split("\n")
         n_lines_file = len(file_text_lines)
@@ -298,6 +481,7 @@ Notes for using the `str_replace` command:
         snippet = "\n".join(snippet_lines)
 
         self.write_file(path, new_file_text)
+        self._edit_history.record(path, original_text, new_file_text)
 
         success_msg = f"The file {path} has been edited. "
         success_msg += self._make_output(
@@ -310,12 +494,33 @@ Notes for using the `str_replace` command:
             output=success_msg,
         )
 
-    # Note: undo_edit method is not implemented in this version as it was removed
+    def undo_edit(self, path: Path) -> ToolExecResult:
+        """Implement the undo_edit command, which reverts the last edit made to the file."""
+        def restore(previous_content: str | None):
+            if previous_content is not None:
+                self.write_file(path, previous_content)
+                return
+            try:
+                path.unlink()
+            except Exception as e:
+                raise ToolError(f"Ran into {e} while trying to remove {path}") from None
+            finally:
+                self._file_cache.invalidate(path)
+
+        previous_content = self._edit_history.undo(path, self.read_file(path), restore)
+        if previous_content is None:
+            return ToolExecResult(
+                output=f"Last edit to {path} undone successfully. The file had been created by that edit and has been removed."
+            )
+
+        return ToolExecResult(
+            output=f"Last edit to {path} undone successfully. {self._make_output(previous_content, str(path))}"
+        )
 
     def read_file(self, path: Path):
         """Read the content of a file from a given path; raise a ToolError if an error occurs."""
         try:
-            return path.read_text()
+            return self._file_cache.read(path)
         except Exception as e:
             raise ToolError(f"Ran into {e} while trying to read {path}") from None
 
@@ -324,7 +529,64 @@ Notes for using the `str_replace` command:
         try:
             _ = path.write_text(file)
         except Exception as e:
+            self._file_cache.invalidate(path)
             raise ToolError(f"Ran into {e} while trying to write to {path}") from None
+        self._file_cache.update(path, file)
+
+    def write_files_atomic(self, file_contents: dict[Path, str]):
+        """Write several files, each through a temporary file renamed over the original.
+
+        All temporary files are written before the first rename, so a failure while writing
+        leaves every original file untouched. The originals are kept until every file has
+        been renamed, and are put back if a later rename fails.
+        """
+        temp_paths: dict[Path, str] = {}
+        backup_paths: dict[Path, str] = {}
+        replaced: list[Path] = []
+        try:
+            for path, content in file_contents.items():
+                fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+                temp_paths[path] = temp_path
+                with os.fdopen(fd, "w") as f:
+                    _ = f.write(content)
+                os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+            for path in file_contents:
+                backup_paths[path] = self._backup_file(path)
+            for path, temp_path in temp_paths.items():
+                os.replace(temp_path, path)
+                replaced.append(path)
+        except Exception as e:
+            for path in replaced:
+                try:
+                    os.replace(backup_paths[path], path)
+                except OSError:
+                    pass
+            for path in file_contents:
+                self._file_cache.invalidate(path)
+            for leftover in [*temp_paths.values(), *backup_paths.values()]:
+                if os.path.exists(leftover):
+                    os.unlink(leftover)
+            raise ToolError(f"Ran into {e} while trying to write to {', '.join(map(str, file_contents))}") from None
+
+        for path, backup_path in backup_paths.items():
+            try:
+                os.unlink(backup_path)
+            except OSError:
+                pass
+            self._file_cache.update(path, file_contents[path])
+
+    @staticmethod
+    def _backup_file(path: Path) -> str:
+        """Keep the current content of `path` next to it, as a hard link where possible."""
+        fd, backup_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".orig")
+        os.close(fd)
+        try:
+            # a hard link keeps the original file itself, its content is not copied
+            os.unlink(backup_path)
+            os.link(path, backup_path)
+        except OSError:
+            _ = shutil.copy2(path, backup_path)
+        return backup_path
 
     def _make_output(
         self,
@@ -0,0 +1,96 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""In-memory cache of file contents for the file editing tool."""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+MAX_CACHE_CHARS: int = 64 * 1024 * 1024
+
+
+def as_read_back(content: str) -> str:
+    """Return what `read_text` returns for a file written with `content`, which translates newlines."""
+    if "\r" not in content:
+        return content
+    return content.replace("\r\n", "\n").replace("\r", "\n")
+
+
+@dataclass
+class _CacheEntry:
+    """Cached content of a file together with the stat fields it was read with."""
+    mtime_ns: int
+    size: int
+    inode: int
+    content: str
+
+    def is_valid(self, stat: os.stat_result) -> bool:
+        return (
+            self.mtime_ns == stat.st_mtime_ns
+            and self.size == stat.st_size
+            and self.inode == stat.st_ino
+        )
+
+
+class FileCache:
+    """Size-bounded LRU cache of decoded file contents.
+
+    An entry is only used while the mtime, size and inode of the file are unchanged, so
+    modifications made outside of the tool (e.g. through bash) are always picked up.
+    """
+
+    def __init__(self, max_chars: int = MAX_CACHE_CHARS):
+        self.max_chars: int = max_chars
+        self._entries: OrderedDict[Path, _CacheEntry] = OrderedDict()
+        self._total_chars: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def read(self, path: Path) -> str:
+        """Return the content of `path`, reading and decoding it only if the cached copy is stale."""
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry.is_valid(stat):
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry.content
+
+        self.misses += 1
+        content = path.read_text()
+        self._store(path, content, stat)
+        return content
+
+    def update(self, path: Path, content: str):
+        """Store content that was just written to `path`."""
+        # keep the cached copy identical to what `read_text` returns
+        content = as_read_back(content)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return
+        self._store(path, content, stat)
+
+    def invalidate(self, path: Path):
+        """Drop the cached content of `path`, if any."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total_chars -= len(entry.content)
+
+    def _store(self, path: Path, content: str, stat: os.stat_result):
+        self.invalidate(path)
+        if len(content) > self.max_chars // 4:
+            # caching very large files would evict everything else
+            return
+        self._entries[path] = _CacheEntry(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            inode=stat.st_ino,
+            content=content
+        )
+        self._total_chars += len(content)
+        while self._total_chars > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_chars -= len(evicted.content)
@@ -0,0 +1,173 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Whitespace-tolerant and fuzzy line matching for `old_str` values that do not appear verbatim."""
+
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+# minimum similarity of the line-anchored fuzzy match
+FUZZY_MATCH_THRESHOLD: float = 0.9
+# the fuzzy strategy needs enough context to be trusted
+MIN_FUZZY_MATCH_LINES: int = 2
+# candidate windows of the fuzzy strategy that are compared in full
+MAX_FUZZY_CANDIDATES: int = 50
+
+
+@dataclass
+class FuzzyMatch:
+    """A unique match of `old_str`: the lines `[start_line, end_line)` are replaced by `new_lines`."""
+    start_line: int
+    end_line: int
+    new_lines: list[str]
+    strategy: str
+    similarity: float = 1.0
+
+
+class AmbiguousMatchError(Exception):
+    """More than one region of the file matches `old_str` equally well."""
+
+    def __init__(self, strategy: str, lines: list[int]):
+        super().__init__(f"{strategy} matched lines {lines}")
+        self.strategy: str = strategy
+        self.lines: list[int] = lines
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _strip_whitespace(line: str) -> str:
+    return "".join(line.split())
+
+
+def _indentation(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _indent_delta(old_lines: list[str], file_lines: list[str]) -> int | None:
+    """Return the common indentation difference of the non-blank lines, or None if it varies."""
+    deltas = {
+        _indentation(file_line) - _indentation(old_line)
+        for old_line, file_line in zip(old_lines, file_lines)
+        if old_line.strip() and file_line.strip()
+    }
+    if len(deltas) > 1:
+        return None
+    return deltas.pop() if deltas else 0
+
+
+def _reindent(lines: list[str], delta: int) -> list[str]:
+    if delta > 0:
+        return [" " * delta + line if line.strip() else line for line in lines]
+    if delta < 0:
+        return [line[min(-delta, _indentation(line)):] for line in lines]
+    return lines
+
+
+def _split_lines(text: str) -> tuple[list[str], bool]:
+    lines = text.split("\n")
+    if len(lines) > 1 and lines[-1] == "":
+        return lines[:-1], True
+    return lines, False
+
+
+def find_fuzzy_match(file_lines: list[str], old_str: str, new_str: str) -> FuzzyMatch | None:
+    """Find the single region of the file that `old_str` matches when whitespace is ignored.
+
+    The strategies are tried from the most to the least strict, and the first one that
+    matches decides: trailing whitespace only, then whitespace anywhere in the lines with a
+    consistent indentation shift, then a line-anchored similarity match. `new_str` is
+    re-indented by the indentation shift of the match. Returns None if nothing matches
+    with high confidence and raises `AmbiguousMatchError` if several regions do.
+    """
+    old_lines, old_ends_with_newline = _split_lines(old_str)
+    if not any(line.strip() for line in old_lines):
+        return None
+    new_lines = new_str.split("\n")
+    if old_ends_with_newline and new_lines[-1] == "":
+        # the newline consumed by `old_str` is provided by `new_str`
+        _ = new_lines.pop()
+    n = len(old_lines)
+
+    def _match(start: int, strategy: str, similarity: float = 1.0) -> FuzzyMatch | None:
+        delta = _indent_delta(old_lines, file_lines[start:start + n])
+        if delta is None:
+            return None
+        return FuzzyMatch(start, start + n, _reindent(new_lines, delta), strategy, similarity)
+
+    # trailing whitespace, then any whitespace differences
+    for strategy, key in (
+        ("trailing whitespace", str.rstrip),
+        ("whitespace", _strip_whitespace),
+    ):
+        old_keys = [key(line) for line in old_lines]
+        first = next(i for i, k in enumerate(old_keys) if k)
+        matches: list[FuzzyMatch] = []
+        for start in range(len(file_lines) - n + 1):
+            # cheap check of the first non-blank line before comparing the whole window
+            if key(file_lines[start + first]) != old_keys[first]:
+                continue
+            if all(key(file_lines[start + i]) == old_keys[i] for i in range(n)):
+                match = _match(start, strategy)
+                if match is not None:
+                    matches.append(match)
+        if len(matches) > 1:
+            raise AmbiguousMatchError(strategy, [m.start_line + 1 for m in matches])
+        if matches:
+            return matches[0]
+
+    if n < MIN_FUZZY_MATCH_LINES:
+        return None
+    return _similar_match(file_lines, old_lines, _match)
+
+
+def _similar_match(
+    file_lines: list[str],
+    old_lines: list[str],
+    make_match: Callable[[int, str, float], FuzzyMatch | None]
+) -> FuzzyMatch | None:
+    n = len(old_lines)
+    normalized_file = [_normalize(line) for line in file_lines]
+    normalized_old = [_normalize(line) for line in old_lines]
+
+    # windows are anchored on lines that match exactly, each one voting for a start line
+    positions: dict[str, list[int]] = {}
+    for i, line in enumerate(normalized_old):
+        if line:
+            positions.setdefault(line, []).append(i)
+    votes: Counter[int] = Counter()
+    for j, line in enumerate(normalized_file):
+        for i in positions.get(line, ()):
+            if 0 <= j - i <= len(file_lines) - n:
+                votes[j - i] += 1
+
+    old_text = "\n".join(normalized_old)
+    scored: list[tuple[float, int]] = []
+    for start, _ in votes.most_common(MAX_FUZZY_CANDIDATES):
+        window = "\n".join(normalized_file[start:start + n])
+        matcher = SequenceMatcher(None, old_text, window, autojunk=False)
+        if matcher.real_quick_ratio() < FUZZY_MATCH_THRESHOLD or matcher.quick_ratio() < FUZZY_MATCH_THRESHOLD:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= FUZZY_MATCH_THRESHOLD:
+            scored.append((ratio, start))
+    if not scored:
+        return None
+
+    scored.sort(reverse=True)
+    best_ratio, best_start = scored[0]
+    # overlapping windows are shifted versions of the best one, other regions make it ambiguous
+    others = [start for _, start in scored[1:] if abs(start - best_start) >= n]
+    if others:
+        raise AmbiguousMatchError("fuzzy", sorted(start + 1 for start in [best_start, *others]))
+    return make_match(best_start, "fuzzy", best_ratio)
+
+
+def apply_fuzzy_match(file_content: str, match: FuzzyMatch) -> str:
+    """Replace the matched lines of the file content with the re-indented new lines."""
+    lines = file_content.split("\n")
+    lines[match.start_line:match.end_line] = match.new_lines
+    return "\n".join(lines)
@@ -0,0 +1,146 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Line-offset index over memory-mapped files for cheap line range reads."""
+
+import codecs
+import locale
+import mmap
+import operator
+import os
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from itertools import accumulate, repeat
+from pathlib import Path
+
+LINE_INDEX_STRIDE: int = 1024
+LINE_INDEX_CHUNK: int = 4 * 1024 * 1024  # bytes
+MAX_CACHED_INDEXES: int = 16
+
+
+class LineIndex:
+    """Sparse index of line start offsets of a file.
+
+    Only the offset of every `LINE_INDEX_STRIDE`-th line is kept, so the index of a file
+    with millions of lines stays small. Lines are separated by `\\n` and counted like
+    `str.split("\\n")` does, i.e. a trailing newline starts an empty last line.
+
+    Line ranges are decoded like `Path.read_text` decodes the whole file, which is only
+    possible if the file decodes with the locale encoding and has no `\\r` other than in
+    `\\r\\n`, since `read_text` starts a new line at a lone `\\r`. `plain` tells whether
+    that is the case; other files have to be read whole.
+    """
+
+    def __init__(self, stat: os.stat_result):
+        self.mtime_ns: int = stat.st_mtime_ns
+        self.size: int = stat.st_size
+        self.inode: int = stat.st_ino
+        self.n_lines: int = 0
+        self.plain: bool = True
+        self._checkpoints: array[int] = array("q")
+
+    def is_valid(self, stat: os.stat_result) -> bool:
+        return (
+            self.mtime_ns == stat.st_mtime_ns
+            and self.size == stat.st_size
+            and self.inode == stat.st_ino
+        )
+
+    def build(self, mm: mmap.mmap):
+        """Scan the mapped file once, record the checkpoint offsets and check that it is plain."""
+        checkpoints = array("q", [0])
+        decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+        plain = True
+        line_number = 0
+        pos = 0
+        while pos < self.size:
+            data = mm[pos:pos + LINE_INDEX_CHUNK]
+            if plain:
+                lone_crs = data.count(b"\r") - data.count(b"\r\n")
+                if data.endswith(b"\r") and mm[pos + len(data):pos + len(data) + 1] == b"\n":
+                    lone_crs -= 1
+                try:
+                    _ = decoder.decode(data, final=pos + len(data) >= self.size)
+                except UnicodeDecodeError:
+                    plain = False
+                plain = plain and lone_crs == 0
+            # start offsets of the lines following every newline in this chunk
+            parts = data.split(b"\n")
+            starts = list(accumulate(map(operator.add, map(len, parts[:-1]), repeat(1)), initial=pos))[1:]
+            first = -(line_number + 1) % LINE_INDEX_STRIDE
+            checkpoints.extend(starts[first::LINE_INDEX_STRIDE])
+            line_number += len(starts)
+            pos += len(data)
+        self._checkpoints = checkpoints
+        self.n_lines = line_number + 1
+        self.plain = plain
+
+    def line_start(self, mm: mmap.mmap, line: int) -> int:
+        """Return the byte offset at which the 0-based `line` starts."""
+        if line >= self.n_lines:
+            return self.size
+        checkpoint = line // LINE_INDEX_STRIDE
+        offset = self._checkpoints[checkpoint]
+        for _ in range(line - checkpoint * LINE_INDEX_STRIDE):
+            offset = mm.find(b"\n", offset) + 1
+        return offset
+
+    def read_lines(self, mm: mmap.mmap, init_line: int, final_line: int) -> str:
+        """Decode the 1-based inclusive line range of a plain file, `final_line` -1 meaning the end of the file."""
+        start = self.line_start(mm, init_line - 1)
+        end = self.size if final_line == -1 else self.line_start(mm, final_line)
+        content = mm[start:end].decode(locale.getpreferredencoding(False)).replace("\r\n", "\n")
+        if final_line != -1 and final_line < self.n_lines and content.endswith("\n"):
+            content = content[:-1]
+        return content
+
+
+class MappedLines:
+    """A memory-mapped file together with its line index."""
+
+    def __init__(self, index: LineIndex, mm: mmap.mmap | None):
+        self.index: LineIndex = index
+        self._mm: mmap.mmap | None = mm
+
+    @property
+    def n_lines(self) -> int:
+        return self.index.n_lines
+
+    def read_lines(self, init_line: int, final_line: int) -> str:
+        """Decode the 1-based inclusive line range, `final_line` -1 meaning the end of the file."""
+        if self._mm is None:
+            return ""
+        return self.index.read_lines(self._mm, init_line, final_line)
+
+
+class LineIndexCache:
+    """LRU cache of line indexes, validated by the mtime, size and inode of each file."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_INDEXES):
+        self.max_entries: int = max_entries
+        self._indexes: OrderedDict[Path, LineIndex] = OrderedDict()
+
+    @contextmanager
+    def open(self, path: Path) -> Iterator[MappedLines]:
+        """Map `path` into memory and yield it with its (possibly cached) line index."""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                # empty files cannot be memory-mapped
+                index = LineIndex(stat)
+                index.n_lines = 1
+                yield MappedLines(index, None)
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = self._indexes.get(path)
+                if index is None or not index.is_valid(stat):
+                    index = LineIndex(stat)
+                    index.build(mm)
+                    self._indexes[path] = index
+                    while len(self._indexes) > self.max_entries:
+                        _ = self._indexes.popitem(last=False)
+                self._indexes.move_to_end(path)
+                yield MappedLines(index, mm)
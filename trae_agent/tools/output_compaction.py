@@ -0,0 +1,209 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Compaction of tool outputs before they are added to the conversation."""
+
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import override
+
+from .run import MAX_RESPONSE_LEN
+
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+PROGRESS_BAR_RE = re.compile(r"\d{1,3}(?:\.\d+)?%\s*\|[\s#=>\-█▉▊▋▌▍▎▏]+\||[━╸]{5,}|\[[=#>\-\s]{5,}\]")
+SIMILAR_LINE_RE = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?")
+
+PYTEST_SECTION_RE = re.compile(r"^=+ (FAILURES|ERRORS|short test summary info) =+$")
+UNITTEST_FAILURE_RE = re.compile(r"^(FAIL|ERROR): \S+")
+UNITTEST_SEPARATOR = "=" * 70
+
+
+@dataclass
+class CompactionStats:
+    """Sizes of a tool output before and after compaction."""
+    raw_chars: int
+    compacted_chars: int
+    strategies: list[str] = field(default_factory=list)
+
+
+class CompactionStrategy(ABC):
+    """Base class for a single output compaction strategy."""
+
+    name: str = ""
+
+    @abstractmethod
+    def compact(self, content: str, max_chars: int) -> str:
+        """Return a compacted version of `content`, or `content` itself if nothing applies."""
+        pass
+
+
+class AnsiStripStrategy(CompactionStrategy):
+    """Strip ANSI escape sequences, carriage-return redraws and progress bars."""
+
+    name = "ansi_strip"
+
+    @override
+    def compact(self, content: str, max_chars: int) -> str:
+        if "\x1b" in content:
+            content = ANSI_ESCAPE_RE.sub("", content)
+        if "\r" not in content and not PROGRESS_BAR_RE.search(content):
+            return content
+
+        lines: list[str] = []
+        for line in content.split("\n"):
+            if "\r" in line:
+                # a carriage return redraws the line, only the last frame is visible
+                frames = [frame for frame in line.rstrip("\r").split("\r") if frame.strip()]
+                line = frames[-1] if frames else ""
+            if PROGRESS_BAR_RE.search(line) and "100%" not in line:
+                continue
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class RepeatedLineCollapseStrategy(CompactionStrategy):
+    """Collapse runs of identical or near-identical lines into a single line with a count.
+
+    Two lines are considered near-identical when they only differ in numbers, e.g.
+    `Downloading chunk 1 of 300` and `Downloading chunk 2 of 300`. Near-identical lines
+    are only collapsed when the output is over the budget, since the numbers may matter,
+    as in the line numbers of `grep -n`.
+    """
+
+    name = "collapse_repeats"
+
+    def __init__(self, min_run: int = 3):
+        self.min_run: int = min_run
+
+    @override
+    def compact(self, content: str, max_chars: int) -> str:
+        lines = content.split("\n")
+        if len(lines) < self.min_run:
+            return content
+
+        if len(content) > max_chars:
+            keys = [SIMILAR_LINE_RE.sub("#", line).strip() for line in lines]
+        else:
+            keys = lines
+        result: list[str] = []
+        run_start = 0
+        run_key = keys[0]
+        for i in range(1, len(lines) + 1):
+            key = keys[i] if i < len(lines) else None
+            if key is not None and key == run_key and key != "":
+                continue
+            run_length = i - run_start
+            if run_length >= self.min_run:
+                identical = all(line == lines[run_start] for line in lines[run_start:i])
+                result.append(lines[run_start])
+                if identical:
+                    result.append(f"[previous line repeated {run_length - 1} more times]")
+                else:
+                    result.append(f"[... {run_length - 2} similar lines omitted ...]")
+                    result.append(lines[i - 1])
+            else:
+                result.extend(lines[run_start:i])
+            run_start = i
+            run_key = key
+        return "\n".join(result)
+
+
+class FailureReportStrategy(CompactionStrategy):
+    """Keep the failure report of pytest or unittest runs and drop the passing progress.
+
+    Only applies when the output is over the budget and looks like test runner output.
+    """
+
+    name = "test_failures"
+    header_lines: int = 10
+
+    @override
+    def compact(self, content: str, max_chars: int) -> str:
+        if len(content) <= max_chars:
+            return content
+
+        lines = content.split("\n")
+        start = self._failure_report_start(lines)
+        if start is None or start <= self.header_lines:
+            return content
+
+        omitted = start - self.header_lines
+        return "\n".join(
+            lines[:self.header_lines]
+            + [f"[... {omitted} lines of test progress omitted, failure report follows ...]"]
+            + lines[start:]
+        )
+
+    def _failure_report_start(self, lines: list[str]) -> int | None:
+        """Return the index of the first line of the failure report, if any."""
+        for i, line in enumerate(lines):
+            if PYTEST_SECTION_RE.match(line):
+                return i
+        for i, line in enumerate(lines):
+            if UNITTEST_FAILURE_RE.match(line) and i > 0 and lines[i - 1] == UNITTEST_SEPARATOR:
+                return i - 1
+        return None
+
+
+class HeadTailStrategy(CompactionStrategy):
+    """Keep the beginning and the end of an over-long output and drop the middle."""
+
+    name = "head_tail"
+
+    def __init__(self, head_ratio: float = 0.3):
+        self.head_ratio: float = head_ratio
+
+    @override
+    def compact(self, content: str, max_chars: int) -> str:
+        if len(content) <= max_chars:
+            return content
+
+        head_chars = int(max_chars * self.head_ratio)
+        tail_chars = max_chars - head_chars
+        # cut on line boundaries so that no half lines are shown
+        head_end = content.rfind("\n", 0, head_chars)
+        head_end = head_end if head_end != -1 else head_chars
+        tail_start = content.find("\n", len(content) - tail_chars)
+        tail_start = tail_start + 1 if tail_start != -1 else len(content) - tail_chars
+
+        omitted_lines = content.count("\n", head_end, tail_start)
+        return (
+            content[:head_end]
+            + f"\n<response clipped: {omitted_lines} lines ({tail_start - head_end} characters) omitted from the middle of the output>\n"
+            + content[tail_start:]
+        )
+
+
+class OutputCompactor:
+    """Pipeline of compaction strategies applied to the outputs of selected tools."""
+
+    def __init__(
+        self,
+        strategies: list[CompactionStrategy] | None = None,
+        max_chars: int = MAX_RESPONSE_LEN,
+        tool_names: list[str] | None = None,
+    ):
+        self.strategies: list[CompactionStrategy] = strategies if strategies is not None else [
+            AnsiStripStrategy(),
+            RepeatedLineCollapseStrategy(),
+            FailureReportStrategy(),
+            HeadTailStrategy(),
+        ]
+        self.max_chars: int = max_chars
+        # tools that already bound their own output, such as the file editor, are left alone
+        self.tool_names: list[str] = tool_names if tool_names is not None else ["bash"]
+
+    def applies_to(self, tool_name: str) -> bool:
+        """Check if outputs of the given tool should be compacted."""
+        return tool_name in self.tool_names
+
+    def compact(self, content: str) -> tuple[str, list[str]]:
+        """Run all strategies over `content` and return the result and the strategies that changed it."""
+        applied: list[str] = []
+        for strategy in self.strategies:
+            compacted = strategy.compact(content, self.max_chars)
+            if compacted != content:
+                applied.append(strategy.name)
+                content = compacted
+        return content, applied
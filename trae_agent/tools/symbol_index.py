@@ -0,0 +1,322 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Definition and reference index of Python sources, cached on disk by content hash."""
+
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from .dir_listing import DirectoryLister
+
+# bump when the format of the parsed data changes so stale cache entries are ignored
+SYMBOL_INDEX_VERSION: int = 1
+MAX_PARSED_FILE_SIZE: int = 4 * 1024 * 1024  # bytes
+REFRESH_INTERVAL: float = 2.0  # seconds
+# parse results kept in the cache, which is shared by all projects; the least recently used go first
+MAX_CACHED_FILES: int = 100_000
+
+# the version of the schema of the cache, stored in its user_version; older caches are dropped
+_CACHE_SCHEMA_VERSION: int = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parsed_last_used ON parsed (last_used);
+"""
+
+
+@dataclass
+class Definition:
+    name: str
+    qualname: str
+    kind: str
+    line: int
+    end_line: int
+    signature: str
+
+
+@dataclass
+class Reference:
+    name: str
+    line: int
+    kind: str
+    scope: str
+
+
+@dataclass
+class FileSymbols:
+    """The definitions and references found in one Python source file."""
+    definitions: list[Definition] = field(default_factory=list)
+    references: list[Reference] = field(default_factory=list)
+    error: str | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "FileSymbols":
+        raw = json.loads(data)
+        return cls(
+            definitions=[Definition(**d) for d in raw["definitions"]],
+            references=[Reference(**r) for r in raw["references"]],
+            error=raw["error"],
+        )
+
+
+def _signature(node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(kw) for kw in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.symbols: FileSymbols = FileSymbols()
+        self._scopes: list[tuple[str, bool]] = []
+        self._call_funcs: set[int] = set()
+
+    @property
+    def _scope(self) -> str:
+        return ".".join(name for name, _ in self._scopes)
+
+    def _reference(self, name: str, line: int, kind: str):
+        self.symbols.references.append(Reference(name, line, kind, self._scope))
+
+    def _visit_definition(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef):
+        in_class = bool(self._scopes) and self._scopes[-1][1]
+        if isinstance(node, ast.ClassDef):
+            kind = "class"
+        else:
+            kind = "method" if in_class else "function"
+        qualname = f"{self._scope}.{node.name}" if self._scopes else node.name
+        self.symbols.definitions.append(
+            Definition(node.name, qualname, kind, node.lineno, node.end_lineno or node.lineno, _signature(node))
+        )
+        # decorators, bases and defaults are evaluated in the enclosing scope
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        if isinstance(node, ast.ClassDef):
+            for base in [*node.bases, *node.keywords]:
+                self.visit(base)
+        else:
+            self.visit(node.args)
+            if node.returns:
+                self.visit(node.returns)
+        self._scopes.append((node.name, isinstance(node, ast.ClassDef)))
+        for statement in node.body:
+            self.visit(statement)
+        _ = self._scopes.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self._visit_definition(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+        self._visit_definition(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._visit_definition(node)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name):
+            self._reference(func.id, node.lineno, "call")
+            self._call_funcs.add(id(func))
+        elif isinstance(func, ast.Attribute):
+            self._reference(func.attr, func.end_lineno or node.lineno, "call")
+            self._call_funcs.add(id(func))
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        if id(node) not in self._call_funcs and isinstance(node.ctx, ast.Load):
+            self._reference(node.id, node.lineno, "use")
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if id(node) not in self._call_funcs and isinstance(node.ctx, ast.Load):
+            self._reference(node.attr, node.end_lineno or node.lineno, "use")
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self._reference(alias.name.rsplit(".", 1)[-1], node.lineno, "import")
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for alias in node.names:
+            self._reference(alias.name, node.lineno, "import")
+
+
+def parse_symbols(source: bytes) -> FileSymbols:
+    """Parse a Python source and collect its definitions and references."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        return FileSymbols(error=f"cannot be parsed: {e}")
+    visitor = _SymbolVisitor()
+    visitor.visit(tree)
+    return visitor.symbols
+
+
+@dataclass
+class _IndexedFile:
+    mtime_ns: int
+    size: int
+    symbols: FileSymbols
+
+
+class SymbolIndex:
+    """Symbols of all Python files below a project root.
+
+    Parsed files are stored in a SQLite cache keyed by the hash of their content, so a file
+    is only parsed again when its content changes, also across runs and projects. The cache
+    keeps the `max_cached_files` most recently used results. The in-memory maps from names
+    to files are updated incrementally. All methods are thread-safe.
+    """
+
+    def __init__(self, project_path: Path, db_path: Path, max_cached_files: int = MAX_CACHED_FILES):
+        self.project_path: Path = project_path
+        self.db_path: Path = db_path
+        self.max_cached_files: int = max_cached_files
+        self.parsed_files: int = 0
+        self._lock: threading.RLock = threading.RLock()
+        self._lister: DirectoryLister = DirectoryLister()
+        self._files: dict[Path, _IndexedFile] = {}
+        self._definitions: dict[str, set[Path]] = {}
+        self._references: dict[str, set[Path]] = {}
+        self._last_update: float = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path)
+        _ = connection.execute("PRAGMA journal_mode=WAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != _CACHE_SCHEMA_VERSION:
+            with connection:
+                _ = connection.execute("DROP TABLE IF EXISTS parsed")
+                _ = connection.execute(f"PRAGMA user_version = {_CACHE_SCHEMA_VERSION}")
+        _ = connection.executescript(_SCHEMA)
+        return connection
+
+    def _commit(self, connection: sqlite3.Connection):
+        """Commit the parse results of an update, evicting the least recently used beyond the limit."""
+        excess = connection.execute("SELECT count(*) FROM parsed").fetchone()[0] - self.max_cached_files
+        if excess > 0:
+            _ = connection.execute(
+                "DELETE FROM parsed WHERE hash IN (SELECT hash FROM parsed ORDER BY last_used LIMIT ?)", (excess,)
+            )
+        connection.commit()
+
+    def update(self, force: bool = True):
+        """Bring the index up to date with the Python files below the project root."""
+        with self._lock:
+            if not force and time.monotonic() - self._last_update < REFRESH_INTERVAL:
+                return
+            connection = self._connect()
+            try:
+                seen: set[Path] = set()
+                for path in self._lister.iter_files(self.project_path):
+                    if path.suffix in (".py", ".pyi"):
+                        seen.add(path)
+                        _ = self._load(path, connection)
+                for path in [path for path in self._files if path not in seen]:
+                    self._remove(path)
+                self._commit(connection)
+            finally:
+                connection.close()
+            self._last_update = time.monotonic()
+
+    def file_symbols(self, path: Path) -> FileSymbols | None:
+        """Return the symbols of a single file, which may be outside the project."""
+        with self._lock:
+            connection = self._connect()
+            try:
+                symbols = self._load(path, connection)
+                self._commit(connection)
+            finally:
+                connection.close()
+            return symbols
+
+    def _load(self, path: Path, connection: sqlite3.Connection) -> FileSymbols | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._remove(path)
+            return None
+        indexed = self._files.get(path)
+        if indexed is not None and (indexed.mtime_ns, indexed.size) == (stat.st_mtime_ns, stat.st_size):
+            return indexed.symbols
+        if stat.st_size > MAX_PARSED_FILE_SIZE:
+            self._remove(path)
+            return None
+        try:
+            source = path.read_bytes()
+        except OSError:
+            self._remove(path)
+            return None
+
+        key = f"{SYMBOL_INDEX_VERSION}:{hashlib.blake2b(source, digest_size=16).hexdigest()}"
+        row = connection.execute("SELECT data FROM parsed WHERE hash = ?", (key,)).fetchone()
+        if row is not None:
+            symbols = FileSymbols.from_json(row[0])
+            _ = connection.execute("UPDATE parsed SET last_used = ? WHERE hash = ?", (time.time(), key))
+        else:
+            symbols = parse_symbols(source)
+            self.parsed_files += 1
+            _ = connection.execute(
+                "INSERT OR REPLACE INTO parsed (hash, data, last_used) VALUES (?, ?, ?)",
+                (key, symbols.to_json(), time.time())
+            )
+
+        self._remove(path)
+        self._files[path] = _IndexedFile(stat.st_mtime_ns, stat.st_size, symbols)
+        for definition in symbols.definitions:
+            self._definitions.setdefault(definition.name, set()).add(path)
+        for reference in symbols.references:
+            self._references.setdefault(reference.name, set()).add(path)
+        return symbols
+
+    def _remove(self, path: Path):
+        indexed = self._files.pop(path, None)
+        if indexed is None:
+            return
+        for names, inverted in (
+            ({d.name for d in indexed.symbols.definitions}, self._definitions),
+            ({r.name for r in indexed.symbols.references}, self._references),
+        ):
+            for name in names:
+                paths = inverted.get(name)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del inverted[name]
+
+    def find_definitions(self, name: str) -> list[tuple[Path, Definition]]:
+        """Return the definitions of `name`, which may be qualified like `Class.method`."""
+        short_name = name.rsplit(".", 1)[-1]
+        with self._lock:
+            return [
+                (path, definition)
+                for path in sorted(self._definitions.get(short_name, ()))
+                for definition in self._files[path].symbols.definitions
+                if definition.name == short_name
+                and (definition.qualname == name or definition.qualname.endswith("." + name) or name == short_name)
+            ]
+
+    def find_references(self, name: str, calls_only: bool = False) -> list[tuple[Path, Reference]]:
+        """Return the references to the last component of `name`, optionally only the calls."""
+        short_name = name.rsplit(".", 1)[-1]
+        with self._lock:
+            return [
+                (path, reference)
+                for path in sorted(self._references.get(short_name, ()))
+                for reference in self._files[path].symbols.references
+                if reference.name == short_name and (not calls_only or reference.kind == "call")
+            ]
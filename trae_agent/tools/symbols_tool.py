@@ -0,0 +1,170 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import threading
+from pathlib import Path
+from typing import override
+
+from ..utils.cache import get_cache_dir
+from .base import Tool, ToolCallArguments, ToolError, ToolExecResult, ToolParameter
+from .symbol_index import Reference, SymbolIndex
+
+SymbolsSubCommands = [
+    "definition",
+    "references",
+    "callers",
+    "outline",
+]
+MAX_SYMBOL_RESULTS: int = 50
+MAX_LINE_LENGTH: int = 200
+
+
+class SymbolsTool(Tool):
+    """Tool to look up definitions, references and outlines of Python code."""
+
+    def __init__(self):
+        self._index: SymbolIndex | None = None
+        self._index_thread: threading.Thread | None = None
+        super().__init__()
+
+    @override
+    def get_name(self) -> str:
+        return "symbols"
+
+    @override
+    def get_description(self) -> str:
+        return """Look up Python symbols of the project using an index built from the syntax trees of all `.py` files
+* `definition` shows where `name` is defined, with its signature. `name` can be qualified, e.g. `Config` or `Config.load`
+* `references` shows every line that uses, calls or imports `name`, with the enclosing function or class
+* `callers` shows only the lines that call `name`, with the enclosing function or class
+* `outline` shows the classes, functions and methods defined in the file at `path`, with their line ranges
+* Lookups are by name, so unrelated symbols with the same name are listed as well
+"""
+
+    @override
+    def get_parameters(self) -> list[ToolParameter]:
+        return [
+            ToolParameter(
+                name="command",
+                type="string",
+                description=f"The lookup to run. Allowed options are: {', '.join(SymbolsSubCommands)}.",
+                required=True,
+                enum=SymbolsSubCommands
+            ),
+            ToolParameter(
+                name="name",
+                type="string",
+                description="Name of the symbol, required for `definition`, `references` and `callers`.",
+                required=False
+            ),
+            ToolParameter(
+                name="path",
+                type="string",
+                description="Absolute path to a Python file, required for `outline`.",
+                required=False
+            ),
+        ]
+
+    @override
+    def set_project_path(self, project_path: str):
+        """Start indexing the project in the background."""
+        self._index = SymbolIndex(Path(project_path).resolve(), get_cache_dir("symbols") / "symbols.sqlite3")
+        self._index_thread = threading.Thread(target=self._index.update, name="symbol-index", daemon=True)
+        self._index_thread.start()
+
+    @override
+    async def execute(self, arguments: ToolCallArguments) -> ToolExecResult:
+        command = str(arguments["command"]) if "command" in arguments else None
+        if command not in SymbolsSubCommands:
+            return ToolExecResult(
+                error=f"Unrecognized command {command}. The allowed commands for the {self.get_name()} tool are: {', '.join(SymbolsSubCommands)}",
+                error_code=-1
+            )
+        if self._index is None:
+            return ToolExecResult(error="The project root is unknown, symbols cannot be looked up.", error_code=-1)
+        try:
+            if command == "outline":
+                path = str(arguments["path"]) if arguments.get("path") else None
+                if path is None:
+                    raise ToolError("Parameter `path` is required for command: outline")
+                return await asyncio.to_thread(self.outline, Path(path))
+            name = str(arguments["name"]) if arguments.get("name") else None
+            if name is None:
+                raise ToolError(f"Parameter `name` is required for command: {command}")
+            if command == "definition":
+                return await asyncio.to_thread(self.definition, name)
+            return await asyncio.to_thread(self.references, name, command == "callers")
+        except ToolError as e:
+            return ToolExecResult(error=e.message, error_code=-1)
+
+    def _relative(self, path: Path) -> str:
+        assert self._index is not None
+        try:
+            return path.relative_to(self._index.project_path).as_posix()
+        except ValueError:
+            return str(path)
+
+    def definition(self, name: str) -> ToolExecResult:
+        """Show the definitions of `name`."""
+        assert self._index is not None
+        self._index.update(force=False)
+        definitions = self._index.find_definitions(name)
+        if not definitions:
+            return ToolExecResult(output=f"No definition of `{name}` found.")
+        lines = [f"Found {len(definitions)} definitions of `{name}`:"]
+        for path, definition in definitions[:MAX_SYMBOL_RESULTS]:
+            lines.append(
+                f"{self._relative(path)}:{definition.line}-{definition.end_line}: {definition.kind} {definition.qualname}: {definition.signature}"
+            )
+        return ToolExecResult(output="\n".join(lines))
+
+    def references(self, name: str, calls_only: bool) -> ToolExecResult:
+        """Show the references to `name` together with the source lines."""
+        assert self._index is not None
+        self._index.update(force=False)
+        references = self._index.find_references(name, calls_only)
+        kind = "calls of" if calls_only else "references to"
+        if not references:
+            return ToolExecResult(output=f"No {kind} `{name}` found.")
+
+        # one line per source line, even if it references the name more than once
+        by_line: dict[tuple[Path, int], Reference] = {}
+        for path, reference in references:
+            _ = by_line.setdefault((path, reference.line), reference)
+        lines = [f"Found {len(by_line)} lines with {kind} `{name}`:"]
+        source_lines: dict[Path, list[str]] = {}
+        for (path, line), reference in list(by_line.items())[:MAX_SYMBOL_RESULTS]:
+            if path not in source_lines:
+                try:
+                    source_lines[path] = path.read_text(errors="replace").split("\n")
+                except OSError:
+                    source_lines[path] = []
+            text = source_lines[path][line - 1].strip() if line <= len(source_lines[path]) else ""
+            if len(text) > MAX_LINE_LENGTH:
+                text = text[:MAX_LINE_LENGTH] + "..."
+            scope = f" (in {reference.scope})" if reference.scope else ""
+            lines.append(f"{self._relative(path)}:{line}{scope}: {text}")
+        if len(by_line) > MAX_SYMBOL_RESULTS:
+            lines.append(f"... {len(by_line) - MAX_SYMBOL_RESULTS} more lines not shown")
+        return ToolExecResult(output="\n".join(lines))
+
+    def outline(self, path: Path) -> ToolExecResult:
+        """Show the definitions of a file, indented by nesting."""
+        assert self._index is not None
+        if not path.is_absolute():
+            raise ToolError(f"The path {path} is not an absolute path, it should start with `/`.")
+        if path.suffix not in (".py", ".pyi"):
+            raise ToolError(f"The path {path} is not a Python file.")
+        symbols = self._index.file_symbols(path)
+        if symbols is None:
+            raise ToolError(f"The path {path} does not exist or is too large to be indexed.")
+        if symbols.error:
+            raise ToolError(f"The file {path} {symbols.error}")
+        if not symbols.definitions:
+            return ToolExecResult(output=f"No classes or functions are defined in {path}.")
+        lines = [f"Outline of {path}:"]
+        for definition in symbols.definitions:
+            indent = "    " * definition.qualname.count(".")
+            lines.append(f"{indent}{definition.line}-{definition.end_line}: {definition.signature}")
+        return ToolExecResult(output="\n".join(lines))
@@ -0,0 +1,275 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""On-disk trigram index of the files of a project, used by the code search tool."""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .dir_listing import DirectoryLister
+
+MAX_INDEXED_FILE_SIZE: int = 2 * 1024 * 1024  # bytes
+# trigrams used to narrow down the candidate files of a query
+MAX_QUERY_TRIGRAMS: int = 32
+# pause between the background updates of a watched index, in seconds; it doubles after every
+# update that found no changed file, up to the maximum, and is reset when files are changed
+REFRESH_INTERVAL: float = 2.0
+MAX_REFRESH_INTERVAL: float = 60.0
+# the background updates stop after this many seconds without searches or changed files
+IDLE_TIMEOUT: float = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    is_text INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_file_id ON trigrams (file_id);
+CREATE TABLE IF NOT EXISTS updates (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    finished_ns INTEGER NOT NULL
+);
+"""
+
+
+def _encode(trigram: tuple[str, str, str]) -> int:
+    # three code points of at most 21 bits each fit into a signed 64-bit integer
+    return (ord(trigram[0]) << 42) | (ord(trigram[1]) << 21) | ord(trigram[2])
+
+
+def text_trigrams(text: str) -> set[int]:
+    """Return the encoded trigrams of the lowercased text."""
+    text = text.lower()
+    return {_encode(trigram) for trigram in set(zip(text, text[1:], text[2:]))}
+
+
+def required_literals(pattern: str, is_regex: bool) -> list[str]:
+    """Return the literal strings every match of the query has to contain."""
+    if not is_regex:
+        return [pattern]
+    try:
+        from re import _parser  # pyright: ignore[reportAttributeAccessIssue, reportUnknownVariableType]
+        parsed = _parser.parse(pattern)  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    except Exception:
+        return []
+
+    literals: list[str] = []
+    current = ""
+    # only a top-level sequence of items is analyzed, anything else ends a literal run
+    for op, value in parsed:  # pyright: ignore[reportUnknownVariableType]
+        if op == _parser.LITERAL:  # pyright: ignore[reportUnknownMemberType]
+            current += chr(value)  # pyright: ignore[reportUnknownArgumentType]
+        else:
+            if current:
+                literals.append(current)
+            current = ""
+    if current:
+        literals.append(current)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _is_text_file(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return b"\0" not in f.read(8192)
+    except OSError:
+        return False
+
+
+class TrigramIndex:
+    """Trigram index of the text files below a project root, stored in SQLite.
+
+    The index is updated incrementally: directories whose mtime is unchanged are not listed
+    again and only files whose mtime or size changed since the last update are re-read.
+    Each update is a single transaction, so queries never wait for an update and always see
+    the last completed one. A watched index is updated in the background, right away when
+    files are known to have changed and otherwise less and less often. All methods are
+    thread-safe.
+    """
+
+    def __init__(self, project_path: Path, db_path: Path):
+        self.project_path: Path = project_path
+        self.db_path: Path = db_path
+        self._lock: threading.Lock = threading.Lock()
+        self._lister: DirectoryLister = DirectoryLister()
+        self._stopped: threading.Event = threading.Event()
+        self._changed: threading.Event = threading.Event()
+        # guards starting and ending the watcher thread
+        self._watch_lock: threading.Lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._last_active: float = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path)
+        _ = connection.execute("PRAGMA journal_mode=WAL")
+        _ = connection.execute("PRAGMA synchronous=NORMAL")
+        _ = connection.executescript(_SCHEMA)
+        return connection
+
+    def update(self) -> int:
+        """Bring the index up to date with the files on disk and return the number of re-indexed files."""
+        return self._locked_update(None)
+
+    def _locked_update(self, abort: threading.Event | None) -> int:
+        with self._lock:
+            connection = self._connect()
+            try:
+                return self._update(connection, abort)
+            finally:
+                connection.close()
+
+    def watch(self, interval: float = REFRESH_INTERVAL):
+        """Keep the index up to date in a background thread until it is idle, starting the thread if needed."""
+        with self._watch_lock:
+            self._last_active = time.monotonic()
+            if self._watcher is not None:
+                return
+            self._stopped.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="code-search-index", daemon=True)
+            self._watcher.start()
+
+    def files_changed(self):
+        """Update the index in the background as soon as possible, e.g. after a tool wrote files."""
+        self._changed.set()
+        self.watch()
+
+    def _watch(self, interval: float):
+        pause = interval
+        while not self._stopped.is_set():
+            # changes made from now on are picked up by this update or the next one
+            self._changed.clear()
+            try:
+                indexed = self._locked_update(self._stopped)
+            except sqlite3.Error:
+                # e.g. the cache directory was removed, the next update tries again
+                indexed = 0
+            pause = interval if indexed else min(2 * pause, MAX_REFRESH_INTERVAL)
+            if self._changed.wait(pause):
+                pause = interval
+                continue
+            with self._watch_lock:
+                if self._stopped.is_set() or time.monotonic() - self._last_active > IDLE_TIMEOUT:
+                    self._watcher = None
+                    return
+
+    def stop(self):
+        """Stop the background updates, abandoning an update in progress."""
+        with self._watch_lock:
+            watcher = self._watcher
+            self._stopped.set()
+        # wake the watcher from its pause
+        self._changed.set()
+        if watcher is not None:
+            watcher.join()
+        with self._watch_lock:
+            if self._watcher is watcher:
+                self._watcher = None
+
+    def _update(self, connection: sqlite3.Connection, abort: threading.Event | None) -> int:
+        known: dict[str, tuple[int, int, int]] = {
+            path: (file_id, mtime_ns, size)
+            for file_id, path, mtime_ns, size in connection.execute("SELECT id, path, mtime_ns, size FROM files")
+        }
+        seen: set[str] = set()
+        indexed = 0
+        for path in self._lister.iter_files(self.project_path):
+            if abort is not None and abort.is_set():
+                connection.rollback()
+                return 0
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_size > MAX_INDEXED_FILE_SIZE:
+                continue
+            relative = path.relative_to(self.project_path).as_posix()
+            seen.add(relative)
+            previous = known.get(relative)
+            if previous is not None and previous[1:] == (stat.st_mtime_ns, stat.st_size):
+                continue
+            if previous is not None:
+                _ = connection.execute("DELETE FROM trigrams WHERE file_id = ?", (previous[0],))
+                _ = connection.execute("DELETE FROM files WHERE id = ?", (previous[0],))
+            is_text = _is_text_file(path)
+            try:
+                text = path.read_text(errors="replace") if is_text else ""
+            except OSError:
+                continue
+            # binary files are kept without trigrams so they are not re-checked on every update
+            cursor = connection.execute(
+                "INSERT INTO files (path, mtime_ns, size, is_text) VALUES (?, ?, ?, ?)",
+                (relative, stat.st_mtime_ns, stat.st_size, int(is_text))
+            )
+            file_id = cursor.lastrowid
+            _ = connection.executemany(
+                "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+                ((trigram, file_id) for trigram in text_trigrams(text))
+            )
+            indexed += 1
+
+        for relative, (file_id, _, _) in known.items():
+            if relative not in seen:
+                _ = connection.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+                _ = connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        _ = connection.execute("INSERT OR REPLACE INTO updates (id, finished_ns) VALUES (0, ?)", (time.time_ns(),))
+        connection.commit()
+        return indexed
+
+    def candidates(self, literals: list[str]) -> dict[str, tuple[int, int]]:
+        """Return the relative paths of the files that contain all trigrams of the literals.
+
+        The paths are sorted and map to the mtime and size of the files when they were indexed,
+        so that files changed since can be told apart. Until the first update has completed,
+        all text files on disk are candidates.
+        """
+        trigrams: set[int] = set()
+        for literal in literals:
+            trigrams |= text_trigrams(literal)
+        query_trigrams = sorted(trigrams)[:MAX_QUERY_TRIGRAMS]
+
+        # no lock: in WAL mode the reads see the last committed update while the next one is written
+        connection = self._connect()
+        try:
+            # the read transaction makes all reads below see the same update, which a concurrent
+            # update cannot change until it ends
+            _ = connection.execute("BEGIN")
+            if connection.execute("SELECT 1 FROM updates").fetchone() is None:
+                return self._scan_text_files()
+            if not query_trigrams:
+                rows = connection.execute("SELECT path, mtime_ns, size FROM files WHERE is_text = 1 ORDER BY path").fetchall()
+            else:
+                placeholders = ",".join("?" * len(query_trigrams))
+                rows = connection.execute(
+                    f"""SELECT path, mtime_ns, size FROM files WHERE id IN (
+                        SELECT file_id FROM trigrams WHERE trigram IN ({placeholders})
+                        GROUP BY file_id HAVING COUNT(*) = ?
+                    ) ORDER BY path""",
+                    (*query_trigrams, len(query_trigrams))
+                ).fetchall()
+        finally:
+            connection.close()
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+
+    def _scan_text_files(self) -> dict[str, tuple[int, int]]:
+        # a lister of its own, the one of the index is used by the update running meanwhile
+        files: dict[str, tuple[int, int]] = {}
+        for path in DirectoryLister().iter_files(self.project_path):
+            try:
+                stat = os.stat(path)
+                if stat.st_size > MAX_INDEXED_FILE_SIZE or not _is_text_file(path):
+                    continue
+            except OSError:
+                continue
+            files[path.relative_to(self.project_path).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return dict(sorted(files.items()))
+
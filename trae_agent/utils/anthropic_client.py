@@ -13,7 +13,7 @@ from anthropic.types.tool_union_param import TextEditor20250429
 
 from ..tools.base import Tool, ToolCall, ToolResult
 from ..utils.config import ModelParameters
-from ..utils.llm_basics import LLMMessage, LLMResponse, LLMUsage
+from ..utils.llm_basics import LLMMessage, LLMResponse, LLMTimings, LLMUsage
 from .base_client import BaseLLMClient
 
 class AnthropicClient(BaseLLMClient):
@@ -77,7 +77,10 @@ class AnthropicClient(BaseLLMClient):
 
         response = None
         error_message = ""
+        timings = LLMTimings()
+        call_start = time.perf_counter()
         for i in range(model_parameters.max_retries):
+            attempt_start = time.perf_counter()
             try:
                 response = self.client.messages.create(
                     model=model_parameters.model,
@@ -88,7 +91,11 @@ class AnthropicClient(BaseLLMClient):
                     temperature=model_parameters.temperature,
                     top_p=model_parameters.top_p,
                     top_k=model_parameters.top_k,
+                    stop_sequences=model_parameters.stop_sequences or anthropic.NOT_GIVEN,
                 )
+                timings.request = time.perf_counter() - attempt_start
+                timings.queued = attempt_start - call_start
+                timings.retries = i
                 break
             except Exception as e:
                 error_message += f"Error {i + 1}: {str(e)}\n"
@@ -99,6 +106,7 @@ class AnthropicClient(BaseLLMClient):
         if response is None:
             raise ValueError(f"Failed to get response from Anthropic after max retries: {error_message}")
 
+        parse_start = time.perf_counter()
         # Handle tool calls in response
         content = ""
         tool_calls: list[ToolCall] = []
@@ -138,6 +146,9 @@ class AnthropicClient(BaseLLMClient):
             tool_calls=tool_calls if len(tool_calls) > 0 else None
         )
 
+        timings.parsing = time.perf_counter() - parse_start
+        llm_response.timings = timings
+
         # Record trajectory if recorder is available
         if self.trajectory_recorder:
             self.trajectory_recorder.record_llm_interaction(
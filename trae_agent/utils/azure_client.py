@@ -16,7 +16,7 @@ from openai.types.chat.chat_completion_tool_message_param import ChatCompletionT
 from openai.types.shared_params.function_definition import FunctionDefinition
 
 from .base_client import BaseLLMClient
-from .llm_basics import LLMUsage, LLMMessage, LLMResponse
+from .llm_basics import LLMUsage, LLMMessage, LLMResponse, LLMTimings
 from .config import ModelParameters
 from ..tools.base import Tool, ToolCall
 
@@ -80,7 +80,10 @@ class AzureClient(BaseLLMClient):
 
         response = None
         error_message = ""
+        timings = LLMTimings()
+        call_start = time.perf_counter()
         for i in range(model_parameters.max_retries):
+            attempt_start = time.perf_counter()
             try:
                 response = self.client.chat.completions.create(
                     model=model_parameters.model,
@@ -89,8 +92,12 @@ class AzureClient(BaseLLMClient):
                     temperature=model_parameters.temperature,
                     top_p=model_parameters.top_p,
                     max_tokens=model_parameters.max_tokens,
+                    stop=model_parameters.stop_sequences or openai.NOT_GIVEN,
                     n=1
                 )
+                timings.request = time.perf_counter() - attempt_start
+                timings.queued = attempt_start - call_start
+                timings.retries = i
                 break
             except Exception as e:
                 error_message += f"Error {i + 1}: {str(e)}\n"
@@ -101,6 +108,7 @@ class AzureClient(BaseLLMClient):
         if response is None:
             raise ValueError(f"Failed to get response from Azure after max retries: {error_message}")
 
+        parse_start = time.perf_counter()
         choice = response.choices[0]
 
         tool_calls = None
@@ -144,6 +152,9 @@ class AzureClient(BaseLLMClient):
                 role="assistant"
             ))
 
+        timings.parsing = time.perf_counter() - parse_start
+        llm_response.timings = timings
+
         if self.trajectory_recorder:
             self.trajectory_recorder.record_llm_interaction(
                 messages=messages,
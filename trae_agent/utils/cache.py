@@ -0,0 +1,21 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Location of the on-disk caches of Trae Agent."""
+
+import os
+from pathlib import Path
+
+
+def get_cache_dir(*parts: str) -> Path:
+    """Return (and create) a cache directory.
+
+    The base directory is `$TRAE_CACHE_DIR` if set, otherwise `trae-agent` in the user cache
+    directory (`$XDG_CACHE_HOME` or `~/.cache`).
+    """
+    base = os.getenv("TRAE_CACHE_DIR")
+    if not base:
+        base = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache"), "trae-agent")
+    path = Path(base, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
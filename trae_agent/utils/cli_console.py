@@ -22,6 +22,17 @@ AGENT_STATE_INFO = {
     AgentState.IDLE: ("white", "⏸️")
 }
 
+STEP_PHASE_NAMES = {
+    "llm_queued": "LLM Queued",
+    "llm_request": "LLM Requests",
+    "llm_parsing": "Response Parsing",
+    "tools": "Tool Calls",
+    "reflection": "Reflection",
+    "recording": "Recording",
+    "console": "Console",
+    "other": "Other"
+}
+
 @dataclass
 class ConsoleStep:
     panel: Panel
@@ -250,6 +261,9 @@ class CLIConsole:
         table.add_row("Success", "✅ Yes" if execution.success else "❌ No")
         table.add_row("Steps", str(len(execution.steps)))
         table.add_row("Execution Time", f"{execution.execution_time:.2f}s")
+        for phase, duration in execution.phase_times().items():
+            share = f" ({duration / execution.execution_time:.0%})" if execution.execution_time > 0 else ""
+            table.add_row(f"  {STEP_PHASE_NAMES.get(phase, phase)}", f"{duration:.2f}s{share}")
 
         if execution.total_tokens:
             total_tokens = execution.total_tokens.input_tokens + execution.total_tokens.output_tokens
@@ -257,6 +271,25 @@ class CLIConsole:
             table.add_row("Input Tokens", str(execution.total_tokens.input_tokens))
             table.add_row("Output Tokens", str(execution.total_tokens.output_tokens))
 
+        if self.lake_view and self.lake_view.stats:
+            # steps annotated from the cache need no tagging at all
+            tagged = self.lake_view.stats["rule_tagged_steps"] + self.lake_view.stats["model_tagged_steps"]
+            if tagged:
+                rule_tagged = self.lake_view.stats["rule_tagged_steps"]
+                table.add_row("Lakeview Rule Tags", f"{rule_tagged}/{tagged} steps ({rule_tagged / tagged:.0%})")
+            if self.lake_view.stats["cached_steps"]:
+                table.add_row("Lakeview Cached", f"{self.lake_view.stats['cached_steps']} steps")
+            if self.lake_view.stats["batch_calls"]:
+                table.add_row("Lakeview Batched", f"{self.lake_view.stats['batched_steps']} steps in {self.lake_view.stats['batch_calls']} calls")
+            usage = self.lake_view.run_usage
+            if usage.calls:
+                over_budget = self.lake_view.stats["over_budget_steps"]
+                table.add_row(
+                    "Lakeview Budget",
+                    f"{usage.calls} calls, {usage.tokens} tokens, {usage.seconds:.1f}s"
+                    + (f" ({over_budget} steps over budget)" if over_budget else "")
+                )
+
         # Display final result
         if execution.final_result:
             panel = Panel(
@@ -11,7 +11,7 @@
 import json
 from pathlib import Path
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import override
 
 
@@ -29,6 +29,16 @@ class ModelParameters:
     max_retries: int
     base_url: str | None = None
     api_version: str | None = None
+    # the model stops generating at any of these, where the provider supports it
+    stop_sequences: list[str] | None = None
+
+
+@dataclass
+class LakeviewBudget:
+    """Limits of the LLM calls Lakeview makes, for one step or for the whole run. None is no limit."""
+    max_calls: int | None = None
+    max_tokens: int | None = None
+    max_seconds: float | None = None  # wall time of the calls
 
 
 @dataclass
@@ -36,6 +46,48 @@ class LakeviewConfig:
     """Configuration for Lakeview."""
     model_provider: str
     model_name: str
+    # LLM calls of Lakeview in flight at once, across all steps
+    max_concurrent_calls: int = 2
+    # steps waiting to be annotated are sent in one request, of at most this many steps,
+    # once the first of them waited this long
+    max_batch_size: int = 4
+    max_batch_wait: float = 0.5  # seconds
+    # annotations of steps are cached on disk, keeping this many of the most recently used
+    cache: bool = True
+    cache_max_entries: int = 10_000
+    # steps annotated past their budget, or past the budget of the run, are shown without a summary
+    step_budget: LakeviewBudget = field(default_factory=lambda: LakeviewBudget(max_calls=6, max_seconds=120.0))
+    run_budget: LakeviewBudget = field(default_factory=LakeviewBudget)
+
+
+def _parse_lakeview_budget(budget_config: dict[str, int | float | None], default: LakeviewBudget) -> LakeviewBudget:
+    """Parse a budget of the Lakeview configuration, keeping the default of each limit not given."""
+    max_calls = budget_config.get("max_calls", default.max_calls)
+    max_tokens = budget_config.get("max_tokens", default.max_tokens)
+    max_seconds = budget_config.get("max_seconds", default.max_seconds)
+    return LakeviewBudget(
+        max_calls=int(max_calls) if max_calls is not None else None,
+        max_tokens=int(max_tokens) if max_tokens is not None else None,
+        max_seconds=float(max_seconds) if max_seconds is not None else None,
+    )
+
+
+@dataclass
+class OutputCompactionConfig:
+    """Configuration for compacting tool outputs before they enter the conversation."""
+    enabled: bool = True
+    max_chars: int = 16000
+    tool_names: list[str] | None = None
+
+
+@dataclass
+class TracingConfig:
+    """Configuration for exporting spans of agent, LLM and tool operations."""
+    enabled: bool = False
+    file: str | None = None
+    endpoint: str | None = None
+    headers: dict[str, str] | None = None
+    service_name: str = "trae-agent"
 
 
 @dataclass
@@ -46,6 +98,8 @@ class Config:
     model_providers: dict[str, ModelParameters]
     lakeview_config: LakeviewConfig | None = None
     enable_lakeview: bool = True
+    output_compaction: OutputCompactionConfig | None = None
+    tracing: TracingConfig | None = None
 
     def __init__(self, config_file: str = "trae_config.json"):
         config_path = Path(config_file)
@@ -97,6 +151,34 @@ class Config:
             self.lakeview_config = LakeviewConfig(
                 model_provider=str(self._config.get("lakeview_config", {}).get("model_provider", "anthropic")),
                 model_name=str(self._config.get("lakeview_config", {}).get("model_name", "claude-sonnet-4-20250514")),
+                max_concurrent_calls=int(self._config.get("lakeview_config", {}).get("max_concurrent_calls", 2)),
+                max_batch_size=int(self._config.get("lakeview_config", {}).get("max_batch_size", 4)),
+                max_batch_wait=float(self._config.get("lakeview_config", {}).get("max_batch_wait", 0.5)),
+                cache=bool(self._config.get("lakeview_config", {}).get("cache", True)),
+                cache_max_entries=int(self._config.get("lakeview_config", {}).get("cache_max_entries", 10_000)),
+            )
+            self.lakeview_config.step_budget = _parse_lakeview_budget(
+                self._config.get("lakeview_config", {}).get("step_budget", {}), self.lakeview_config.step_budget
+            )
+            self.lakeview_config.run_budget = _parse_lakeview_budget(
+                self._config.get("lakeview_config", {}).get("run_budget", {}), self.lakeview_config.run_budget
+            )
+
+        output_compaction_config = self._config.get("output_compaction", {})
+        self.output_compaction = OutputCompactionConfig(
+            enabled=bool(output_compaction_config.get("enabled", True)),
+            max_chars=int(output_compaction_config.get("max_chars", 16000)),
+            tool_names=list(output_compaction_config["tool_names"]) if "tool_names" in output_compaction_config else None,
+        )
+
+        if "tracing" in self._config:
+            tracing_config = self._config.get("tracing", {})
+            self.tracing = TracingConfig(
+                enabled=bool(tracing_config.get("enabled", True)),
+                file=str(tracing_config["file"]) if "file" in tracing_config else None,
+                endpoint=str(tracing_config["endpoint"]) if "endpoint" in tracing_config else None,
+                headers={str(k): str(v) for k, v in tracing_config.get("headers", {}).items()},
+                service_name=str(tracing_config.get("service_name", "trae-agent")),
             )
 
         return
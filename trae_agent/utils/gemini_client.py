@@ -5,6 +5,7 @@
 
 import os
 import json
+import time
 from typing import override
 
 from google import genai
@@ -13,7 +14,7 @@ from google.genai import types
 from ..tools.base import Tool, ToolCall, ToolResult
 from ..utils.config import ModelParameters
 from .base_client import BaseLLMClient
-from .llm_basics import LLMMessage, LLMResponse, LLMUsage
+from .llm_basics import LLMMessage, LLMResponse, LLMTimings, LLMUsage
 
 
 class GeminiClient(BaseLLMClient):
@@ -104,6 +105,7 @@ class GeminiClient(BaseLLMClient):
             max_output_tokens=model_parameters.max_tokens,
             top_p=model_parameters.top_p,
             top_k=model_parameters.top_k,
+            stop_sequences=model_parameters.stop_sequences,
         )
         
         # Add system instruction if present
@@ -116,14 +118,20 @@ class GeminiClient(BaseLLMClient):
 
         try:
             # Make API call to Gemini
+            request_start = time.perf_counter()
             response = self.client.models.generate_content(
                 model=model_parameters.model,
                 contents=contents,
                 config=config
             )
+            parse_start = time.perf_counter()
 
             # Parse response to LLMResponse format
             llm_response = self._parse_response(response, model_parameters.model)
+            llm_response.timings = LLMTimings(
+                request=parse_start - request_start,
+                parsing=time.perf_counter() - parse_start
+            )
 
             # Record trajectory if recorder is available
             if self.trajectory_recorder:
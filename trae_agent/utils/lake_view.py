@@ -1,19 +1,43 @@
-from dataclasses import dataclass
+import asyncio
+import contextvars
+import queue
 import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 
 from trae_agent.agent.agent_basics import AgentStep
 
-from .llm_basics import LLMMessage
+from .llm_basics import LLMMessage, LLMResponse
+from .cache import get_cache_dir
+from .lake_view_cache import LakeViewCache, annotation_key
+from .lake_view_rules import rule_based_tags
 from .llm_client import LLMClient
-from .config import Config, ModelParameters
+from .config import Config, LakeviewBudget, ModelParameters
+from .tracing import get_tracer
 
 
+# bump when the prompts change, so cached annotations made with the older ones are not used
+LAKEVIEW_PROMPT_VERSION: int = 1
+
 StepType = tuple[
     str, # content for human (will write into result file)
     str | None, # content for llm, or None if no need to analyze (i.e., minor step), watch out length limit
 ]
 
 
+TAG_DEFINITIONS = '''<tags>
+WRITE_TEST: It writes a test script to reproduce the bug, or modifies a non-working test script to fix problems found in testing.
+VERIFY_TEST: It runs the reproduction test script to verify the testing environment is working.
+EXAMINE_CODE: It views, searches, or explores the code repository to understand the cause of the bug.
+WRITE_FIX: It modifies the source code to fix the identified bug.
+VERIFY_FIX: It runs the reproduction test or existing tests to verify the fix indeed solves the bug.
+REPORT: It reports to the user that the job is completed or some progress has been made.
+THINK: It analyzes the bug through thinking, but does not perform concrete actions right now.
+OUTLIER: A major part in this step does not fit into any tag above, such as running a shell command to install dependencies.
+</tags>'''
+
 EXTRACTOR_PROMPT = '''
 Given the preceding excerpt, your job is to determine "what task is the agent performing in <this_step>".
 Output your answer in two granularities: <task>...</task><details>...</details>.
@@ -30,21 +54,12 @@ Now, answer the question "what task is the agent performing in <this_step>".
 Again, provide only the answer with no other commentary. The format should be "<task>...</task><details>...</details>".
 '''
 
-TAGGER_PROMPT = '''
+TAGGER_PROMPT = f'''
 Given the trajectory, your job is to determine "what task is the agent performing in the current step".
 Output your answer by choosing the applicable tags in the below list for the current step.
 If it is performing multiple tasks in one step, choose ALL applicable tags, separated by a comma.
 
-<tags>
-WRITE_TEST: It writes a test script to reproduce the bug, or modifies a non-working test script to fix problems found in testing.
-VERIFY_TEST: It runs the reproduction test script to verify the testing environment is working.
-EXAMINE_CODE: It views, searches, or explores the code repository to understand the cause of the bug.
-WRITE_FIX: It modifies the source code to fix the identified bug.
-VERIFY_FIX: It runs the reproduction test or existing tests to verify the fix indeed solves the bug.
-REPORT: It reports to the user that the job is completed or some progress has been made.
-THINK: It analyzes the bug through thinking, but does not perform concrete actions right now.
-OUTLIER: A major part in this step does not fit into any tag above, such as running a shell command to install dependencies.
-</tags>
+{TAG_DEFINITIONS}
 
 <examples>
 If the agent is opening a file to examine, output <tags>EXAMINE_CODE</tags>.
@@ -55,9 +70,70 @@ If the agent is merely thinking about the root cause of the bug without other ac
 Output only the tags with no other commentary. The format should be <tags>...</tags>
 '''
 
+BATCH_PROMPT = f'''
+Given the trajectory, your job is to determine "what task is the agent performing" in each step within the <batch> tag.
+For each of these steps, answer with a <step> tag with the same id, containing three tags:
+In the <task> tag, the answer should be concise and general, starting with "The agent". It should omit ANY bug-specific details, and contain at most 10 words.
+In the <details> tag, the answer should complement the <task> tag by adding bug-specific details. It should be informative and contain at most 30 words.
+In the <tags> tag, choose the applicable tags in the below list, separated by a comma if the agent is performing multiple tasks in the step.
+
+{TAG_DEFINITIONS}
+
+Example of the answer for a step:
+<step id="3"><task>The agent is writing a reproduction test script.</task><details>The agent is writing "test_bug.py" to reproduce the bug in XXX-Project's create_foo method not comparing sizes correctly.</details><tags>WRITE_TEST</tags></step>
+
+Provide only the answers with no other commentary, one <step> tag for each step in the <batch> tag.
+'''
+
 KNOWN_TAGS = {'WRITE_TEST': '☑️', 'VERIFY_TEST': '✅', 'EXAMINE_CODE': '👁️', 'WRITE_FIX': '📝', 'VERIFY_FIX': '🔥', 'REPORT': '📣', 'THINK': '🧠', 'OUTLIER': '⁉️'}
 
 tags_re = re.compile(r'<tags>([A-Z_,\s]+)</tags>')
+batch_step_re = re.compile(
+    r'<step id="(\d+)">\s*<task>(.*?)</task>\s*<details>(.*?)</details>\s*<tags>([A-Z_,\s]+)</tags>\s*</step>', re.DOTALL
+)
+
+# attempts at a well-formed answer of the extractor or the tagger, within the budget of the step
+ANNOTATION_ATTEMPTS = 3
+# attempts at a request that fails, made by Lakeview rather than the LLM client so that the budgets
+# see every attempt, and the delay between them
+REQUEST_ATTEMPTS = 2
+REQUEST_RETRY_DELAY = 1.0  # seconds
+
+# the tagger sees this many steps before the current one, and a synopsis of the steps before them
+TAGGER_WINDOW_STEPS = 8
+TAGGER_STEP_CHARS = 2_000
+
+
+class LakeViewBudgetExceeded(Exception):
+    """Raised instead of calling the model when a step or the run has spent its Lakeview budget."""
+
+
+@dataclass
+class BudgetUsage:
+    """LLM calls, tokens and wall time of the calls spent by Lakeview, on one step or on the run."""
+    calls: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+    def add(self, response: LLMResponse | None, seconds: float):
+        """Add the tokens and time of a finished call, which was counted when it started."""
+        if response is not None and response.usage is not None:
+            self.tokens += response.usage.input_tokens + response.usage.output_tokens
+        self.seconds += seconds
+
+    def exhausted(self, budget: LakeviewBudget) -> bool:
+        return (budget.max_calls is not None and self.calls >= budget.max_calls) \
+            or (budget.max_tokens is not None and self.tokens >= budget.max_tokens) \
+            or (budget.max_seconds is not None and self.seconds >= budget.max_seconds)
+
+
+@dataclass
+class _PendingStep:
+    """A step waiting to be annotated in a batch, with the future of its task, details and tags."""
+    step_number: int
+    step: str
+    future: asyncio.Future[tuple[str, str, list[str]] | None]
+
 
 @dataclass
 class LakeViewStep:
@@ -67,6 +143,10 @@ class LakeViewStep:
 
 class LakeView:
     def __init__(self, config: Config):
+        # how the steps were annotated: from the cache, tagged by rules or by the model
+        self.stats: Counter[str] = Counter()
+        # the LLM calls, tokens and time spent on the run
+        self.run_usage: BudgetUsage = BudgetUsage()
         if config.lakeview_config is None:
             return
 
@@ -79,14 +159,134 @@ class LakeView:
             top_p=model_parameters.top_p,
             top_k=model_parameters.top_k,
             parallel_tool_calls=model_parameters.parallel_tool_calls,
-            max_retries=model_parameters.max_retries,
+            # the client would sleep for up to 30 seconds between retries, beyond the budget's reach
+            max_retries=1,
             base_url=model_parameters.base_url,
             api_version=model_parameters.api_version,
         )
-        self.lakeview_llm_client: LLMClient = LLMClient(config.lakeview_config.model_provider, self.model_parameters)
-
-        self.steps: list[str] = []
+        self.model_provider: str = config.lakeview_config.model_provider
+        # the extractor and the tagger stop as soon as their answer is complete
+        self._extractor_parameters: ModelParameters = replace(
+            self.model_parameters, temperature=0.1, stop_sequences=["</details>"]
+        )
+        self._tagger_parameters: ModelParameters = replace(
+            self.model_parameters, temperature=0.1, stop_sequences=["</tags>"]
+        )
+        self._batch_parameters: ModelParameters = replace(self.model_parameters, temperature=0.1)
+
+        self.step_budget: LakeviewBudget = config.lakeview_config.step_budget
+        self.run_budget: LakeviewBudget = config.lakeview_config.run_budget
+
+        # The LLM clients are synchronous and keep a chat history, so every call in flight
+        # takes a client of its own from the idle ones. The pool bounds the calls in flight
+        # across all steps, and keeps them off the event loop shared with the agent and the console.
+        self._idle_clients: queue.SimpleQueue[LLMClient] = queue.SimpleQueue()
+        self._idle_clients.put(LLMClient(self.model_provider, self.model_parameters))
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max(1, config.lakeview_config.max_concurrent_calls), thread_name_prefix="lakeview"
+        )
 
+        self.max_batch_size: int = config.lakeview_config.max_batch_size
+        self.max_batch_wait: float = config.lakeview_config.max_batch_wait
+        self._pending: list[_PendingStep] = []
+        self._batch_timer: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task[None]] = set()
+
+        self.cache: LakeViewCache | None = None
+        if config.lakeview_config.cache:
+            self.cache = LakeViewCache(get_cache_dir("lakeview") / "annotations.sqlite3", config.lakeview_config.cache_max_entries)
+
+        # texts of the recent steps, and the tags of all steps of the run, by step number
+        self.steps: dict[int, str] = {}
+        self.step_tags: dict[int, list[str]] = {}
+        # tags of the steps that left the window, counted for the synopsis
+        self.synopsis_tags: Counter[str] = Counter()
+        self.synopsis_steps: int = 0
+        self.first_fix_step: int | None = None
+
+    def get_stats(self) -> dict[str, int]:
+        """Get the counts of steps annotated from the cache, tagged by rules and tagged by the model.
+
+        `batched_steps` counts the steps annotated by the `batch_calls` requests for several steps,
+        and `over_budget_steps` the steps left without a summary by the budgets. `calls`, `tokens`
+        and `call_ms` are the budget spent by the run.
+        """
+        stats = dict(self.stats)
+        if self.run_usage.calls:
+            stats.update(
+                calls=self.run_usage.calls,
+                tokens=self.run_usage.tokens,
+                call_ms=round(self.run_usage.seconds * 1000),
+            )
+        return stats
+
+    def _check_budget(self, step_usage: BudgetUsage | None):
+        if self.run_usage.exhausted(self.run_budget):
+            raise LakeViewBudgetExceeded("the Lakeview budget of the run is spent")
+        if step_usage is not None and step_usage.exhausted(self.step_budget):
+            raise LakeViewBudgetExceeded("the Lakeview budget of the step is spent")
+
+    def _remaining_seconds(self, step_usage: BudgetUsage | None) -> float | None:
+        """The time left to calls by the budgets of the run and the step, if they limit it."""
+        remaining = [
+            budget.max_seconds - usage.seconds
+            for budget, usage in ((self.run_budget, self.run_usage), (self.step_budget, step_usage))
+            if usage is not None and budget.max_seconds is not None
+        ]
+        return min(remaining) if remaining else None
+
+    async def _chat(
+        self, llm_messages: list[LLMMessage], model_parameters: ModelParameters, step_usage: BudgetUsage | None
+    ) -> LLMResponse:
+        """Call the Lakeview model in the worker pool, without blocking the event loop.
+
+        Every attempt is charged to the run and to `step_usage`. LakeViewBudgetExceeded is raised
+        instead of making an attempt if either budget is spent, and when an attempt outlasts the
+        time left to them.
+        """
+        def chat() -> LLMResponse:
+            try:
+                client = self._idle_clients.get_nowait()
+            except queue.Empty:
+                client = LLMClient(self.model_provider, self.model_parameters)
+            try:
+                return client.chat(
+                    model_parameters=model_parameters,
+                    messages=llm_messages,
+                    reuse_history=False
+                )
+            finally:
+                self._idle_clients.put(client)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._check_budget(step_usage)
+            # counted before the call, so calls in flight at once do not overrun the budget together
+            usages = [usage for usage in (self.run_usage, step_usage) if usage is not None]
+            for usage in usages:
+                usage.calls += 1
+
+            # run in a copy of the current context, so spans of the call are nested as usual
+            context = contextvars.copy_context()
+            start = time.perf_counter()
+            response = None
+            try:
+                # the thread of a call that outlasts the budget cannot be stopped, but it is not waited for
+                response = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(self._executor, context.run, chat),
+                    self._remaining_seconds(step_usage)
+                )
+                return response
+            except TimeoutError:
+                raise LakeViewBudgetExceeded("a Lakeview call outlasted the time left in its budget") from None
+            except Exception:
+                if attempt >= REQUEST_ATTEMPTS:
+                    raise
+            finally:
+                for usage in usages:
+                    usage.add(response, time.perf_counter() - start)
+            await asyncio.sleep(REQUEST_RETRY_DELAY)
 
     def get_label(self, tags: None|list[str], emoji: bool = True) -> str:
         if not tags:
@@ -96,7 +296,7 @@ class LakeView:
             KNOWN_TAGS[tag] + tag if emoji else tag for tag in tags
         ])
 
-    async def extract_task_in_step(self, prev_step: str, this_step: str) -> tuple[str, str]:
+    async def extract_task_in_step(self, prev_step: str, this_step: str, step_usage: BudgetUsage | None = None) -> tuple[str, str]:
         llm_messages = [
             LLMMessage(
                 role="user",
@@ -116,25 +316,16 @@ class LakeView:
             ),
         ]
 
-        self.model_parameters.temperature = 0.1
-        llm_response = self.lakeview_llm_client.chat(
-            model_parameters=self.model_parameters,
-            messages=llm_messages,
-            reuse_history=False
-        )
-
-        content = llm_response.content.strip()
-
-        retry = 0
-        while retry < 10 and \
+        content = ''
+        attempt = 0
+        while attempt < ANNOTATION_ATTEMPTS and \
             ('</task>' not in content or '<details>' not in content or '</details>' not in content):
-            retry += 1
-            llm_response = self.lakeview_llm_client.chat(
-                model_parameters=self.model_parameters,
-                messages=llm_messages,
-                reuse_history=False
-            )
+            attempt += 1
+            llm_response = await self._chat(llm_messages, self._extractor_parameters, step_usage)
             content = llm_response.content.strip()
+            if '<details>' in content and '</details>' not in content:
+                # the answer ended at the stop sequence, which is not part of it
+                content += '</details>'
 
         if '</task>' not in content or '<details>' not in content or '</details>' not in content:
             return '', ''
@@ -144,17 +335,13 @@ class LakeView:
         return desc_task, desc_details
 
 
-    async def extract_tag_in_step(self, step: str) -> list[str]:
-        steps_fmt = '\n\n'.join(f'<step id="{ind+1}">\n{s.strip()}\n</step>' for ind, s in enumerate(self.steps))
-
-        if len(steps_fmt) > 300_000:
-            # step_fmt is too long, skip tagging
-            return []
+    async def extract_tag_in_step(self, step: str, step_number: int, step_usage: BudgetUsage | None = None) -> list[str]:
+        steps_fmt = self._tagger_context(step_number)
 
         llm_messages = [
             LLMMessage(
                 role="user",
-                content=f'Below is the trajectory of an AI agent solving a software bug until the current step. Each step is marked within a <step> tag.\n\n{steps_fmt}\n\n<current_step>{step}</current_step>'
+                content=f'Below is the trajectory of an AI agent solving a software bug until the current step. The recent steps are each marked within a <step> tag, and the tags of the steps before them are counted in an <earlier_steps> tag.\n\n{steps_fmt}\n\n<current_step>{step}</current_step>'
             ),
             LLMMessage(
                 role="assistant",
@@ -169,24 +356,21 @@ class LakeView:
                 content="Sure. The tags are: <tags>"
             )
         ]
-        self.model_parameters.temperature = 0.1
-
-        retry = 0
-        while retry < 10:
-            llm_response = self.lakeview_llm_client.chat(
-                model_parameters=self.model_parameters,
-                messages=llm_messages,
-                reuse_history=False
-            )
+        attempt = 0
+        while attempt < ANNOTATION_ATTEMPTS:
+            llm_response = await self._chat(llm_messages, self._tagger_parameters, step_usage)
 
             content = '<tags>' + llm_response.content.lstrip()
+            if '</tags>' not in content:
+                # the answer ended at the stop sequence, which is not part of it
+                content += '</tags>'
 
             matched_tags: list[str] = tags_re.findall(content)
-            tags: list[str] = [tag.strip() for tag in matched_tags[0].split(',')]
-            if all(tag in KNOWN_TAGS.keys() for tag in tags):
+            tags: list[str] = [tag.strip() for tag in matched_tags[0].split(',')] if matched_tags else []
+            if tags and all(tag in KNOWN_TAGS.keys() for tag in tags):
                 return tags
 
-            retry += 1
+            attempt += 1
 
         return []
 
@@ -206,17 +390,185 @@ class LakeView:
         return content
 
 
-    async def create_lakeview_step(self, agent_step: AgentStep) -> LakeViewStep | None:
-        previous_step_str = '(none)'
-        if len(self.steps) > 1:
-            previous_step_str = self.steps[-1]
+    async def _annotate(
+        self, step_number: int, previous_step: str, step: str, tags_known: bool, step_usage: BudgetUsage
+    ) -> tuple[str, str, list[str]]:
+        """Return the task description, details and tags of a step, batched with other pending steps if enabled."""
+        # a step of a run that spent its budget is not queued for a batch in vain
+        self._check_budget(step_usage)
+        if self.max_batch_size > 1:
+            future: asyncio.Future[tuple[str, str, list[str]] | None] = asyncio.get_running_loop().create_future()
+            self._pending.append(_PendingStep(step_number, step, future))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush_batch()
+            elif self._batch_timer is None:
+                self._batch_timer = asyncio.get_running_loop().call_later(self.max_batch_wait, self._flush_batch)
+            annotation = await future
+            if annotation is not None:
+                return annotation
+            # the step is missing from the answer for its batch, or the request failed
+
+        if tags_known:
+            desc_task, desc_details = await self.extract_task_in_step(previous_step, step, step_usage)
+            return desc_task, desc_details, []
+        # the description and the tags of a step are independent of each other
+        (desc_task, desc_details), tags = await asyncio.gather(
+            self.extract_task_in_step(previous_step, step, step_usage),
+            self.extract_tag_in_step(step, step_number, step_usage)
+        )
+        return desc_task, desc_details, tags
+
+    def _flush_batch(self):
+        """Send the pending steps, at most `max_batch_size` of them per request."""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+            task = asyncio.create_task(self._annotate_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _annotate_batch(self, batch: list[_PendingStep]):
+        """Annotate several steps with a single request, resolving the future of each step.
+
+        Steps missing from the answer resolve to None, and are annotated one by one instead.
+        """
+        # steps cancelled while they waited are not annotated
+        batch = [pending for pending in batch if not pending.future.done()]
+        answers: dict[int, tuple[str, str, list[str]]] = {}
+        # a lone step is annotated with the prompts made for one step
+        if len(batch) > 1:
+            steps_fmt = '\n\n'.join(
+                f'<step id="{pending.step_number}">\n{pending.step.strip()}\n</step>' for pending in batch
+            )
+            llm_messages = [
+                LLMMessage(
+                    role="user",
+                    content=f'Below is the trajectory of an AI agent solving a software bug. The recent steps are each marked within a <step> tag, and the tags of the steps before them are counted in an <earlier_steps> tag.\n\n{self._tagger_context(batch[0].step_number)}\n\n<batch>\n{steps_fmt}\n</batch>'
+                ),
+                LLMMessage(
+                    role="assistant",
+                    content="I understand."
+                ),
+                LLMMessage(
+                    role="user",
+                    content=BATCH_PROMPT
+                )
+            ]
+            # charged to the run only, the steps are charged for the calls they make on their own
+            try:
+                llm_response = await self._chat(llm_messages, self._batch_parameters, None)
+                self.stats["batch_calls"] += 1
+            except Exception:
+                llm_response = None
+            for number, task, details, tags in batch_step_re.findall(llm_response.content if llm_response else ''):
+                tag_list = [tag.strip() for tag in tags.split(',')]
+                if task.strip() and all(tag in KNOWN_TAGS for tag in tag_list):
+                    # the same form as the answers of the extractor, which continue "The agent"
+                    desc_task = re.sub(r'^\s*The agent\b', '', task.strip())
+                    answers[int(number)] = (desc_task, f"[italic]{details.strip()}[/italic]", tag_list)
+        for pending in batch:
+            # or cancelled during the request
+            if pending.future.done():
+                continue
+            annotation = answers.get(pending.step_number)
+            if annotation is not None:
+                self.stats["batched_steps"] += 1
+            pending.future.set_result(annotation)
+
+    def _tagger_context(self, step_number: int) -> str:
+        """Format the steps before `step_number` for the tagger: a synopsis and a window of recent steps.
+
+        The size of the context is bounded, however long the run is.
+        """
+        earlier = sorted(n for n in self.steps if n < step_number)
+        window = earlier[-TAGGER_WINDOW_STEPS:]
+        # the synopsis counts the steps that left the window of this step, whether or not they left self.steps
+        synopsis_tags = self.synopsis_tags.copy()
+        for n in earlier[:-TAGGER_WINDOW_STEPS]:
+            synopsis_tags.update(self.step_tags.get(n, []))
+        synopsis_steps = self.synopsis_steps + len(earlier[:-TAGGER_WINDOW_STEPS])
+        parts: list[str] = []
+        if synopsis_steps:
+            counts = ', '.join(f'{tag} in {count}' for tag, count in synopsis_tags.most_common())
+            parts.append(f'<earlier_steps count="{synopsis_steps}">Tags of the earlier steps: {counts or "none"}</earlier_steps>')
+        for n in window:
+            text = self.steps[n].strip()
+            if len(text) > TAGGER_STEP_CHARS:
+                text = text[:TAGGER_STEP_CHARS] + ' ...'
+            tags = self.step_tags.get(n)
+            tags_fmt = f'\n<tags>{",".join(tags)}</tags>' if tags else ''
+            parts.append(f'<step id="{n}">\n{text}{tags_fmt}\n</step>')
+        return '\n\n'.join(parts)
+
+    def _add_step(self, step_number: int, step: str):
+        """Add a step to the window, moving the oldest steps to the synopsis."""
+        self.steps[step_number] = step
+        # steps are summarized concurrently and may finish out of order, so the window keeps some slack
+        while len(self.steps) > 2 * TAGGER_WINDOW_STEPS:
+            oldest = min(self.steps)
+            del self.steps[oldest]
+            self.synopsis_steps += 1
+            self.synopsis_tags.update(self.step_tags.get(oldest, []))
+
+    def _set_tags(self, step_number: int, tags: list[str]):
+        self.step_tags[step_number] = tags
+        if "WRITE_FIX" in tags and (self.first_fix_step is None or step_number < self.first_fix_step):
+            self.first_fix_step = step_number
+        if step_number not in self.steps:
+            # the step left the window before it was tagged
+            self.synopsis_tags.update(tags)
 
+    async def create_lakeview_step(self, agent_step: AgentStep) -> LakeViewStep | None:
         this_step_str = self._agent_step_str(agent_step)
 
         if this_step_str:
-            desc_task, desc_details = await self.extract_task_in_step(previous_step_str, this_step_str)
-            tags = await self.extract_tag_in_step(this_step_str)
-            tags_emoji = self.get_label(tags)
-            return LakeViewStep(desc_task, desc_details, tags_emoji)
-
-        return None
\ No newline at end of file
+            step_number = agent_step.step_number
+            previous_step_str = self.steps.get(step_number - 1, '(none)')
+            self._add_step(step_number, this_step_str)
+            with get_tracer().span("lakeview.step", {"trae.step.number": step_number}) as span:
+                key = annotation_key(
+                    str(LAKEVIEW_PROMPT_VERSION), self.model_parameters.model, previous_step_str, this_step_str
+                )
+                # the rules depend on the earlier steps of this run, which the cache key does not cover,
+                # so their tags override the cached ones
+                fix_written = self.first_fix_step is not None and self.first_fix_step < step_number
+                rule_tags = rule_based_tags(agent_step, fix_written)
+                cached = self.cache.get(key) if self.cache else None
+                span.set_attribute("trae.lakeview.cached", cached is not None)
+                if cached:
+                    desc_task, desc_details, tags = cached
+                    if rule_tags is not None:
+                        tags = rule_tags
+                    self.stats["cached_steps"] += 1
+                else:
+                    step_usage = BudgetUsage()
+                    try:
+                        desc_task, desc_details, tags = await self._annotate(
+                            step_number, previous_step_str, this_step_str, rule_tags is not None, step_usage
+                        )
+                    except LakeViewBudgetExceeded:
+                        # the console shows the compact panel of the step instead
+                        self.stats["over_budget_steps"] += 1
+                        span.set_attribute("trae.lakeview.over_budget", True)
+                        self._set_tags(step_number, rule_tags or [])
+                        return None
+                    finally:
+                        span.set_attribute("trae.lakeview.calls", step_usage.calls)
+                        span.set_attribute("trae.lakeview.tokens", step_usage.tokens)
+                    if rule_tags is not None:
+                        # the tool calls determine the tags, only the description needs the model
+                        tags = rule_tags
+                        self.stats["rule_tagged_steps"] += 1
+                    else:
+                        self.stats["model_tagged_steps"] += 1
+                    # failed extractions are tried again the next time
+                    if self.cache and desc_task and tags:
+                        self.cache.put(key, desc_task, desc_details, tags)
+                self._set_tags(step_number, tags)
+                span.set_attribute("trae.lakeview.tags", tags)
+                tags_emoji = self.get_label(tags)
+                return LakeViewStep(desc_task, desc_details, tags_emoji)
+
+        return None
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Persistent cache of Lakeview step annotations, so steps already annotated need no LLM calls."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_ENTRIES: int = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS annotations_last_used ON annotations (last_used);
+"""
+
+
+def annotation_key(*parts: str) -> str:
+    """Hash the inputs an annotation depends on, e.g. the step, the previous step and the prompt version."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        encoded = part.encode("utf-8", errors="surrogatepass")
+        # length-prefixed, so that the boundaries between the parts are part of the key
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class LakeViewCache:
+    """Annotations of steps by key, in a SQLite database holding at most `max_entries` of them.
+
+    The least recently used annotations are evicted first.
+    """
+
+    def __init__(self, db_path: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path: Path = db_path
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._connection: sqlite3.Connection = sqlite3.connect(db_path, check_same_thread=False)
+        _ = self._connection.execute("PRAGMA journal_mode=WAL")
+        _ = self._connection.executescript(_SCHEMA)
+
+    def get(self, key: str) -> tuple[str, str, list[str]] | None:
+        """Return the task description, details and tags stored under a key."""
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM annotations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            _ = self._connection.execute("UPDATE annotations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+        desc_task, desc_details, tags = json.loads(row[0])
+        return desc_task, desc_details, tags
+
+    def put(self, key: str, desc_task: str, desc_details: str, tags: list[str]):
+        with self._lock:
+            _ = self._connection.execute(
+                "INSERT OR REPLACE INTO annotations (key, data, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps([desc_task, desc_details, tags]), time.time())
+            )
+            excess = self._connection.execute("SELECT count(*) FROM annotations").fetchone()[0] - self.max_entries
+            if excess > 0:
+                _ = self._connection.execute(
+                    "DELETE FROM annotations WHERE key IN (SELECT key FROM annotations ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+            self._connection.commit()
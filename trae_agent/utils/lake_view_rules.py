@@ -0,0 +1,127 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""Deterministic tagging of agent steps whose tags follow from their tool calls alone.
+
+Lakeview only asks its model for the tags of the steps these rules are not confident about.
+"""
+
+import re
+import shlex
+
+from ..agent.agent_basics import AgentStep
+from ..tools.base import ToolCall
+
+# files that are test or reproduction scripts rather than the code under repair
+_TEST_PATH_RE = re.compile(r"(^|/)(tests?/|test_[^/]*$|[^/]*_tests?\.py$|repro[^/]*$|conftest\.py$)")
+_TEST_RUN_RE = re.compile(
+    r"(^|[\s;&|(])(pytest|py\.test|tox|nox)\b"
+    + r"|\bpython[\d.]*\s+(-m\s+(pytest|unittest)\b|\S*(test|repro)\S*\.py\b)"
+)
+_INSTALL_RE = re.compile(r"\b(pip[\d.]*\s+install|uv\s+(pip\s+install|add|sync)|apt(-get)?\s+install|conda\s+install)\b")
+# commands that only read the repository, in every part of a pipeline or command list
+_READ_ONLY_COMMANDS = {"cat", "head", "tail", "less", "grep", "egrep", "rg", "ag", "find", "ls", "tree", "wc",
+                       "file", "stat", "pwd", "cd", "echo", "nl", "sort", "uniq", "cut", "diff"}
+_READ_ONLY_GIT_COMMANDS = {"log", "show", "diff", "grep", "status", "blame", "ls-files"}
+# options with which these commands write files or run other commands
+_WRITING_OPTIONS = {
+    "find": {"-delete", "-exec", "-execdir", "-ok", "-okdir", "-fprint", "-fprint0", "-fprintf", "-fls"},
+    "sort": {"-o", "--output"},
+    "tree": {"-o"},
+    "rg": {"--pre"},
+}
+# redirections that write no file, e.g. `2>&1` or `> /dev/null`
+_HARMLESS_REDIRECT_RE = re.compile(r"\d*>&\d+|&?\d*>>?\s*/dev/null\b")
+# sed scripts that only print a range of lines, e.g. `sed -n 10,20p`
+_SED_PRINT_RE = re.compile(r"\s*(\d+|\$)(\s*,\s*(\d+|\$))?\s*p\s*")
+
+
+def _read_only(words: list[str]) -> bool:
+    name, args = words[0], words[1:]
+    if name == "git":
+        return bool(args) and args[0] in _READ_ONLY_GIT_COMMANDS and not any(a.startswith("--output") for a in args)
+    if name == "sed":
+        return args[:1] == ["-n"] and len(args) >= 2 and _SED_PRINT_RE.fullmatch(args[1]) is not None
+    if name not in _READ_ONLY_COMMANDS:
+        return False
+    if name == "uniq" and len([a for a in args if not a.startswith("-")]) > 1:
+        return False  # the second operand is the output file
+    for arg in args:
+        option = arg.split("=", 1)[0]
+        if option in _WRITING_OPTIONS.get(name, ()):
+            return False
+        # short options given together, e.g. `sort -uo out`
+        if "-o" in _WRITING_OPTIONS.get(name, ()) and re.fullmatch(r"-[a-zA-Z]*o.*", arg):
+            return False
+    return True
+
+
+def _bash_tags(command: str, fix_written: bool) -> list[str] | None:
+    # command and process substitutions may run anything, whatever the command around them does
+    if re.search(r"\$\(|`|[<>]\(", command):
+        return None
+    if _INSTALL_RE.search(command):
+        return ["OUTLIER"]
+    # redirections and heredocs write files, except for duplicating or discarding output
+    if re.search(r">|<<|\btee\b", _HARMLESS_REDIRECT_RE.sub(" ", command)):
+        return None
+    runs_tests = False
+    for part in re.split(r"&&|\|\||[|;\n]", _HARMLESS_REDIRECT_RE.sub(" ", command)):
+        if _TEST_RUN_RE.search(part):
+            runs_tests = True
+            continue
+        try:
+            words = shlex.split(part)
+        except ValueError:
+            return None
+        if words and not _read_only(words):
+            return None
+    # a test run is only unambiguous when nothing else in the command writes files
+    if runs_tests:
+        return ["VERIFY_FIX" if fix_written else "VERIFY_TEST"]
+    return ["EXAMINE_CODE"]
+
+
+def _tool_call_tags(tool_call: ToolCall, fix_written: bool) -> list[str] | None:
+    arguments = tool_call.arguments
+    if tool_call.name == "task_done":
+        return ["REPORT"]
+    if tool_call.name == "sequentialthinking":
+        return ["THINK"]
+    if tool_call.name in ("code_search", "symbols"):
+        return ["EXAMINE_CODE"]
+    if tool_call.name == "str_replace_based_edit_tool":
+        command = arguments.get("command")
+        path = str(arguments.get("path", ""))
+        if command == "view":
+            return ["EXAMINE_CODE"]
+        if command in ("create", "str_replace", "insert", "undo_edit"):
+            if _TEST_PATH_RE.search(path):
+                return ["WRITE_TEST"]
+            # a new file elsewhere may be a fix as well as a helper script
+            return ["WRITE_FIX"] if command != "create" else None
+        return None
+    if tool_call.name == "bash":
+        command = arguments.get("command")
+        return _bash_tags(command, fix_written) if isinstance(command, str) else None
+    return None
+
+
+def rule_based_tags(agent_step: AgentStep, fix_written: bool = False) -> list[str] | None:
+    """Return the tags of a step if its tool calls determine them, or None if the model has to decide.
+
+    `fix_written` tells whether an earlier step of the run wrote a fix, and so whether
+    running the tests verifies the reproduction or the fix.
+    """
+    tool_calls = agent_step.tool_calls or (agent_step.llm_response.tool_calls if agent_step.llm_response else None)
+    if not tool_calls:
+        return None
+    tags: list[str] = []
+    for tool_call in tool_calls:
+        call_tags = _tool_call_tags(tool_call, fix_written)
+        if call_tags is None:
+            return None
+        if "WRITE_FIX" in call_tags:
+            fix_written = True
+        tags.extend(tag for tag in call_tags if tag not in tags)
+    return tags
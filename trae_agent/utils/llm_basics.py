@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: MIT
 
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from ..tools.base import ToolCall, ToolResult
 from typing import override
 
@@ -39,6 +39,15 @@ class LLMUsage:
         return f"LLMUsage(input_tokens={self.input_tokens}, output_tokens={self.output_tokens}, cache_creation_input_tokens={self.cache_creation_input_tokens}, cache_read_input_tokens={self.cache_read_input_tokens}, reasoning_tokens={self.reasoning_tokens})"
 
 
+@dataclass
+class LLMTimings:
+    """Monotonic durations in seconds of the phases of an LLM call."""
+    queued: float = 0.0  # before the request that succeeded: failed attempts, e.g. rate limited, and the back-off after them
+    request: float = 0.0  # the request that succeeded
+    parsing: float = 0.0  # converting the response to an LLMResponse
+    retries: int = 0
+
+
 @dataclass
 class LLMResponse:
     """Standard LLM response format."""
@@ -46,4 +55,5 @@ class LLMResponse:
     usage: LLMUsage | None = None
     model: str | None = None
     finish_reason: str | None = None
-    tool_calls: list[ToolCall] | None = None
\ No newline at end of file
+    tool_calls: list[ToolCall] | None = None
+    timings: LLMTimings = field(default_factory=LLMTimings)
\ No newline at end of file
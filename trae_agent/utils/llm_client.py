@@ -10,6 +10,7 @@ from .config import ModelParameters
 from .trajectory_recorder import TrajectoryRecorder
 from .base_client import BaseLLMClient
 from .llm_basics import LLMMessage, LLMResponse
+from .tracing import get_tracer
 
 class LLMProvider(Enum):
     """Supported LLM providers."""
@@ -53,7 +54,20 @@ class LLMClient:
 
     def chat(self, messages: list[LLMMessage], model_parameters: ModelParameters, tools: list[Tool] | None = None, reuse_history: bool = True) -> LLMResponse:
         """Send chat messages to the LLM."""
-        return self.client.chat(messages, model_parameters, tools, reuse_history)
+        with get_tracer().span("llm.chat", {
+            "gen_ai.system": self.provider.value,
+            "gen_ai.request.model": model_parameters.model
+        }) as span:
+            response = self.client.chat(messages, model_parameters, tools, reuse_history)
+            span.set_attribute("gen_ai.response.model", response.model)
+            if response.finish_reason:
+                span.set_attribute("gen_ai.response.finish_reasons", [response.finish_reason])
+            if response.usage:
+                span.set_attribute("gen_ai.usage.input_tokens", response.usage.input_tokens)
+                span.set_attribute("gen_ai.usage.output_tokens", response.usage.output_tokens)
+            span.set_attribute("trae.llm.retries", response.timings.retries)
+            span.set_attribute("trae.llm.tool_calls", len(response.tool_calls or []))
+            return response
 
     def supports_tool_calling(self, model_parameters: ModelParameters) -> bool:
         """Check if the current client supports tool calling."""
@@ -15,7 +15,7 @@ from typing import override
 from ..tools.base import Tool, ToolCall, ToolResult
 from ..utils.config import ModelParameters
 from .base_client import BaseLLMClient
-from .llm_basics import LLMMessage, LLMResponse, LLMUsage
+from .llm_basics import LLMMessage, LLMResponse, LLMTimings, LLMUsage
 
 
 class OpenAIClient(BaseLLMClient):
@@ -60,8 +60,12 @@ class OpenAIClient(BaseLLMClient):
 
         response = None
         error_message = ""
+        timings = LLMTimings()
+        call_start = time.perf_counter()
         for i in range(model_parameters.max_retries):
+            attempt_start = time.perf_counter()
             try:
+                # the Responses API has no stop sequences, so model_parameters.stop_sequences is not used
                 response = self.client.responses.create(
                     input=self.message_history,
                     model=model_parameters.model,
@@ -70,6 +74,9 @@ class OpenAIClient(BaseLLMClient):
                     top_p=model_parameters.top_p,
                     max_output_tokens=model_parameters.max_tokens,
                 )
+                timings.request = time.perf_counter() - attempt_start
+                timings.queued = attempt_start - call_start
+                timings.retries = i
                 break
             except Exception as e:
                 error_message += f"Error {i + 1}: {str(e)}\n"
@@ -80,6 +87,7 @@ class OpenAIClient(BaseLLMClient):
         if response is None:
             raise ValueError(f"Failed to get response from OpenAI after max retries: {error_message}")
 
+        parse_start = time.perf_counter()
         content = ""
         tool_calls: list[ToolCall] = []
         for output_block in response.output:
@@ -132,6 +140,9 @@ class OpenAIClient(BaseLLMClient):
             tool_calls=tool_calls if len(tool_calls) > 0 else None
         )
 
+        timings.parsing = time.perf_counter() - parse_start
+        llm_response.timings = timings
+
         # Record trajectory if recorder is available
         if self.trajectory_recorder:
             self.trajectory_recorder.record_llm_interaction(
@@ -0,0 +1,309 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Optional tracing of agent, LLM and tool operations as OpenTelemetry spans.
+
+Spans are exported as OTLP/JSON, either appended to a file (one export request per
+line, as written by the file exporter of the OpenTelemetry Collector) or sent to the
+OTLP/HTTP endpoint of a collector. No OpenTelemetry packages are needed. Tracing is
+disabled unless it is configured, in which case `Tracer.span` only yields a span that
+ignores its attributes.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from .config import TracingConfig
+
+AttributeValue = str | bool | int | float | Sequence[str]
+
+# spans are exported when the oldest waiting span is this old or this many spans wait, whichever comes first
+EXPORT_INTERVAL: float = 1.0  # seconds
+MAX_EXPORT_SPANS: int = 512
+EXPORT_TIMEOUT: float = 10.0  # seconds
+
+# OTLP span status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    """An operation with its start and end time, attributes and error, if it failed."""
+    name: str
+    trace_id: str = ""
+    span_id: str = ""
+    parent_span_id: str | None = None
+    start_time: int = 0  # nanoseconds since the epoch
+    end_time: int = 0
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    error: str | None = None
+    recording: bool = True
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        """Set an attribute of the span, None values are left out."""
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        """Mark the operation of the span as failed."""
+        if self.recording:
+            self.error = message
+
+    def to_otlp(self) -> dict[str, Any]:
+        """Return the span in the OTLP/JSON encoding."""
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # internal
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error is not None else {"code": STATUS_UNSET}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+# yielded by disabled tracers, setting its attributes does nothing
+NOOP_SPAN = Span(name="", recording=False)
+
+_current_span: ContextVar[Span | None] = ContextVar("trae_agent_current_span", default=None)
+
+
+def _otlp_value(value: AttributeValue) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"arrayValue": {"values": [{"stringValue": str(item)} for item in value]}}
+
+
+class SpanExporter:
+    """Exports finished spans as OTLP/JSON from a background thread.
+
+    Spans are written to `file` and/or posted to the OTLP/HTTP `endpoint` of a collector
+    in batches, so exporting never blocks the agent on I/O.
+    """
+
+    def __init__(self, file: str | None = None, endpoint: str | None = None, headers: dict[str, str] | None = None,
+                 service_name: str = "trae-agent", export_interval: float = EXPORT_INTERVAL,
+                 max_export_spans: int = MAX_EXPORT_SPANS):
+        self.file: str | None = file
+        if endpoint and not endpoint.rstrip("/").endswith("/v1/traces"):
+            endpoint = endpoint.rstrip("/") + "/v1/traces"
+        self.endpoint: str | None = endpoint
+        self.headers: dict[str, str] = headers or {}
+        self.service_name: str = service_name
+        self.export_interval: float = export_interval
+        self.max_export_spans: int = max_export_spans
+        self.spans_exported: int = 0
+        self._failed: set[str] = set()
+        self._queue: queue.SimpleQueue[Span | threading.Event | None] = queue.SimpleQueue()
+        self._closed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """Enqueue a finished span to be exported."""
+        if not self._closed:
+            self._queue.put(span)
+
+    def flush(self) -> None:
+        """Block until all enqueued spans have been exported."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        _ = done.wait()
+
+    def shutdown(self) -> None:
+        """Export all enqueued spans and stop the exporter thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        batch: list[Span] = []
+        batch_started = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, batch_started + self.export_interval - time.monotonic())
+            item: Span | threading.Event | None | bool
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if isinstance(item, Span):
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+                if len(batch) < self.max_export_spans and time.monotonic() - batch_started < self.export_interval:
+                    continue
+
+            if batch:
+                self._export_batch(batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _export_batch(self, spans: list[Span]):
+        request = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "trae_agent"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }, ensure_ascii=False)
+        if self.file:
+            try:
+                with open(self.file, "a", encoding="utf-8") as f:
+                    _ = f.write(request + "\n")
+            except OSError as e:
+                self._warn(self.file, e)
+        if self.endpoint:
+            http_request = urllib.request.Request(
+                self.endpoint, data=request.encode("utf-8"), method="POST",
+                headers={"Content-Type": "application/json", **self.headers}
+            )
+            try:
+                with urllib.request.urlopen(http_request, timeout=EXPORT_TIMEOUT):
+                    pass
+            except OSError as e:
+                self._warn(self.endpoint, e)
+        self.spans_exported += len(spans)
+
+    def _warn(self, destination: str, error: Exception):
+        # warn once per destination instead of for every batch
+        if destination not in self._failed:
+            self._failed.add(destination)
+            print(f"Warning: Failed to export spans to {destination}: {error}")
+
+
+class Tracer:
+    """Creates spans of nested operations and hands them to an exporter when they end.
+
+    The current span is tracked in a context variable, so spans opened in asyncio tasks
+    are children of the span that was current when the task was created. Spans opened
+    outside of any span, e.g. by tasks created before the run started, are children of
+    the outermost span that is still open. Without an exporter the tracer is disabled.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None):
+        self.exporter: SpanExporter | None = exporter
+        self._root: Span | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current_span(self) -> Span:
+        """Return the innermost open span, or a span that ignores its attributes."""
+        return _current_span.get() or NOOP_SPAN
+
+    @contextmanager
+    def span(self, name: str, attributes: dict[str, AttributeValue | None] | None = None) -> Iterator[Span]:
+        """Open a span for the operation in the `with` block, which fails the span if it raises."""
+        if self.exporter is None:
+            yield NOOP_SPAN
+            return
+
+        parent = _current_span.get() or self._root
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_span_id=parent.span_id if parent else None,
+            start_time=time.time_ns()
+        )
+        for key, value in (attributes or {}).items():
+            span.set_attribute(key, value)
+        if self._root is None:
+            self._root = span
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            if self._root is span:
+                self._root = None
+            self.exporter.export(span)
+
+    def shutdown(self) -> None:
+        """Export the finished spans and disable the tracer."""
+        if self.exporter is not None:
+            self.exporter.shutdown()
+            self.exporter = None
+
+
+_tracer: Tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the tracer of the process, which is disabled unless tracing was configured."""
+    return _tracer
+
+
+def configure_tracing(config: TracingConfig | None) -> Tracer:
+    """Replace the tracer of the process with one set up by the configuration.
+
+    Without a file or endpoint in the configuration, spans are sent to the collector
+    in the standard `OTEL_EXPORTER_OTLP_TRACES_ENDPOINT` or `OTEL_EXPORTER_OTLP_ENDPOINT`
+    environment variable.
+    """
+    global _tracer
+    _tracer.shutdown()
+    if config is None or not config.enabled:
+        _tracer = Tracer()
+        return _tracer
+
+    endpoint = config.endpoint
+    if not config.file and not endpoint:
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+        if not endpoint:
+            print("Warning: Tracing is enabled without a file or endpoint to export spans to")
+            _tracer = Tracer()
+            return _tracer
+
+    _tracer = Tracer(SpanExporter(
+        file=config.file,
+        endpoint=endpoint,
+        headers=config.headers,
+        service_name=config.service_name
+    ))
+    return _tracer
+
+
+@atexit.register
+def _shutdown_tracer():
+    # export the spans of the run before the process exits
+    _tracer.shutdown()
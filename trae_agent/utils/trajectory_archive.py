@@ -0,0 +1,252 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Compressed trajectory storage with random access to single steps.
+
+A compressed trajectory is a gzip file made of one gzip member per event, together with
+the blobs that event is the first to reference. Since concatenated gzip members form a
+valid gzip stream, the file can be read like any other `.gz` file. An index sidecar
+(`<file>.idx`) records the offset of every member, which members hold which agent step,
+LLM interaction and blob, so a single step can be read by decompressing only the members
+it needs.
+"""
+
+import gzip
+import json
+import os
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .trajectory_reader import expand_blobs, is_compressed, iter_events
+from .trajectory_writer import BLOB_REF_KEY, blob_event, extract_blobs
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+COMPRESSION_LEVEL: int = 6
+_SCAN_CHUNK: int = 64 * 1024
+
+
+@dataclass
+class TrajectoryIndex:
+    """Offsets of the gzip members of a compressed trajectory and what each of them holds."""
+    size: int = 0
+    mtime_ns: int = 0
+    # (offset, compressed length) of every member
+    members: list[tuple[int, int]] = field(default_factory=list)
+    # member of the event of each type, agent steps keyed by their step number
+    header: int | None = None
+    footer: int | None = None
+    agent_steps: dict[int, int] = field(default_factory=dict)
+    llm_interactions: list[int] = field(default_factory=list)
+    stats: dict[str, int] = field(default_factory=dict)
+    blobs: dict[str, int] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps({"version": INDEX_VERSION, **asdict(self)})
+
+    @classmethod
+    def from_json(cls, data: str) -> "TrajectoryIndex":
+        raw = json.loads(data)
+        if raw.pop("version", None) != INDEX_VERSION:
+            raise ValueError("Unsupported trajectory index version")
+        return cls(
+            size=raw["size"],
+            mtime_ns=raw["mtime_ns"],
+            members=[(offset, length) for offset, length in raw["members"]],
+            header=raw["header"],
+            footer=raw["footer"],
+            agent_steps={int(step): member for step, member in raw["agent_steps"].items()},
+            llm_interactions=raw["llm_interactions"],
+            stats=raw["stats"],
+            blobs=raw["blobs"],
+        )
+
+    def add_event(self, event: dict[str, Any], member: int):
+        event_type = event.get("type")
+        if event_type == "blob":
+            self.blobs[event["hash"]] = member
+        elif event_type == "header":
+            self.header = member
+        elif event_type == "footer":
+            self.footer = member
+        elif event_type == "agent_step":
+            self.agent_steps[event["step_number"]] = member
+        elif event_type == "llm_interaction":
+            self.llm_interactions.append(member)
+        elif event_type == "stats":
+            self.stats[event["category"]] = member
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def _member_groups(events: Iterable[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    """Group the events so that every event shares a member with the blobs it introduces."""
+    known_blobs: set[str] = set()
+    group: list[dict[str, Any]] = []
+    for event in events:
+        if event.get("type") == "blob":
+            if event["hash"] not in known_blobs:
+                known_blobs.add(event["hash"])
+                group.append(event)
+            continue
+        # events of the older formats have no blobs yet
+        new_blobs: dict[str, str] = {}
+        event = extract_blobs(event, known_blobs, new_blobs)
+        known_blobs.update(new_blobs)
+        group.extend(blob_event(h, data) for h, data in new_blobs.items())
+        group.append(event)
+        yield group
+        group = []
+    if group:
+        yield group
+
+
+def compress_trajectory(source: str | Path, destination: str | Path) -> TrajectoryIndex:
+    """Write the trajectory at `source`, in any format, as a compressed trajectory with its index."""
+    destination = Path(destination)
+    index = TrajectoryIndex()
+    tmp_path = destination.with_name(destination.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for group in _member_groups(iter_events(source, expand=False)):
+            member = len(index.members)
+            data = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in group).encode("utf-8")
+            compressed = gzip.compress(data, compresslevel=COMPRESSION_LEVEL, mtime=0)
+            index.members.append((f.tell(), len(compressed)))
+            _ = f.write(compressed)
+            for event in group:
+                index.add_event(event, member)
+    os.replace(tmp_path, destination)
+    stat = os.stat(destination)
+    index.size, index.mtime_ns = stat.st_size, stat.st_mtime_ns
+    _ = index_path(destination).write_text(index.to_json())
+    return index
+
+
+def decompress_trajectory(source: str | Path, destination: str | Path) -> int:
+    """Write the trajectory at `source` as plain JSON Lines and return the number of events."""
+    destination = Path(destination)
+    n_events = 0
+    with open(destination, "w", encoding="utf-8") as f:
+        for event in iter_events(source, expand=False):
+            _ = f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            n_events += 1
+    return n_events
+
+
+def _scan_members(path: Path) -> TrajectoryIndex:
+    """Rebuild the index of a compressed trajectory by decompressing it once."""
+    index = TrajectoryIndex()
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        parts: list[bytes] = []
+        pos = offset
+        # feed the member in chunks to find where it ends without copying the rest of the file
+        while not decompressor.eof:
+            chunk = data[pos:pos + _SCAN_CHUNK]
+            if not chunk:
+                raise ValueError(f"{path} ends in the middle of a gzip member")
+            parts.append(decompressor.decompress(chunk))
+            pos += len(chunk)
+        length = pos - len(decompressor.unused_data) - offset
+        member = len(index.members)
+        index.members.append((offset, length))
+        for line in b"".join(parts).decode("utf-8").splitlines():
+            if line.strip():
+                index.add_event(json.loads(line), member)
+        offset += length
+    return index
+
+
+def load_index(path: str | Path) -> TrajectoryIndex:
+    """Load the index of a compressed trajectory, rebuilding and saving it if it is missing or stale."""
+    path = Path(path)
+    if not is_compressed(path):
+        raise ValueError(f"{path} is not a compressed trajectory")
+    stat = os.stat(path)
+    try:
+        index = TrajectoryIndex.from_json(index_path(path).read_text())
+        if (index.size, index.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    index = _scan_members(path)
+    index.size, index.mtime_ns = stat.st_size, stat.st_mtime_ns
+    try:
+        _ = index_path(path).write_text(index.to_json())
+    except OSError:
+        pass
+    return index
+
+
+class CompressedTrajectory:
+    """Random access to the events of a compressed trajectory."""
+
+    def __init__(self, path: str | Path):
+        self.path: Path = Path(path)
+        self.index: TrajectoryIndex = load_index(self.path)
+        self._blobs: dict[str, str] = {}
+
+    def _read_member(self, member: int) -> list[dict[str, Any]]:
+        offset, length = self.index.members[member]
+        with open(self.path, "rb") as f:
+            _ = f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        events = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+        for event in events:
+            if event.get("type") == "blob":
+                self._blobs[event["hash"]] = event["data"]
+        return events
+
+    def _event(self, member: int) -> dict[str, Any]:
+        event = self._read_member(member)[-1]
+        missing = {h for h in _blob_refs(event) if h not in self._blobs}
+        for blob_member in sorted({self.index.blobs[h] for h in missing}):
+            _ = self._read_member(blob_member)
+        return expand_blobs(event, self._blobs)
+
+    @property
+    def step_numbers(self) -> list[int]:
+        return sorted(self.index.agent_steps)
+
+    def header(self) -> dict[str, Any] | None:
+        return self._event(self.index.header) if self.index.header is not None else None
+
+    def footer(self) -> dict[str, Any] | None:
+        return self._event(self.index.footer) if self.index.footer is not None else None
+
+    def stats(self) -> dict[str, Any]:
+        return {category: self._event(member)["stats"] for category, member in self.index.stats.items()}
+
+    def agent_step(self, step_number: int) -> dict[str, Any]:
+        if step_number not in self.index.agent_steps:
+            raise KeyError(f"Step {step_number} is not in {self.path}")
+        return self._event(self.index.agent_steps[step_number])
+
+    def llm_interaction(self, number: int) -> dict[str, Any]:
+        """Return the 1-based `number`-th LLM interaction."""
+        if not 1 <= number <= len(self.index.llm_interactions):
+            raise KeyError(f"Interaction {number} is not in {self.path}")
+        return self._event(self.index.llm_interactions[number - 1])
+
+
+def _blob_refs(value: Any) -> Iterator[str]:
+    if isinstance(value, dict):
+        if len(value) == 1 and BLOB_REF_KEY in value:  # pyright: ignore[reportUnknownArgumentType]
+            yield value[BLOB_REF_KEY]
+            return
+        for item in value.values():  # pyright: ignore[reportUnknownVariableType]
+            yield from _blob_refs(item)
+    elif isinstance(value, list):
+        for item in value:  # pyright: ignore[reportUnknownVariableType]
+            yield from _blob_refs(item)
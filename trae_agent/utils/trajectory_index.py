@@ -0,0 +1,327 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""SQLite index of many trajectory files for querying across runs.
+
+Every trajectory is normalized into rows of the `runs`, `steps`, `llm_calls` and
+`tool_calls` tables. Indexing is incremental: a file is only read again when its size or
+modification time changed, in which case its rows are replaced. Files are parsed in
+parallel worker processes and written to the database by the calling process. Times are
+stored as `YYYY-MM-DD HH:MM:SS` strings in the local time of the recording, so they can
+be compared with SQLite's `datetime('now', 'localtime', ...)`, and durations in seconds.
+The `percentile(value, p)` aggregate is available on connections opened by `connect_index`.
+"""
+
+import math
+import os
+import sqlite3
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .trajectory_reader import iter_events
+from .trajectory_writer import BLOB_REF_KEY
+from .trajectory_stats import find_trajectories
+
+# bump when the schema or the meaning of a column changes, so the index is rebuilt
+TRAJECTORY_INDEX_VERSION: int = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    error TEXT,
+    task TEXT,
+    provider TEXT,
+    model TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    success INTEGER,
+    execution_time REAL,
+    steps INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, start_time);
+CREATE INDEX IF NOT EXISTS runs_success ON runs (success);
+CREATE INDEX IF NOT EXISTS runs_start_time ON runs (start_time);
+
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    step_number INTEGER NOT NULL,
+    state TEXT,
+    timestamp TEXT,
+    duration REAL,
+    llm_duration REAL,
+    tools_duration REAL,
+    error TEXT,
+    PRIMARY KEY (run_id, step_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS steps_duration ON steps (duration);
+
+CREATE TABLE IF NOT EXISTS llm_calls (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    timestamp TEXT,
+    provider TEXT,
+    model TEXT,
+    finish_reason TEXT,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cache_read_tokens INTEGER,
+    cache_creation_tokens INTEGER,
+    reasoning_tokens INTEGER,
+    request_duration REAL,
+    retries INTEGER,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS llm_calls_model ON llm_calls (model, request_duration);
+
+CREATE TABLE IF NOT EXISTS tool_calls (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    step_number INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    call_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    success INTEGER,
+    duration REAL,
+    output_chars INTEGER,
+    PRIMARY KEY (run_id, step_number, ordinal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tool_calls_name ON tool_calls (name, duration);
+CREATE INDEX IF NOT EXISTS tool_calls_success ON tool_calls (success, name);
+"""
+
+
+class _Percentile:
+    """Nearest-rank percentile aggregate, `percentile(value, p)` with p between 0 and 100."""
+
+    def __init__(self):
+        self.values: list[float] = []
+        self.p: float = 50.0
+
+    def step(self, value: float | None, p: float):
+        if value is not None:
+            self.values.append(value)
+        self.p = p
+
+    def finalize(self) -> float | None:
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(self.p * len(ordered) / 100) - 1))]
+
+
+def connect_index(db_path: str | Path) -> sqlite3.Connection:
+    """Open a trajectory index, creating it, or rebuilding it if it has an older schema."""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    _ = conn.execute("PRAGMA foreign_keys = ON")
+    _ = conn.execute("PRAGMA journal_mode = WAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != TRAJECTORY_INDEX_VERSION:
+        with conn:
+            for table in ("tool_calls", "llm_calls", "steps", "runs"):
+                _ = conn.execute(f"DROP TABLE IF EXISTS {table}")
+            _ = conn.execute(f"PRAGMA user_version = {TRAJECTORY_INDEX_VERSION}")
+    _ = conn.executescript(_SCHEMA)
+    conn.create_aggregate("percentile", 2, _Percentile)  # pyright: ignore[reportArgumentType]
+    return conn
+
+
+def _time(value: Any) -> str | None:
+    try:
+        return datetime.fromisoformat(value).isoformat(sep=" ") if isinstance(value, str) and value else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class IndexedRun:
+    """The rows of one trajectory file."""
+    path: str
+    size: int
+    mtime_ns: int
+    error: str | None = None
+    run: dict[str, Any] = field(default_factory=dict)
+    # keyed by step number, so steps recorded again by a resumed run replace the earlier ones
+    steps: dict[int, tuple[Any, ...]] = field(default_factory=dict)
+    tool_calls: dict[int, list[tuple[Any, ...]]] = field(default_factory=dict)
+    llm_calls: list[tuple[Any, ...]] = field(default_factory=list)
+
+
+def parse_trajectory(path: str | Path) -> IndexedRun:
+    """Read a trajectory file into the rows it is indexed as."""
+    stat = os.stat(path)
+    indexed = IndexedRun(path=str(Path(path).resolve()), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    try:
+        _parse_events(indexed, iter_events(path, expand=False))
+    except (OSError, EOFError, ValueError, KeyError, TypeError, AttributeError) as e:
+        indexed = IndexedRun(path=indexed.path, size=indexed.size, mtime_ns=indexed.mtime_ns, error=str(e))
+    return indexed
+
+
+def _parse_events(indexed: IndexedRun, events: Iterable[dict[str, Any]]):
+    run = indexed.run
+    # lengths of the long strings stored as blobs, which are recorded before the events referring to them
+    blob_lengths: dict[str, int] = {}
+
+    def length(value: Any) -> int | None:
+        if isinstance(value, dict):
+            return blob_lengths.get(value.get(BLOB_REF_KEY))  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
+        return len(value) if isinstance(value, str) else None
+
+    for event in events:
+        event_type = event.get("type")
+        if event_type == "blob":
+            blob_lengths[event["hash"]] = len(event["data"])
+        elif event_type == "header":
+            run.update(
+                task=event.get("task"),
+                provider=event.get("provider"),
+                model=event.get("model"),
+                start_time=_time(event.get("start_time"))
+            )
+        elif event_type == "llm_interaction":
+            response = event.get("response") or {}
+            usage = response.get("usage") or {}
+            timings = response.get("timings") or {}
+            indexed.llm_calls.append((
+                len(indexed.llm_calls) + 1,
+                _time(event.get("timestamp")),
+                event.get("provider"),
+                event.get("model"),
+                response.get("finish_reason"),
+                usage.get("input_tokens"),
+                usage.get("output_tokens"),
+                usage.get("cache_read_input_tokens"),
+                usage.get("cache_creation_input_tokens"),
+                usage.get("reasoning_tokens"),
+                timings.get("request"),
+                timings.get("retries")
+            ))
+        elif event_type == "agent_step":
+            number = event.get("step_number", 0)
+            for later in [n for n in indexed.steps if n >= number]:
+                del indexed.steps[later]
+                _ = indexed.tool_calls.pop(later, None)
+            timings = event.get("timings") or {}
+            indexed.steps[number] = (
+                number,
+                event.get("state"),
+                _time(event.get("timestamp")),
+                event.get("duration"),
+                timings.get("llm"),
+                timings.get("tools"),
+                event.get("error")
+            )
+            calls = event.get("tool_calls") or []
+            names = {call.get("call_id"): call.get("name", "unknown") for call in calls if call.get("call_id")}
+            # results without a call id are matched to the calls of the step by position
+            indexed.tool_calls[number] = [
+                (
+                    number,
+                    ordinal,
+                    result.get("call_id") or "",
+                    names.get(result.get("call_id"))
+                    or (calls[ordinal].get("name", "unknown") if ordinal < len(calls) else "unknown"),
+                    result.get("success"),
+                    result.get("duration"),
+                    length(result.get("result"))
+                )
+                for ordinal, result in enumerate(event.get("tool_results") or [])
+            ]
+        elif event_type == "resume":
+            run.update(end_time=None, success=None, execution_time=None)
+        elif event_type == "footer":
+            run.update(
+                end_time=_time(event.get("end_time")),
+                success=event.get("success"),
+                execution_time=event.get("execution_time")
+            )
+
+
+def _store(conn: sqlite3.Connection, indexed: IndexedRun):
+    _ = conn.execute("DELETE FROM runs WHERE path = ?", (indexed.path,))
+    run = indexed.run
+    cursor = conn.execute(
+        "INSERT INTO runs (path, size, mtime_ns, error, task, provider, model, start_time, end_time, success, "
+        + "execution_time, steps, input_tokens, output_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            indexed.path, indexed.size, indexed.mtime_ns, indexed.error,
+            run.get("task"), run.get("provider"), run.get("model"), run.get("start_time"), run.get("end_time"),
+            run.get("success"), run.get("execution_time"), len(indexed.steps),
+            sum(call[5] or 0 for call in indexed.llm_calls), sum(call[6] or 0 for call in indexed.llm_calls)
+        )
+    )
+    run_id = cursor.lastrowid
+    _ = conn.executemany(
+        "INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(run_id, *step) for step in indexed.steps.values()]
+    )
+    _ = conn.executemany(
+        "INSERT INTO llm_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [(run_id, *call) for call in indexed.llm_calls]
+    )
+    _ = conn.executemany(
+        "INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(run_id, *call) for calls in indexed.tool_calls.values() for call in calls]
+    )
+
+
+@dataclass
+class IndexResult:
+    indexed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    unreadable: list[str] = field(default_factory=list)
+
+
+def index_trajectories(db_path: str | Path, paths: Iterable[str | Path], workers: int | None = None,
+                       prune: bool = False) -> IndexResult:
+    """Add new and changed trajectory files to the index, skipping files that did not change.
+
+    With `prune`, runs whose trajectory file no longer exists are removed from the index.
+    """
+    result = IndexResult()
+    conn = connect_index(db_path)
+    try:
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in conn.execute("SELECT path, size, mtime_ns FROM runs")}
+        changed: list[Path] = []
+        for path in find_trajectories(paths):
+            stat = path.stat()
+            if known.get(str(path.resolve())) == (stat.st_size, stat.st_mtime_ns):
+                result.unchanged += 1
+            else:
+                changed.append(path)
+
+        workers = min(workers or os.cpu_count() or 1, len(changed))
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            parsed = executor.map(parse_trajectory, changed, chunksize=max(1, len(changed) // (workers * 8))) \
+                if executor else map(parse_trajectory, changed)
+            # one transaction for all files, rows are written as the files are parsed
+            with conn:
+                for indexed in parsed:
+                    _store(conn, indexed)
+                    result.indexed += 1
+                    if indexed.error:
+                        result.unreadable.append(f"{indexed.path}: {indexed.error}")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if prune:
+            missing = [(path,) for path in known if not os.path.exists(path)]
+            with conn:
+                _ = conn.executemany("DELETE FROM runs WHERE path = ?", missing)
+            result.removed = len(missing)
+    finally:
+        conn.close()
+    return result
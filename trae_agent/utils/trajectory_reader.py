@@ -0,0 +1,138 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Reading of trajectory files, both the JSON Lines event format and the older single JSON document."""
+
+import gzip
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, TextIO
+
+from .trajectory_writer import BLOB_REF_KEY
+
+
+def is_compressed(path: Path) -> bool:
+    """Check for the gzip magic number of a compressed trajectory."""
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def _open(path: Path) -> TextIO:
+    if is_compressed(path):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def _is_event_log(path: Path) -> bool:
+    with _open(path) as f:
+        first_line = f.readline()
+    if not first_line.strip():
+        return True
+    try:
+        first = json.loads(first_line)
+    except json.JSONDecodeError:
+        # the older format is an indented JSON document whose first line is `{`
+        return False
+    return isinstance(first, dict) and "type" in first
+
+
+def expand_blobs(value: Any, blobs: dict[str, str]) -> Any:
+    """Replace the blob references in a value by the strings they refer to."""
+    if isinstance(value, dict):
+        if len(value) == 1 and BLOB_REF_KEY in value:  # pyright: ignore[reportUnknownArgumentType]
+            return blobs[value[BLOB_REF_KEY]]
+        return {key: expand_blobs(item, blobs) for key, item in value.items()}  # pyright: ignore[reportUnknownVariableType]
+    if isinstance(value, list):
+        return [expand_blobs(item, blobs) for item in value]  # pyright: ignore[reportUnknownVariableType]
+    return value
+
+
+def iter_events(path: str | Path, expand: bool = True) -> Iterator[dict[str, Any]]:
+    """Yield the events of a trajectory file in the order they were recorded.
+
+    With `expand`, blob references are replaced by the strings they refer to and the
+    `blob` events themselves are not yielded. Otherwise the events are yielded as stored,
+    and `expand_blobs` can be used to expand only the events that are needed. A trajectory
+    in the older JSON format is converted to the same events, and compressed trajectories
+    are decompressed while reading. A last line that was cut off, e.g. because the agent
+    was killed while writing it, is skipped.
+    """
+    path = Path(path)
+    if not _is_event_log(path):
+        yield from _legacy_events(path)
+        return
+
+    blobs: dict[str, str] = {}
+    with _open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+                return
+            if not expand:
+                yield event
+            elif event.get("type") == "blob":
+                blobs[event["hash"]] = event["data"]
+            else:
+                yield expand_blobs(event, blobs)
+
+
+def _legacy_events(path: Path) -> Iterator[dict[str, Any]]:
+    with _open(path) as f:
+        data = json.load(f)
+    yield {
+        "type": "header",
+        **{key: data.get(key) for key in ("task", "start_time", "provider", "model", "max_steps")}
+    }
+    for interaction in data.get("llm_interactions", []):
+        yield {"type": "llm_interaction", **interaction}
+    for step in data.get("agent_steps", []):
+        yield {"type": "agent_step", **step}
+    for category, stats in data.get("stats", {}).items():
+        yield {"type": "stats", "category": category, "stats": stats}
+    if data.get("end_time"):
+        yield {
+            "type": "footer",
+            **{key: data.get(key) for key in ("end_time", "success", "final_result", "execution_time")}
+        }
+
+
+def load_trajectory(path: str | Path) -> dict[str, Any]:
+    """Load a trajectory into a single dictionary with the layout of the older JSON format."""
+    trajectory: dict[str, Any] = {
+        "task": "",
+        "start_time": "",
+        "end_time": "",
+        "provider": "",
+        "model": "",
+        "max_steps": 0,
+        "llm_interactions": [],
+        "agent_steps": [],
+        "success": False,
+        "final_result": None,
+        "execution_time": 0.0,
+        "stats": {}
+    }
+    for event in iter_events(path):
+        event_type = event.pop("type", None)
+        if event_type == "header":
+            for key in ("task", "start_time", "provider", "model", "max_steps"):
+                trajectory[key] = event.get(key)
+        elif event_type == "llm_interaction":
+            trajectory["llm_interactions"].append(event)
+        elif event_type == "agent_step":
+            trajectory["agent_steps"].append(event)
+        elif event_type == "stats":
+            trajectory["stats"][event["category"]] = event["stats"]
+        elif event_type == "footer":
+            for key in ("end_time", "success", "final_result", "execution_time"):
+                trajectory[key] = event.get(key)
+    return trajectory
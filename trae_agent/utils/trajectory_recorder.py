@@ -6,47 +6,57 @@
 # pyright: reportArgumentType=false
 # pyright: reportAny=false
 
-"""Trajectory recording functionality for Trae Agent."""
+"""Trajectory recording functionality for Trae Agent.
 
-import json
+Trajectories are written as JSON Lines: a header event, one event per LLM interaction,
+agent step or set of stats, and a footer event written when the recording is finalized.
+Every event is appended to the file by a background writer, so recording neither grows
+with the length of the run nor blocks the agent on file I/O. Long strings such as the
+system prompt and tool outputs are stored once as `blob` events and referenced by hash.
+Use `trajectory_reader.load_trajectory` to read them back.
+"""
+
+import os
+import time
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from ..tools.base import ToolCall, ToolResult
 from .llm_basics import LLMMessage, LLMResponse
+from .trajectory_writer import FsyncPolicy, TrajectoryWriter
+
+
+TRAJECTORY_FORMAT = "trae-agent-trajectory"
+TRAJECTORY_FORMAT_VERSION = 1
 
 
 class TrajectoryRecorder:
     """Records trajectory data for agent execution and LLM interactions."""
 
-    def __init__(self, trajectory_path: str | None = None):
+    def __init__(self, trajectory_path: str | None = None, fsync_policy: FsyncPolicy = "batch"):
         """Initialize trajectory recorder.
 
         Args:
             trajectory_path: Path to save trajectory file. If None, generates default path.
+            fsync_policy: When written events are forced to disk: "none", after every "batch" or every "event".
         """
         if trajectory_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            trajectory_path = f"trajectory_{timestamp}.json"
+            trajectory_path = f"trajectory_{timestamp}.jsonl"
 
         self.trajectory_path: Path = Path(trajectory_path)
-        self.trajectory_data: dict[str, Any] = {
-            "task": "",
-            "start_time": "",
-            "end_time": "",
-            "provider": "",
-            "model": "",
-            "max_steps": 0,
-            "llm_interactions": [],
-            "agent_steps": [],
-            "success": False,
-            "final_result": None,
-            "execution_time": 0.0
-        }
+        self.fsync_policy: FsyncPolicy = fsync_policy
+        self._writer: TrajectoryWriter | None = None
+        # hashes of the message bodies already stored in the file
+        self._blob_hashes: set[str] = set()
         self._start_time: datetime | None = None
+        # seconds spent in the record methods, the overhead of recording for the agent
+        self.time_spent: float = 0.0
 
-    def start_recording(self, task: str, provider: str, model: str, max_steps: int) -> None:
+    def start_recording(self, task: str, provider: str, model: str, max_steps: int,
+                        workspace: dict[str, str] | None = None) -> None:
         """Start recording a new trajectory.
 
         Args:
@@ -54,18 +64,66 @@ class TrajectoryRecorder:
             provider: LLM provider being used
             model: Model name being used
             max_steps: Maximum number of steps allowed
+            workspace: Fingerprint of the workspace the task starts from
         """
         self._start_time = datetime.now()
-        self.trajectory_data.update({
+        # a new recording replaces whatever was recorded to the file before
+        self.close()
+        self._blob_hashes = set()
+        self._open(truncate=True)
+        self._write_event({
+            "type": "header",
+            "format": TRAJECTORY_FORMAT,
+            "version": TRAJECTORY_FORMAT_VERSION,
             "task": task,
             "start_time": self._start_time.isoformat(),
             "provider": provider,
             "model": model,
             "max_steps": max_steps,
-            "llm_interactions": [],
-            "agent_steps": []
+            "workspace": workspace
+        })
+
+    def resume_recording(self, from_step: int, source: str | Path | None = None,
+                         replay_tools: bool = False) -> None:
+        """Continue recording a trajectory whose run is resumed.
+
+        Events are appended to the trajectory file, after a copy of `source` if that is a
+        different trajectory, so the file holds the whole run.
+
+        Args:
+            from_step: Number of the first step of the resumed run
+            source: Trajectory the run is resumed from, defaults to the trajectory file itself
+            replay_tools: Whether the recorded tool calls are executed again
+        """
+        from .trajectory_archive import decompress_trajectory
+        from .trajectory_reader import is_compressed, iter_events
+
+        self._start_time = datetime.now()
+        self.close()
+        if source is not None and Path(source).resolve() != self.trajectory_path.resolve():
+            self.trajectory_path.parent.mkdir(parents=True, exist_ok=True)
+            _ = decompress_trajectory(source, self.trajectory_path)
+        elif is_compressed(self.trajectory_path):
+            raise ValueError(f"Cannot append to the compressed trajectory {self.trajectory_path}, record to another file")
+
+        # drop a last line that was cut off, so that appended events start on a line of their own
+        with open(self.trajectory_path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size > 0:
+                _ = f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    _ = f.seek(0)
+                    _ = f.truncate(f.read().rfind(b"\n") + 1)
+        self._blob_hashes = {
+            event["hash"] for event in iter_events(self.trajectory_path, expand=False) if event.get("type") == "blob"
+        }
+        self._open()
+        self._write_event({
+            "type": "resume",
+            "timestamp": self._start_time.isoformat(),
+            "from_step": from_step,
+            "replay_tools": replay_tools
         })
-        self.save_trajectory()
 
     def record_llm_interaction(self,
                               messages: list[LLMMessage],
@@ -82,7 +140,9 @@ class TrajectoryRecorder:
             model: Model used
             tools: Tools available during the interaction
         """
+        start = time.perf_counter()
         interaction = {
+            "type": "llm_interaction",
             "timestamp": datetime.now().isoformat(),
             "provider": provider,
             "model": model,
@@ -98,13 +158,14 @@ class TrajectoryRecorder:
                     "cache_read_input_tokens": getattr(response.usage, 'cache_read_input_tokens', None) if response.usage else None,
                     "reasoning_tokens": getattr(response.usage, 'reasoning_tokens', None) if response.usage else None
                 },
-                "tool_calls": [self._serialize_tool_call(tc) for tc in response.tool_calls] if response.tool_calls else None
+                "tool_calls": [self._serialize_tool_call(tc) for tc in response.tool_calls] if response.tool_calls else None,
+                "timings": asdict(response.timings)
             },
             "tools_available": [tool.name for tool in tools] if tools else None
         }
 
-        self.trajectory_data["llm_interactions"].append(interaction)
-        self.save_trajectory()
+        self._write_event(interaction)
+        self.time_spent += time.perf_counter() - start
 
     def record_agent_step(self,
                          step_number: int,
@@ -114,7 +175,10 @@ class TrajectoryRecorder:
                          tool_calls: list[ToolCall] | None = None,
                          tool_results: list[ToolResult] | None = None,
                          reflection: str | None = None,
-                         error: str | None = None) -> None:
+                         error: str | None = None,
+                         duration: float | None = None,
+                         workspace: dict[str, str] | None = None,
+                         timings: dict[str, Any] | None = None) -> float:
         """Record an agent execution step.
 
         Args:
@@ -126,8 +190,17 @@ class TrajectoryRecorder:
             tool_results: Results from tool execution
             reflection: Agent reflection on the step
             error: Error message if step failed
+            duration: Wall-clock duration of the step in seconds
+            workspace: Fingerprint of the workspace after the step
+            timings: Durations of the phases of the step in seconds
+
+        Returns:
+            The seconds spent recording the step. If `timings` are given, they are added
+            to its `recording` and `total` timings and to the `duration` of the step.
         """
+        start = time.perf_counter()
         step_data = {
+            "type": "agent_step",
             "step_number": step_number,
             "timestamp": datetime.now().isoformat(),
             "state": state,
@@ -145,11 +218,36 @@ class TrajectoryRecorder:
             "tool_calls": [self._serialize_tool_call(tc) for tc in tool_calls] if tool_calls else None,
             "tool_results": [self._serialize_tool_result(tr) for tr in tool_results] if tool_results else None,
             "reflection": reflection,
-            "error": error
+            "error": error,
+            "duration": duration,
+            "workspace": workspace,
+            "timings": timings
         }
 
-        self.trajectory_data["agent_steps"].append(step_data)
-        self.save_trajectory()
+        # the events are written by another thread, so the step is complete before it is handed over
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            if duration is not None:
+                step_data["duration"] = duration + elapsed
+            step_data["timings"] = {
+                **timings,
+                "recording": timings.get("recording", 0.0) + elapsed,
+                "total": timings.get("total", 0.0) + elapsed
+            }
+        self._write_event(step_data)
+        self.time_spent += time.perf_counter() - start
+        return elapsed
+
+    def record_stats(self, category: str, stats: dict[str, int]) -> None:
+        """Record counters of a run, e.g. of a tool.
+
+        Args:
+            category: Name the counters are grouped under
+            stats: The counters
+        """
+        start = time.perf_counter()
+        self._write_event({"type": "stats", "category": category, "stats": dict(stats)})
+        self.time_spent += time.perf_counter() - start
 
     def finalize_recording(self, success: bool, final_result: str | None = None) -> None:
         """Finalize the trajectory recording.
@@ -159,28 +257,41 @@ class TrajectoryRecorder:
             final_result: Final result or output of the task
         """
         end_time = datetime.now()
-        self.trajectory_data.update({
+        self._write_event({
+            "type": "footer",
             "end_time": end_time.isoformat(),
             "success": success,
             "final_result": final_result,
             "execution_time": (end_time - self._start_time).total_seconds() if self._start_time else 0.0
         })
+        self.close()
 
-        # Save to file
-        self.save_trajectory()
-
-    def save_trajectory(self) -> None:
-        """Save the current trajectory data to file."""
-        try:
-            # Ensure directory exists
-            self.trajectory_path.parent.mkdir(parents=True, exist_ok=True)
+    def flush(self) -> None:
+        """Block until all recorded events have been written to the trajectory file."""
+        if self._writer is not None:
+            self._writer.flush()
 
-            with open(self.trajectory_path, 'w', encoding='utf-8') as f:
-                json.dump(self.trajectory_data, f, indent=2, ensure_ascii=False)
+    def close(self) -> None:
+        """Write all recorded events and close the trajectory file. Events recorded afterwards are appended to it again."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
 
-        except Exception as e:
+    def _open(self, truncate: bool = False) -> None:
+        try:
+            self._writer = TrajectoryWriter(
+                self.trajectory_path, self.fsync_policy, truncate=truncate, known_blobs=self._blob_hashes
+            )
+        except OSError as e:
             print(f"Warning: Failed to save trajectory to {self.trajectory_path}: {e}")
 
+    def _write_event(self, event: dict[str, Any]) -> None:
+        """Enqueue a single event to be appended to the trajectory file."""
+        if self._writer is None:
+            self._open()
+        if self._writer is not None:
+            self._writer.write(event)
+
     def _serialize_message(self, message: LLMMessage) -> dict[str, Any]:
         """Serialize an LLM message to a dictionary."""
         data = {
@@ -201,7 +312,7 @@ class TrajectoryRecorder:
         return {
             "call_id": tool_call.call_id,
             "name": tool_call.name,
-            "arguments": tool_call.arguments,
+            "arguments": dict(tool_call.arguments),
             "id": getattr(tool_call, 'id', None)
         }
 
@@ -212,7 +323,13 @@ class TrajectoryRecorder:
             "success": tool_result.success,
             "result": tool_result.result,
             "error": tool_result.error,
-            "id": getattr(tool_result, 'id', None)
+            "id": getattr(tool_result, 'id', None),
+            "duration": tool_result.duration,
+            "compaction": {
+                "raw_chars": tool_result.compaction.raw_chars,
+                "compacted_chars": tool_result.compaction.compacted_chars,
+                "strategies": tool_result.compaction.strategies
+            } if tool_result.compaction else None
         }
 
     def get_trajectory_path(self) -> str:
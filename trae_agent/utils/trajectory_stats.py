@@ -0,0 +1,243 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Aggregate statistics over many trajectory files.
+
+Every file is streamed event by event without expanding blobs, so memory does not grow
+with the size of the trajectories, and files are analyzed in parallel worker processes.
+The per-file results are merged into a single `TrajectoryStats`.
+"""
+
+import heapq
+import os
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from .trajectory_reader import iter_events
+
+TRAJECTORY_SUFFIXES = (".json", ".jsonl", ".gz")
+DEFAULT_TOP_STEPS = 10
+TOKEN_KINDS = ("input", "output", "cache_read", "cache_creation", "reasoning")
+
+# providers whose input token count leaves out the tokens read from or written to the cache
+_CACHE_EXCLUSIVE_PROVIDERS = {"anthropic"}
+
+
+@dataclass(order=True)
+class SlowStep:
+    duration: float
+    path: str = field(compare=False)
+    step_number: int = field(compare=False)
+    tools: list[str] = field(default_factory=list, compare=False)
+
+
+@dataclass
+class TrajectoryStats:
+    """Counters and latency samples of one or more trajectories."""
+    files: int = 0
+    unreadable_files: list[str] = field(default_factory=list)
+    finished_runs: int = 0
+    successful_runs: int = 0
+    steps: int = 0
+    error_steps: int = 0
+    llm_interactions: int = 0
+    step_durations: list[float] = field(default_factory=list)
+    tool_durations: dict[str, list[float]] = field(default_factory=dict)
+    tool_calls: Counter[str] = field(default_factory=Counter)
+    failed_tool_calls: Counter[str] = field(default_factory=Counter)
+    tokens: Counter[str] = field(default_factory=Counter)
+    # input tokens including the cached ones, whatever the provider counts as input
+    prompt_tokens: int = 0
+    slowest_steps: list[SlowStep] = field(default_factory=list)
+
+    def add_slow_step(self, step: SlowStep, top: int):
+        if top <= 0:
+            return
+        if len(self.slowest_steps) < top:
+            heapq.heappush(self.slowest_steps, step)
+        elif step > self.slowest_steps[0]:
+            _ = heapq.heapreplace(self.slowest_steps, step)
+
+    def merge(self, other: "TrajectoryStats", top: int = DEFAULT_TOP_STEPS):
+        self.files += other.files
+        self.unreadable_files.extend(other.unreadable_files)
+        self.finished_runs += other.finished_runs
+        self.successful_runs += other.successful_runs
+        self.steps += other.steps
+        self.error_steps += other.error_steps
+        self.llm_interactions += other.llm_interactions
+        self.step_durations.extend(other.step_durations)
+        for name, durations in other.tool_durations.items():
+            self.tool_durations.setdefault(name, []).extend(durations)
+        self.tool_calls.update(other.tool_calls)
+        self.failed_tool_calls.update(other.failed_tool_calls)
+        self.tokens.update(other.tokens)
+        self.prompt_tokens += other.prompt_tokens
+        for step in other.slowest_steps:
+            self.add_slow_step(step, top)
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        return self.tokens["cache_read"] / self.prompt_tokens if self.prompt_tokens else None
+
+    def summary(self) -> dict[str, Any]:
+        """Return the statistics as a JSON serializable dictionary."""
+        return {
+            "files": self.files,
+            "unreadable_files": self.unreadable_files,
+            "runs": {
+                "finished": self.finished_runs,
+                "successful": self.successful_runs,
+                "unfinished": self.files - len(self.unreadable_files) - self.finished_runs,
+            },
+            "steps": self.steps,
+            "llm_interactions": self.llm_interactions,
+            "failures": {
+                "error_steps": self.error_steps,
+                "failed_runs": self.finished_runs - self.successful_runs,
+                "failed_tool_calls": sum(self.failed_tool_calls.values()),
+            },
+            "step_latency": distribution(self.step_durations),
+            "tools": {
+                name: {
+                    "calls": self.tool_calls[name],
+                    "failed": self.failed_tool_calls[name],
+                    "latency": distribution(self.tool_durations.get(name, [])),
+                }
+                for name in sorted(self.tool_calls, key=lambda n: -self.tool_calls[n])
+            },
+            "tokens": {kind: self.tokens[kind] for kind in TOKEN_KINDS},
+            "cache_hit_rate": self.cache_hit_rate,
+            "slowest_steps": [
+                {"path": s.path, "step_number": s.step_number, "duration": s.duration, "tools": s.tools}
+                for s in sorted(self.slowest_steps, reverse=True)
+            ],
+        }
+
+
+def distribution(values: list[float]) -> dict[str, float | int | None]:
+    """Count, mean, nearest-rank percentiles and maximum of latency samples in seconds."""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def percentile(p: int) -> float:
+        return ordered[max(0, -(-p * len(ordered) // 100) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p99": percentile(99),
+        "max": ordered[-1],
+    }
+
+
+def _timestamp(value: Any) -> datetime | None:
+    try:
+        return datetime.fromisoformat(value) if isinstance(value, str) and value else None
+    except ValueError:
+        return None
+
+
+def analyze_trajectory(path: str | Path, top: int = DEFAULT_TOP_STEPS) -> TrajectoryStats:
+    """Compute the statistics of a single trajectory file.
+
+    Steps recorded without a duration, by older versions, are timed from the timestamp of
+    the previous step or the start of the run.
+    """
+    stats = TrajectoryStats(files=1)
+    try:
+        _analyze_events(stats, str(path), iter_events(path, expand=False), top)
+    except (OSError, EOFError, ValueError, KeyError, TypeError, AttributeError) as e:
+        # a file that is not a trajectory at all counts as unreadable, and nothing else of it
+        stats = TrajectoryStats(files=1, unreadable_files=[f"{path}: {e}"])
+    return stats
+
+
+def _analyze_events(stats: TrajectoryStats, path: str, events: Iterable[dict[str, Any]], top: int):
+    previous_time: datetime | None = None
+    footer: dict[str, Any] | None = None
+    for event in events:
+        event_type = event.get("type")
+        if event_type == "header":
+            previous_time = _timestamp(event.get("start_time"))
+        elif event_type == "llm_interaction":
+            stats.llm_interactions += 1
+            usage = (event.get("response") or {}).get("usage") or {}
+            counts = {kind: usage.get(f"{kind}_tokens") or 0 for kind in ("input", "output", "reasoning")}
+            counts["cache_read"] = usage.get("cache_read_input_tokens") or 0
+            counts["cache_creation"] = usage.get("cache_creation_input_tokens") or 0
+            stats.tokens.update(counts)
+            stats.prompt_tokens += counts["input"]
+            if event.get("provider") in _CACHE_EXCLUSIVE_PROVIDERS:
+                stats.prompt_tokens += counts["cache_read"] + counts["cache_creation"]
+        elif event_type == "agent_step":
+            stats.steps += 1
+            if event.get("error"):
+                stats.error_steps += 1
+            timestamp = _timestamp(event.get("timestamp"))
+            duration = event.get("duration")
+            if duration is None and timestamp and previous_time:
+                duration = (timestamp - previous_time).total_seconds()
+            previous_time = timestamp or previous_time
+
+            names = {call.get("call_id"): call.get("name", "unknown") for call in event.get("tool_calls") or []}
+            for result in event.get("tool_results") or []:
+                name = names.get(result.get("call_id"), "unknown")
+                stats.tool_calls[name] += 1
+                if not result.get("success"):
+                    stats.failed_tool_calls[name] += 1
+                if result.get("duration") is not None:
+                    stats.tool_durations.setdefault(name, []).append(result["duration"])
+            if duration is not None:
+                stats.step_durations.append(duration)
+                stats.add_slow_step(SlowStep(duration, path, event.get("step_number", 0), list(names.values())), top)
+        elif event_type == "resume":
+            # the run goes on after the footer of the interrupted part, if it has one
+            footer = None
+        elif event_type == "footer":
+            footer = event
+    if footer is not None:
+        stats.finished_runs += 1
+        if footer.get("success"):
+            stats.successful_runs += 1
+
+
+def find_trajectories(paths: Iterable[str | Path]) -> Iterator[Path]:
+    """Yield the given files and the trajectory files found under the given directories."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(
+                p for p in path.rglob("*") if p.is_file() and p.name.endswith(TRAJECTORY_SUFFIXES)
+            )
+        else:
+            yield path
+
+
+def analyze_trajectories(paths: Iterable[str | Path], workers: int | None = None,
+                         top: int = DEFAULT_TOP_STEPS) -> TrajectoryStats:
+    """Compute the merged statistics of many trajectory files, analyzing them in parallel processes."""
+    files = list(find_trajectories(paths))
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    total = TrajectoryStats()
+    analyze = partial(analyze_trajectory, top=top)
+    if workers <= 1:
+        for path in files:
+            total.merge(analyze(path), top)
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # results are merged as they arrive, so only a few per-file results are held at a time
+        for stats in executor.map(analyze, files, chunksize=max(1, len(files) // (workers * 8))):
+            total.merge(stats, top)
+    return total
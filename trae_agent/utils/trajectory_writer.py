@@ -0,0 +1,195 @@
+# Copyright (c) 2025 ByteDance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+# pyright: reportExplicitAny=false
+# pyright: reportAny=false
+
+"""Background writer of trajectory events."""
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Literal, TextIO
+
+FsyncPolicy = Literal["none", "batch", "event"]
+FSYNC_POLICIES: list[str] = ["none", "batch", "event"]
+
+# a batch is written when it is this old or this large, whichever comes first
+FLUSH_INTERVAL: float = 0.2  # seconds
+MAX_BATCH_BYTES: int = 1024 * 1024
+# strings at least this long are stored once as a blob and referenced by their hash
+MIN_BLOB_CHARS: int = 256
+BLOB_REF_KEY = "$blob"
+
+_open_writers: "weakref.WeakSet[TrajectoryWriter]" = weakref.WeakSet()
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+
+
+def extract_blobs(value: Any, known_blobs: set[str], new_blobs: dict[str, str], min_blob_chars: int = MIN_BLOB_CHARS) -> Any:
+    """Return a copy of the value with long strings replaced by blob references.
+
+    Strings whose hash is not in `known_blobs` are added to `new_blobs`.
+    """
+    if isinstance(value, str):
+        if len(value) < min_blob_chars:
+            return value
+        h = blob_hash(value)
+        if h not in known_blobs:
+            new_blobs[h] = value
+        return {BLOB_REF_KEY: h}
+    if isinstance(value, dict):
+        return {key: extract_blobs(item, known_blobs, new_blobs, min_blob_chars) for key, item in value.items()}  # pyright: ignore[reportUnknownVariableType]
+    if isinstance(value, (list, tuple)):
+        return [extract_blobs(item, known_blobs, new_blobs, min_blob_chars) for item in value]  # pyright: ignore[reportUnknownVariableType]
+    return value
+
+
+def blob_event(h: str, data: str) -> dict[str, Any]:
+    return {"type": "blob", "hash": h, "data": data}
+
+
+@atexit.register
+def _close_open_writers():
+    # daemon threads still run while atexit handlers do, so pending events are written
+    for writer in list(_open_writers):
+        writer.close()
+
+
+class _Barrier:
+    """Queue item that is acknowledged once everything enqueued before it has been written."""
+
+    def __init__(self, stop: bool = False):
+        self.stop: bool = stop
+        self.done: threading.Event = threading.Event()
+
+
+class TrajectoryWriter:
+    """Appends JSON events to a file from a background thread.
+
+    `write` only enqueues the event, serialization and file I/O happen on the writer
+    thread, so events must not be modified after they have been written. Events are
+    written in batches that are flushed to the OS when they are `FLUSH_INTERVAL` old or
+    `MAX_BATCH_BYTES` large. The fsync policy decides when the data is forced to disk:
+    never (`none`), after each batch (`batch`) or after each event (`event`).
+
+    Strings of at least `min_blob_chars` characters, such as message bodies and tool
+    outputs, are written once as a `blob` event and replaced by `{"$blob": hash}` in
+    every event that contains them. `known_blobs` holds the hashes of the blobs already
+    in the file and is updated by the writer. Set `min_blob_chars` to 0 to disable this.
+    """
+
+    def __init__(self, path: Path, fsync_policy: FsyncPolicy = "batch", truncate: bool = False,
+                 flush_interval: float = FLUSH_INTERVAL, max_batch_bytes: int = MAX_BATCH_BYTES,
+                 min_blob_chars: int = MIN_BLOB_CHARS, known_blobs: set[str] | None = None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync_policy}, expected one of {', '.join(FSYNC_POLICIES)}")
+        self.path: Path = path
+        self.fsync_policy: FsyncPolicy = fsync_policy
+        self.flush_interval: float = flush_interval
+        self.max_batch_bytes: int = max_batch_bytes
+        self.min_blob_chars: int = min_blob_chars
+        self.known_blobs: set[str] = known_blobs if known_blobs is not None else set()
+        self.events_written: int = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: TextIO = open(path, "w" if truncate else "a", encoding="utf-8")
+        self._queue: queue.SimpleQueue[dict[str, Any] | _Barrier] = queue.SimpleQueue()
+        self._closed: bool = False
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="trajectory-writer", daemon=True)
+        self._thread.start()
+        _open_writers.add(self)
+
+    def write(self, event: dict[str, Any]) -> None:
+        """Enqueue an event to be appended to the file."""
+        if self._closed:
+            raise ValueError(f"The trajectory writer of {self.path} is closed")
+        self._queue.put(event)
+
+    def flush(self) -> None:
+        """Block until all enqueued events have been written."""
+        if self._closed:
+            return
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        _ = barrier.done.wait()
+
+    def close(self) -> None:
+        """Write all enqueued events, stop the writer thread and close the file."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        barrier = _Barrier(stop=True)
+        self._queue.put(barrier)
+        if self._thread.is_alive():
+            _ = barrier.done.wait()
+            self._thread.join()
+        self._file.close()
+        _open_writers.discard(self)
+
+    def _run(self):
+        batch: list[str] = []
+        batch_bytes = 0
+        batch_started = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                try:
+                    new_blobs: dict[str, str] = {}
+                    if self.min_blob_chars > 0:
+                        event = extract_blobs(item, self.known_blobs, new_blobs, self.min_blob_chars)
+                    else:
+                        event = item
+                    lines = [
+                        json.dumps(blob_event(h, text), ensure_ascii=False) + "\n"
+                        for h, text in new_blobs.items()
+                    ]
+                    lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+                except (TypeError, ValueError) as e:
+                    print(f"Warning: Failed to save trajectory event to {self.path}: {e}")
+                    continue
+                self.known_blobs.update(new_blobs)
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.extend(lines)
+                batch_bytes += sum(len(line) for line in lines)
+                if self.fsync_policy == "event":
+                    self._write_batch(batch)
+                    batch, batch_bytes = [], 0
+                    continue
+                if batch_bytes < self.max_batch_bytes and time.monotonic() - batch_started < self.flush_interval:
+                    continue
+
+            # the batch is full, old enough, or a barrier asks for everything to be written
+            if batch:
+                self._write_batch(batch)
+                batch, batch_bytes = [], 0
+            if isinstance(item, _Barrier):
+                item.done.set()
+                if item.stop:
+                    return
+
+    def _write_batch(self, lines: list[str]):
+        try:
+            _ = self._file.write("".join(lines))
+            self._file.flush()
+            if self.fsync_policy != "none":
+                os.fsync(self._file.fileno())
+            self.events_written += len(lines)
+        except Exception as e:
+            print(f"Warning: Failed to save trajectory to {self.path}: {e}")